@@ -0,0 +1,374 @@
+"""Transform one day of VnP XML into InDesign XML.
+
+This is the engine shared by create_journal.py (the Journal) and
+transform_vnp_xml_cmd.py (the daily Votes and Proceedings). The two
+publications differ in a few places, e.g. the table style and what happens
+to the Speaker's signature, and these are set by a Profile. Use the JOURNAL
+or VNP profile.
+
+Everything that does not depend on the input (XPaths, regexes and look up
+tables) is set up once, when the module is imported, so transform_day does
+no setup of its own. lxml.html and the tables module (which needs
+lxml.html.clean) are only imported once there is a day to transform.
+"""
+
+# std library imports
+import re
+import sys
+from datetime import datetime
+from functools import lru_cache
+from os import path
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+# 3rd party imports
+from lxml import etree
+from lxml.etree import Element, QName, SubElement, _Element
+
+# 1st party imports
+try:
+    from package import profiling
+except ModuleNotFoundError:
+    # run from within Python_Resources
+    sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+    from package import profiling
+
+# local imports
+try:
+    import vote_items
+except ModuleNotFoundError:
+    from . import vote_items  # type: ignore
+# xml namespaces used
+AID = "http://ns.adobe.com/AdobeInDesign/4.0/"
+AID5 = "http://ns.adobe.com/AdobeInDesign/5.0/"
+
+NS_ADOBE: Dict[str, str] = {"aid": AID, "aid5": AID5}
+
+# Text before the following should get the speaker style
+chair_titles = ("SPEAKER", "CHAIRMAN OF WAYS AND MEANS", "SPEAKER ELECT")
+
+speaker_certificates = ("speaker's certificate", "speaker’s certificate",
+                        "speaker’s certificates", "speaker's certificates")
+
+
+class Profile(NamedTuple):
+    """What differs between the publications."""
+
+    name: str
+    table_style: str
+    max_table_width: int  # in points
+    # put tables in a TableContainerPara and promote all <em> first rows to headers
+    table_container: bool
+    # add a date attribute, DaySep, VotesDate and (after the first day) a DayLine
+    dated: bool
+    # number the first numbered business item on the day from 1
+    restart_numbers_first: bool
+    # leave out the Speaker's signature (otherwise it is styled)
+    drop_chair_signature: bool
+    # use the SpeakersCertificates style
+    speaker_certificates: bool
+
+
+JOURNAL = Profile(
+    name="journal",
+    table_style="Table Style 2",
+    max_table_width=540,
+    table_container=True,
+    dated=True,
+    restart_numbers_first=True,
+    drop_chair_signature=True,
+    speaker_certificates=True,
+)
+
+VNP = Profile(
+    name="vnp",
+    table_style="StandardTable",
+    max_table_width=420,
+    table_container=False,
+    dated=False,
+    restart_numbers_first=False,
+    drop_chair_signature=False,
+    speaker_certificates=False,
+)
+
+PROFILES: Dict[str, Profile] = {profile.name: profile for profile in (JOURNAL, VNP)}
+
+
+VOTE_ITEMS = etree.XPath(".//VoteItemViewModel")
+VNP_NUMBER_PATTERN = re.compile(r"No\. ?[0-9]+", flags=re.I)
+HOUSE_MET_PATTERN = re.compile(r"^The House met at")
+
+# sections that do not get a heading
+NO_HEADING_SECTIONS = frozenset(("certificates and corrections",))
+
+INDENT_TAGS: Dict[str, str] = {
+    "padding-left: 30px": "Indent1",
+    "padding-left: 60px": "Indent2",
+    "padding-left: 90px": "Indent3",
+    "padding-left: 120px": "Indent4",
+    "padding-left: 150px": "Indent5",
+}
+
+_CHAIR_TITLES = frozenset(chair_titles)
+_SPEAKER_CERTIFICATES = frozenset(speaker_certificates)
+
+_AID_TCOLS = QName(AID, "tcols")
+_AID_THEADER = QName(AID, "theader")
+
+
+def _vote_entry_html(vote_entry_text: str) -> _Element:
+    from lxml import html as lhtml
+
+    # convert vote entry text back to html and replace breaks with InDesign forced line breaks
+    vote_entry_text = (
+        vote_entry_text.replace("&lt;", "<")
+        .replace("&gt;", ">")
+        .replace("&amp;", "&")
+        .replace("<br />", "&#8232;")
+    )
+    # also remove any divs
+    vote_entry_text = vote_entry_text.replace("<div>", "").replace("</div>", "")
+
+    if len(vote_entry_text) > 0 and vote_entry_text[0] != "<":
+        vote_entry_text = "<p>" + vote_entry_text + "</p>"
+    return lhtml.fromstring("<div>" + vote_entry_text + "</div>")
+
+
+_TABLES = None
+
+
+def _get_tables():
+    """Return the tables module, importing it on first use."""
+    global _TABLES
+    if _TABLES is None:
+        # local imports
+        try:
+            import tables
+        except ModuleNotFoundError:
+            from . import tables  # type: ignore
+        _TABLES = tables
+    return _TABLES
+
+
+def _table(item: _Element, profile: Profile) -> _Element:
+    with profiling.stage("tables"):
+        indesign_table = _get_tables().html_table_to_indesign(
+            item, tablestyle=profile.table_style, max_table_width=profile.max_table_width
+        )
+    if not profile.table_container:
+        return indesign_table
+
+    TableContainerPara = Element("TableContainerPara")
+    TableContainerPara.append(indesign_table)
+    # if a tables first row has all cell have the <em> element then promote to header
+    try:
+        cols = int(indesign_table.get(_AID_TCOLS))
+
+        cells_that_should_be_headers = indesign_table.xpath(
+            f"Cell[position() <= {cols}][em]"
+        )
+        if len(cells_that_should_be_headers) == cols:
+            for cell in cells_that_should_be_headers:
+                cell.set(_AID_THEADER, "")
+    except (TypeError, ValueError):
+        pass
+    return TableContainerPara
+
+
+def _paragraph_tag(
+    item: _Element,
+    item_text: str,
+    next_item_text: str,
+    is_heading: bool,
+    profile: Profile,
+) -> Optional[str]:
+    """The tag for a paragraph that is not a numbered business item heading.
+    None means leave the paragraph out."""
+
+    if item.get("class", "") == "HalfLine":
+        return "HalfLine"
+
+    # sometimes there is an unwanted `;`
+    item_style = item.get("style", "").rstrip(";")
+    item_text_upper = item_text.upper()
+
+    if item_style == "text-align: right":
+        if next_item_text.upper() in _CHAIR_TITLES:
+            # the Speaker's (or chair's) name
+            return None if profile.drop_chair_signature else "SpeakerName"
+        if profile.drop_chair_signature:
+            if item_text_upper in _CHAIR_TITLES:
+                return None
+            return "RightAlign"
+
+    # some elements are headings and take particular styles
+    if is_heading:
+        tag = "OPHeading2"
+        if item_text_upper in _CHAIR_TITLES:
+            if profile.drop_chair_signature:
+                return None
+            tag = "RightAlign"
+        # put The House met at in the center
+        if HOUSE_MET_PATTERN.search(item_text) is not None:
+            tag = "NormalCentred"
+        if item_text_upper == "PRAYERS":
+            tag = "MotionText"
+        if profile.speaker_certificates and item_text.casefold() in _SPEAKER_CERTIFICATES:
+            tag = "SpeakersCertificates"
+        return tag
+
+    if item_style == "text-align: center":
+        if profile.speaker_certificates and item_text.casefold() in _SPEAKER_CERTIFICATES:
+            return "SpeakersCertificates"
+        return "NormalCentred"
+
+    if item_style == "text-align: right":
+        return "RightAlign"
+
+    return INDENT_TAGS.get(item_style, "MotionText")
+
+
+def transform_day(
+    input_root: _Element,
+    profile: Profile = JOURNAL,
+    date: Optional[datetime] = None,
+    first_day: bool = False,
+) -> Optional[_Element]:
+    """Transform one day of VnP XML into a <day> element for InDesign.
+
+    date is needed for dated profiles (the journal). first_day is True for
+    the first day in the output, which does not get a DayLine. Returns None
+    if the day has no vote items. See also transform_items."""
+
+    return transform_items(vote_items.from_tree(input_root), profile, date, first_day)
+
+
+@lru_cache(maxsize=256)
+def _section(section_text: str) -> Tuple[str, str]:
+    # the heading and casefolded name of a section (there are only a few)
+    section_text = section_text.strip()
+    return section_text, section_text.casefold()
+
+
+def transform_items(
+    records: Sequence[vote_items.VoteItem],
+    profile: Profile = JOURNAL,
+    date: Optional[datetime] = None,
+    first_day: bool = False,
+) -> Optional[_Element]:
+    """transform_day for a day already read into VoteItems (see
+    vote_items.parse), which is quicker and needs less memory than its tree."""
+
+    if profile.dated:
+        if date is None:
+            raise ValueError(f"A date is needed for the {profile.name} profile")
+        temp_output_root = Element(
+            "day", nsmap=NS_ADOBE, attrib={"date": date.strftime("%Y-%m-%d")}
+        )
+    else:
+        temp_output_root = Element("day", nsmap=NS_ADOBE)
+
+    if not records:
+        return None
+
+    # put the vote number as an attribute into the root element
+    # e.g. <day VnPNumber="No. 184">
+    # the first item with a VoteEntry. (The number is always first)
+    number_item = next((r for r in records if r.vote_entry is not None), None)
+    if number_item is not None and number_item.vote_entry:
+        # case insensitive search
+        m = VNP_NUMBER_PATTERN.search(number_item.vote_entry)
+        if not m:
+            number_item = None
+        else:
+            # the VoteEntry won't go into the usual InDesign flow
+            temp_output_root.set("VnPNumber", m.group(0))
+
+            if profile.dated:
+                if not first_day:
+                    # we want a line between days (bun not before the first day)
+                    DayLine = SubElement(temp_output_root, "DayLine")
+                    DayLine.tail = "\n"
+
+                DaySep = SubElement(temp_output_root, "DaySep")
+                DaySep.text = f"[{m.group(0)}]"
+                DaySep.tail = "\n"
+
+        if profile.dated:
+            # insert date element
+            date_ele = SubElement(temp_output_root, "VotesDate")
+            date_ele.text = date.strftime("%A") + " "
+            date_for_header = SubElement(date_ele, "DateForHeader")
+            date_for_header.text = date.strftime("%d %B %Y").lstrip("0")
+            date_ele.tail = "\n"
+    else:
+        number_item = None
+
+    # variable to contain the section
+    last_section = "chamber"
+    # used to help tell if numbering should restart in InDesign
+    restart_numbers = profile.restart_numbers_first
+
+    for vote_item in records:
+
+        # If the section changes we need a new heading. There is not section heading needed for the chamber
+        if vote_item.section:
+            section_text, section_text_cf = _section(vote_item.section)
+            # There is also no heading needed for Certificates and Corrections
+            if section_text_cf != last_section and section_text_cf not in NO_HEADING_SECTIONS:
+                SubElement(temp_output_root, "OPHeading1").text = section_text + "\n"
+                last_section = section_text_cf
+                # The numbering is also supposed to restart after new sections
+                # unless section is other proceedings
+                if section_text_cf != "other proceedings":
+                    restart_numbers = True
+
+        vote_entry_type = vote_item.entry_type
+
+        # add a line to InDesign XML if vote Entry is 'FullLine'
+        if vote_entry_type == "FullLine":
+            SubElement(temp_output_root, "FullLine").text = " \n"
+            continue
+
+        is_heading = vote_entry_type == "Heading"
+        numbered = bool(vote_item.number)
+
+        vote_entry = "" if vote_item is number_item else vote_item.vote_entry
+        items = list(_vote_entry_html(vote_entry or ""))
+        texts = [(item.text or "").strip() for item in items]
+        texts.append("")  # for the last item, which has no next item
+
+        for i, item in enumerate(items):
+            item_text = texts[i]
+            next_item_text = texts[i + 1]
+
+            # remove multiple new paragraphs, this sometimes happens after tables
+            if (
+                item.tag == "p"
+                and item_text == "\u00A0"
+                and next_item_text == "\u00A0"
+                and items[i + 1].tag == "p"
+            ):
+                continue
+
+            # if the element is an html table...
+            if item.tag == "table":
+                temp_output_root.append(_table(item, profile))
+                continue
+
+            # decide what tag we need to give it
+            if i == 0 and numbered:
+                tag = "BusinessItemHeadingNumbered"
+                if restart_numbers is True:
+                    tag = "BusinessItemHeadingNumberedRestart"
+                    restart_numbers = False
+            else:
+                tag = _paragraph_tag(item, item_text, next_item_text, is_heading, profile)
+                if tag is None:
+                    continue
+
+            item.tag = tag
+            item.tail = "\n"
+            # move rather than copy, the html is not used again
+            temp_output_root.append(item)
+
+    return temp_output_root
@@ -0,0 +1,232 @@
+<?xml version="1.0" encoding="UTF-8"?>
+<!--
+    Transform one day of VnP XML into a <day> element for InDesign.
+
+    This does the same as transform_day in day_transform.py and is run by
+    day_transform_xslt.py, which passes in the profile as parameters and
+    provides an extension function:
+
+        vnp:html(string)  the elements of a VoteEntry's escaped HTML, with
+                          the tables already converted to InDesign tables
+                          (Table or TableContainerPara elements)
+
+    and, so that text is compared exactly as the Python engine does, with
+    only the whitespace at the ends stripped and Unicode case rules,
+
+        vnp:strip(string)     str.strip()
+        vnp:upper(string)     str.strip().upper()
+        vnp:casefold(string)  str.strip().casefold()
+
+    Keep the two in step.
+-->
+<xsl:stylesheet version="1.0"
+    xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+    xmlns:exsl="http://exslt.org/common"
+    xmlns:re="http://exslt.org/regular-expressions"
+    xmlns:vnp="urn:commons-journal:day-transform"
+    xmlns:aid="http://ns.adobe.com/AdobeInDesign/4.0/"
+    xmlns:aid5="http://ns.adobe.com/AdobeInDesign/5.0/"
+    exclude-result-prefixes="exsl re vnp">
+
+    <xsl:output method="xml" encoding="UTF-8"/>
+
+    <!-- the profile -->
+    <xsl:param name="dated" select="false()"/>
+    <xsl:param name="restart_numbers_first" select="false()"/>
+    <xsl:param name="drop_chair_signature" select="false()"/>
+    <xsl:param name="speaker_certificates" select="false()"/>
+    <!-- only used by dated profiles -->
+    <xsl:param name="date" select="''"/>
+    <xsl:param name="weekday" select="''"/>
+    <xsl:param name="date_for_header" select="''"/>
+    <xsl:param name="first_day" select="false()"/>
+
+    <!-- the first VoteEntry has the VnP number, e.g. No. 184 -->
+    <xsl:variable name="first_vote_entry" select="(/*/VoteItemViewModel/VoteEntry)[1]"/>
+    <xsl:variable name="vnp_number" select="string(re:match(string($first_vote_entry), 'No\. ?[0-9]+', 'i')[1])"/>
+
+    <xsl:template match="/">
+        <day>
+            <xsl:if test="$dated">
+                <xsl:attribute name="date"><xsl:value-of select="$date"/></xsl:attribute>
+            </xsl:if>
+            <xsl:if test="$vnp_number != ''">
+                <xsl:attribute name="VnPNumber"><xsl:value-of select="$vnp_number"/></xsl:attribute>
+            </xsl:if>
+
+            <xsl:if test="$dated and string($first_vote_entry) != ''">
+                <xsl:if test="$vnp_number != ''">
+                    <xsl:if test="not($first_day)">
+                        <!-- a line between days -->
+                        <DayLine/><xsl:text>&#10;</xsl:text>
+                    </xsl:if>
+                    <DaySep>[<xsl:value-of select="$vnp_number"/>]</DaySep><xsl:text>&#10;</xsl:text>
+                </xsl:if>
+                <VotesDate><xsl:value-of select="concat($weekday, ' ')"/><DateForHeader><xsl:value-of select="$date_for_header"/></DateForHeader></VotesDate><xsl:text>&#10;</xsl:text>
+            </xsl:if>
+
+            <xsl:variable name="content">
+                <xsl:if test="$restart_numbers_first">
+                    <restart/>
+                </xsl:if>
+                <xsl:apply-templates select="//VoteItemViewModel"/>
+            </xsl:variable>
+            <xsl:apply-templates select="exsl:node-set($content)/node()" mode="restart"/>
+        </day>
+    </xsl:template>
+
+    <!-- One vote item. The sections, numbering and FullLines. -->
+    <xsl:template match="VoteItemViewModel">
+        <xsl:variable name="section" select="vnp:strip(string(Section))"/>
+        <xsl:variable name="section_cf" select="vnp:casefold(string(Section))"/>
+
+        <!-- the section we are in is that of the last vote item that
+             has a section, other than certificates and corrections -->
+        <xsl:variable name="previous_section_cf">
+            <xsl:variable name="previous" select="preceding-sibling::VoteItemViewModel[string(Section) != '' and vnp:casefold(string(Section)) != 'certificates and corrections'][1]"/>
+            <xsl:choose>
+                <xsl:when test="$previous">
+                    <xsl:value-of select="vnp:casefold(string($previous/Section))"/>
+                </xsl:when>
+                <xsl:otherwise>chamber</xsl:otherwise>
+            </xsl:choose>
+        </xsl:variable>
+
+        <xsl:if test="string(Section) != '' and $section_cf != $previous_section_cf and $section_cf != 'certificates and corrections'">
+            <OPHeading1><xsl:value-of select="concat($section, '&#10;')"/></OPHeading1>
+            <!-- the numbering restarts after new sections, except other proceedings -->
+            <xsl:if test="$section_cf != 'other proceedings'">
+                <restart/>
+            </xsl:if>
+        </xsl:if>
+
+        <xsl:choose>
+            <xsl:when test="VoteEntryType = 'FullLine'">
+                <FullLine><xsl:text> &#10;</xsl:text></FullLine>
+            </xsl:when>
+            <!-- the VnP number has already been dealt with -->
+            <xsl:when test="$vnp_number != '' and count(VoteEntry[1] | $first_vote_entry) = 1"/>
+            <xsl:otherwise>
+                <xsl:apply-templates select="vnp:html(string(VoteEntry))" mode="entry">
+                    <xsl:with-param name="numbered" select="string(Number) != ''"/>
+                    <xsl:with-param name="is_heading" select="string(VoteEntryType) = 'Heading'"/>
+                </xsl:apply-templates>
+            </xsl:otherwise>
+        </xsl:choose>
+    </xsl:template>
+
+    <xsl:template match="Table | TableContainerPara" mode="entry">
+        <xsl:copy-of select="."/>
+    </xsl:template>
+
+    <!-- One paragraph of a vote item's HTML. -->
+    <xsl:template match="*" mode="entry">
+        <xsl:param name="numbered"/>
+        <xsl:param name="is_heading"/>
+
+        <!-- sometimes there is an unwanted `;` -->
+        <xsl:variable name="style" select="substring(@style, 1, string-length(@style) - (substring(@style, string-length(@style)) = ';'))"/>
+
+        <xsl:choose>
+            <!-- the restarts are added later -->
+            <xsl:when test="position() = 1 and $numbered">
+                <xsl:call-template name="paragraph"><xsl:with-param name="tag" select="'BusinessItemHeadingNumbered'"/></xsl:call-template>
+            </xsl:when>
+            <xsl:when test="@class = 'HalfLine'">
+                <xsl:call-template name="paragraph"><xsl:with-param name="tag" select="'HalfLine'"/></xsl:call-template>
+            </xsl:when>
+            <xsl:when test="$is_heading or $style = 'text-align: right' or $style = 'text-align: center'">
+                <xsl:call-template name="aligned-paragraph">
+                    <xsl:with-param name="style" select="$style"/>
+                    <xsl:with-param name="is_heading" select="$is_heading"/>
+                </xsl:call-template>
+            </xsl:when>
+            <xsl:otherwise>
+                <xsl:call-template name="paragraph">
+                    <xsl:with-param name="tag">
+                        <xsl:choose>
+                            <xsl:when test="$style = 'padding-left: 30px'">Indent1</xsl:when>
+                            <xsl:when test="$style = 'padding-left: 60px'">Indent2</xsl:when>
+                            <xsl:when test="$style = 'padding-left: 90px'">Indent3</xsl:when>
+                            <xsl:when test="$style = 'padding-left: 120px'">Indent4</xsl:when>
+                            <xsl:when test="$style = 'padding-left: 150px'">Indent5</xsl:when>
+                            <xsl:otherwise>MotionText</xsl:otherwise>
+                        </xsl:choose>
+                    </xsl:with-param>
+                </xsl:call-template>
+            </xsl:otherwise>
+        </xsl:choose>
+    </xsl:template>
+
+    <!-- Headings and right aligned or centred paragraphs, which depend on
+         the text, e.g. the Speaker's signature. -->
+    <xsl:template name="aligned-paragraph">
+        <xsl:param name="style"/>
+        <xsl:param name="is_heading"/>
+
+        <xsl:variable name="text" select="vnp:strip(string(node()[1][self::text()]))"/>
+        <xsl:variable name="text_upper" select="vnp:upper($text)"/>
+        <xsl:variable name="text_cf" select="vnp:casefold($text)"/>
+        <xsl:variable name="next_text_upper" select="vnp:upper(string(following-sibling::*[1]/node()[1][self::text()]))"/>
+
+        <xsl:variable name="chair" select="$text_upper = 'SPEAKER' or $text_upper = 'CHAIRMAN OF WAYS AND MEANS' or $text_upper = 'SPEAKER ELECT'"/>
+        <xsl:variable name="certificates" select="$speaker_certificates and ($text_cf = &quot;speaker's certificate&quot; or $text_cf = 'speaker’s certificate' or $text_cf = 'speaker’s certificates' or $text_cf = &quot;speaker's certificates&quot;)"/>
+
+        <xsl:variable name="tag">
+            <xsl:choose>
+                <!-- the Speaker's (or chair's) name -->
+                <xsl:when test="$style = 'text-align: right' and ($next_text_upper = 'SPEAKER' or $next_text_upper = 'CHAIRMAN OF WAYS AND MEANS' or $next_text_upper = 'SPEAKER ELECT')">
+                    <xsl:if test="not($drop_chair_signature)">SpeakerName</xsl:if>
+                </xsl:when>
+                <xsl:when test="$style = 'text-align: right' and $drop_chair_signature">
+                    <xsl:if test="not($chair)">RightAlign</xsl:if>
+                </xsl:when>
+                <xsl:when test="$is_heading">
+                    <xsl:choose>
+                        <xsl:when test="$certificates">SpeakersCertificates</xsl:when>
+                        <xsl:when test="$text_upper = 'PRAYERS'">MotionText</xsl:when>
+                        <xsl:when test="starts-with($text, 'The House met at')">NormalCentred</xsl:when>
+                        <xsl:when test="$chair">
+                            <xsl:if test="not($drop_chair_signature)">RightAlign</xsl:if>
+                        </xsl:when>
+                        <xsl:otherwise>OPHeading2</xsl:otherwise>
+                    </xsl:choose>
+                </xsl:when>
+                <xsl:when test="$style = 'text-align: center'">
+                    <xsl:choose>
+                        <xsl:when test="$certificates">SpeakersCertificates</xsl:when>
+                        <xsl:otherwise>NormalCentred</xsl:otherwise>
+                    </xsl:choose>
+                </xsl:when>
+                <xsl:otherwise>RightAlign</xsl:otherwise>
+            </xsl:choose>
+        </xsl:variable>
+
+        <!-- no tag means leave the paragraph out -->
+        <xsl:if test="$tag != ''">
+            <xsl:call-template name="paragraph"><xsl:with-param name="tag" select="$tag"/></xsl:call-template>
+        </xsl:if>
+    </xsl:template>
+
+    <xsl:template name="paragraph">
+        <xsl:param name="tag"/>
+        <xsl:element name="{$tag}">
+            <xsl:copy-of select="@*|node()"/>
+        </xsl:element>
+        <xsl:text>&#10;</xsl:text>
+    </xsl:template>
+
+    <!-- The first numbered item after a <restart/> restarts the numbering. -->
+    <xsl:template match="restart" mode="restart"/>
+
+    <xsl:template match="BusinessItemHeadingNumbered[preceding-sibling::*[self::restart or self::BusinessItemHeadingNumbered][1][self::restart]]" mode="restart">
+        <BusinessItemHeadingNumberedRestart>
+            <xsl:copy-of select="@*|node()"/>
+        </BusinessItemHeadingNumberedRestart>
+    </xsl:template>
+
+    <xsl:template match="node()" mode="restart">
+        <xsl:copy-of select="."/>
+    </xsl:template>
+
+</xsl:stylesheet>
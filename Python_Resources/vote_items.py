@@ -0,0 +1,119 @@
+"""Compact records of the vote items in a day of VnP XML.
+
+The Python day transform only reads four fields of each VoteItemViewModel:
+Number, Section, VoteEntry (escaped HTML) and VoteEntryType. Rather than
+the whole element tree of the day, VoteItem keeps just those, in
+__slots__. parse() reads them and lets the tree go straight away. (Reading
+them with iterparse, clearing as it goes, was slower and the tree of one
+day is small; it is the trees of many days that add up.)
+
+The same few values come up again and again over a session. Number,
+Section and VoteEntryType are interned, so each distinct value is one str
+shared by every item (and comparisons are mostly by identity). Short vote
+entries (e.g. "<p>PRAYERS</p>" or "The House met at 11.30 am.") are shared
+through a bounded table, longer ones are kept as they are.
+
+benchmarks/bench_vote_items.py compares the memory used per item with
+keeping the element trees.
+"""
+
+# std library imports
+import sys
+import threading
+from typing import Dict, List, Optional
+
+# 3rd party imports
+from lxml import etree
+from lxml.etree import _Element
+
+VOTE_ITEM_TAG = "VoteItemViewModel"
+
+# vote entries up to this many characters are shared between items
+SHARED_TEXT_MAX_LENGTH = 200
+# and the most that are kept, so a long running process doesn't grow
+SHARED_TEXT_MAX_ENTRIES = 20_000
+
+_SHARED_TEXT: Dict[str, str] = {}
+_SHARED_TEXT_LOCK = threading.Lock()
+
+
+class VoteItem:
+    """The fields of a VoteItemViewModel used by the day transform. Each is
+    None if the element is missing and "" if it is empty (as findtext)."""
+
+    __slots__ = ("number", "section", "vote_entry", "entry_type")
+
+    def __init__(
+        self,
+        number: Optional[str] = None,
+        section: Optional[str] = None,
+        vote_entry: Optional[str] = None,
+        entry_type: Optional[str] = None,
+    ):
+        self.number = number
+        self.section = section
+        self.vote_entry = vote_entry
+        self.entry_type = entry_type
+
+    def __repr__(self) -> str:
+        return (
+            f"VoteItem(number={self.number!r}, section={self.section!r},"
+            f" entry_type={self.entry_type!r}, vote_entry={self.vote_entry!r})"
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, VoteItem):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+def _intern(text: Optional[str]) -> Optional[str]:
+    return None if text is None else sys.intern(text)
+
+
+def share(text: Optional[str]) -> Optional[str]:
+    """text, or an equal str already in use if it is short."""
+
+    if text is None or len(text) > SHARED_TEXT_MAX_LENGTH:
+        return text
+    shared = _SHARED_TEXT.get(text)
+    if shared is not None:
+        return shared
+    with _SHARED_TEXT_LOCK:
+        if len(_SHARED_TEXT) < SHARED_TEXT_MAX_ENTRIES:
+            return _SHARED_TEXT.setdefault(text, text)
+    return text
+
+
+def clear_shared_text():
+    with _SHARED_TEXT_LOCK:
+        _SHARED_TEXT.clear()
+
+
+def vote_item(element: _Element) -> VoteItem:
+    """The VoteItem for a VoteItemViewModel element."""
+
+    fields: Dict[str, str] = {}
+    for child in element:
+        # the first of each, as findtext
+        if child.tag not in fields:
+            fields[child.tag] = child.text or ""
+    return VoteItem(
+        number=_intern(fields.get("Number")),
+        section=_intern(fields.get("Section")),
+        vote_entry=share(fields.get("VoteEntry")),
+        entry_type=_intern(fields.get("VoteEntryType")),
+    )
+
+
+def from_tree(input_root: _Element) -> List[VoteItem]:
+    """The vote items of a day that has already been parsed."""
+
+    return [vote_item(element) for element in input_root.iterdescendants(VOTE_ITEM_TAG)]
+
+
+def parse(content: bytes) -> List[VoteItem]:
+    """The vote items of a day of VnP XML. Only the records are kept, the
+    tree of the day is freed as soon as they have been read."""
+
+    return from_tree(etree.fromstring(content))
@@ -5,13 +5,16 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 from pathlib import Path
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # this is the brains of the operation
 import Python_Resources.transform_vnp_xml_cmd as cmd_version
-
-# for getting files form urls
-import urllib.request
-import ssl
+from package import http_client
+from package.endpoints import VOTE_ITEMS_URL
+from package.utilities import get_sitting_dates_in, get_sitting_dates_in_range
 
 # working with file paths
 from os import path
@@ -19,9 +22,15 @@ from os import path
 # for geting the date
 import datetime
 
-# for making the prograpm pause
+# for timing the download and transformation
 import time
 
+# how often (in milliseconds) the GUI checks for messages from the worker
+POLL_INTERVAL = 100
+
+# e.g. 2016-09-12 to 2016-09-16
+DATE_RANGE_PATTERN = re.compile(r'^\s*(\d{4}-\d\d?-\d\d?)\s*(?:to|\.\.|-|–)\s*(\d{4}-\d\d?-\d\d?)\s*$')
+
 
 class bcolors:
     HEADER = '\033[95m'
@@ -76,7 +85,7 @@ class EBApp:
         # url text entry box
         self.url_box = ttk.Entry(self.step_0, textvariable=self.input_url, width=42)
         self.url_box.grid(row=rows.count(), column=0, stick='w', padx=5, pady=10)
-        self.url_box.insert(0, 'http://services.vnp.parliament.uk/voteitems')
+        self.url_box.insert(0, VOTE_ITEMS_URL)
 
         # select folder lable
         self.select_folder_lable = ttk.Label(self.step_1, text='Select the folder that you would like the XML to be saved into. (VnP date folder).')
@@ -87,11 +96,11 @@ class EBApp:
         self.select_folder_button.grid(row=rows.count(), column=0, stick='sw', padx=5, pady=10)
 
         # VnP date lable
-        self.Creation_box_lable = ttk.Label(self.step_2, text='Check the VnP date is correct. This is the date of the VnP you are working on. The date must be in the form YYYY-MM-DD (e.g. 2016-09-11).')
+        self.Creation_box_lable = ttk.Label(self.step_2, text='Check the VnP date is correct. This is the date of the VnP you are working on. The date must be in the form YYYY-MM-DD (e.g. 2016-09-11).\nFor more than one VnP enter a range (e.g. 2016-09-12 to 2016-09-16) or a list of dates separated by commas. Only the sitting days will be produced.')
         self.Creation_box_lable.config(wraplength=350)
         self.Creation_box_lable.grid(row=rows.count(), column=0, stick='sw', padx=5, pady=10)
         # VnP date box
-        self.Creation_box = ttk.Entry(self.step_2, textvariable=self.sitting_date, width=10)
+        self.Creation_box = ttk.Entry(self.step_2, textvariable=self.sitting_date, width=42)
         self.Creation_box.grid(row=rows.count(), column=0, stick='w', padx=5, pady=3)
         self.Creation_box.insert(0, get_todays_date())
 
@@ -99,9 +108,32 @@ class EBApp:
         self.run_lable = ttk.Label(self.step_3, text="Press Run and then look for the 'All Done' message in the console window.")
         self.run_lable.config(wraplength=350)
         self.run_lable.grid(row=rows.count(), column=0, stick='sw', padx=5, pady=10)
-        # run button
-        self.run_Transform_VnP_XML_button = ttk.Button(self.step_3, text="Run", width=20, command=self.run_Transform_VnP_XML)
-        self.run_Transform_VnP_XML_button.grid(row=rows.count(), column=0, padx=10, pady=15)
+        # run and cancel buttons
+        self.buttons = ttk.Frame(self.step_3)
+        self.buttons.grid(row=rows.count(), column=0, padx=10, pady=15)
+        self.run_Transform_VnP_XML_button = ttk.Button(self.buttons, text="Run", width=20, command=self.run_Transform_VnP_XML)
+        self.run_Transform_VnP_XML_button.grid(row=0, column=0, padx=5)
+        self.cancel_button = ttk.Button(self.buttons, text="Cancel", width=10, command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1, padx=5)
+
+        # progress
+        self.progress_bar = ttk.Progressbar(self.step_3, mode='indeterminate', length=350)
+        self.progress_bar.grid(row=rows.count(), column=0, padx=5, pady=3)
+        self.status = tk.StringVar(value='Ready.')
+        self.status_lable = ttk.Label(self.step_3, textvariable=self.status)
+        self.status_lable.config(wraplength=350)
+        self.status_lable.grid(row=rows.count(), column=0, stick='w', padx=5, pady=3)
+        # progress for each date
+        self.date_list = ttk.Treeview(self.step_3, columns=('status',), height=6, selectmode='none')
+        self.date_list.heading('#0', text='Date')
+        self.date_list.column('#0', width=100, stretch=tk.FALSE)
+        self.date_list.heading('status', text='Progress')
+        self.date_list.column('status', width=250)
+        self.date_list.grid(row=rows.count(), column=0, stick='we', padx=5, pady=3)
+
+        self.master = master
+        self.worker = None
+        self.messages = queue.Queue()
 
     def run_Transform_VnP_XML(self):
 
@@ -109,27 +141,64 @@ class EBApp:
         if not self.validate():
             return
 
-        # input file name
-        infilename = self.input_url.get()
-        sitting_date = self.sitting_date.get()
-        working_folder = self.working_folder.get()
-
-        if sitting_date != '':
-            # only do this if there is a date entered. If not assume a filepath
-            infilename += '/' + self.sitting_date.get() + '.xml'
-            # create a filename for the XML as downloaded before transformation
-            output_file_name = path.join(working_folder, 'as_downloaded_VnP_XML_' + sitting_date + '.xml')
-            # get file from url
-            print('\nThe URL we are trying is:\n{}'.format(infilename))
-            infilename = get_file_from_url(infilename, output_file_name=output_file_name)
+        self.date_list.delete(*self.date_list.get_children())
+
+        self.worker = VnPWorker(
+            self.input_url.get(),
+            self.sitting_date.get(),
+            self.working_folder.get(),
+            self.messages,
+        )
+        self.worker.start()
+
+        self.run_Transform_VnP_XML_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar.start()
+        self.master.after(POLL_INTERVAL, self.check_messages)
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.status.set('Cancelling...')
+            self.cancel_button.config(state=tk.DISABLED)
+
+    def check_messages(self):
+        """Show progress from the worker. Runs on the Tk main thread."""
+
+        finished = False
+        while True:
+            try:
+                kind, text = self.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'status':
+                self.status.set(text)
+            elif kind == 'dates':
+                for sitting_date in text:
+                    self.date_list.insert('', tk.END, iid=sitting_date, text=sitting_date, values=('Waiting',))
+            elif kind == 'date':
+                sitting_date, progress = text
+                self.date_list.set(sitting_date, 'status', progress)
+            elif kind == 'done':
+                self.status.set(text)
+                print('\nAll Done!')
+                finished = True
+            elif kind == 'cancelled':
+                self.status.set(text)
+                finished = True
+            elif kind == 'error':
+                self.status.set('Failed.')
+                show_error(text)
+                finished = True
+
+        if finished:
+            self.worker = None
+            self.progress_bar.stop()
+            self.run_Transform_VnP_XML_button.config(state=tk.NORMAL)
+            self.cancel_button.config(state=tk.DISABLED)
         else:
-            sitting_date = get_todays_date()
-
-        # run functions
-        time.sleep(1)
-        cmd_version.transform_xml(infilename, working_folder=working_folder, sitting_date=sitting_date)
-
-        print('\nAll Done!')
+            self.master.after(POLL_INTERVAL, self.check_messages)
 
     def get_working_folder(self):
         # where we expect we will want to save the vnp XML
@@ -157,14 +226,173 @@ class EBApp:
             return False
 
         try:
-            datetime.datetime.strptime(self.sitting_date.get(), '%Y-%M-%d')
+            parse_dates(self.sitting_date.get())
         except ValueError:
-            show_error('Looks like you have not entered a valid date. Enter a date in the form YYYY-MM-DD')
+            show_error('Looks like you have not entered a valid date. Enter a date in the form YYYY-MM-DD, a range (e.g. 2016-09-12 to 2016-09-16) or a list of dates separated by commas')
             return False
 
         return True
 
 
+class VnPWorker(threading.Thread):
+    """Download and transform the VnP off the Tk main thread.
+
+    sitting_date is whatever was entered in step 2: nothing (url is then a
+    file path), one date, a range or a list of dates (see parse_dates). For a
+    range or a list only the sitting days are produced. The days are
+    downloaded concurrently and each is transformed as soon as it arrives.
+
+    Progress is put on the messages queue as (kind, text) tuples where kind
+    is 'status', 'dates' (text is the list of dates to be produced), 'date'
+    (text is a (date, progress) tuple), 'done', 'cancelled' or 'error'. The
+    worker never touches the GUI itself. Cancelling takes effect between
+    steps.
+    """
+
+    def __init__(self, url, sitting_date, working_folder, messages):
+        super().__init__(daemon=True)
+        self.url = url
+        self.sitting_date = sitting_date
+        self.working_folder = working_folder
+        self.messages = messages
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        if self._cancel.is_set():
+            self.messages.put(('cancelled', 'Cancelled.'))
+            return True
+        return False
+
+    def run(self):
+        try:
+            dates = parse_dates(self.sitting_date)
+            if dates:
+                self.download_and_transform_dates(dates)
+            else:
+                self.transform_file()
+        except Exception as e:
+            self.messages.put(('error', '{}: {}'.format(type(e).__name__, e)))
+
+    def transform_file(self):
+        # no date entered so assume url is a file path
+        if self.cancelled():
+            return
+
+        self.messages.put(('status', 'Transforming...'))
+        start = time.perf_counter()
+        output_file = cmd_version.transform_xml(self.url, working_folder=self.working_folder, sitting_date=get_todays_date())
+        self.messages.put(('done', 'Done: {} (transformed in {:.2f} s).'.format(path.basename(output_file), time.perf_counter() - start)))
+
+    def sitting_days(self, dates):
+        if len(dates) == 1:
+            # trust a single date, as before
+            return dates
+        self.messages.put(('status', 'Finding the sitting days...'))
+        if dates.is_range:
+            return get_sitting_dates_in_range(dates[0], dates[-1])
+        return get_sitting_dates_in(dates)
+
+    def download(self, sitting_date):
+        if self._cancel.is_set():
+            return None
+        self.messages.put(('date', (sitting_date, 'Downloading...')))
+        url = self.url + '/' + sitting_date + '.xml'
+        # create a filename for the XML as downloaded before transformation
+        output_file_name = path.join(self.working_folder, 'as_downloaded_VnP_XML_' + sitting_date + '.xml')
+        print('\nThe URL we are trying is:\n{}'.format(url))
+        start = time.perf_counter()
+        infilename = get_file_from_url(url, output_file_name=output_file_name)
+        if infilename == -1:
+            raise ValueError('Can\'t get the XML from:\n{}\nCheck the url is right.'.format(url))
+        return infilename, time.perf_counter() - start
+
+    def download_and_transform_dates(self, dates):
+        if self.cancelled():
+            return
+
+        sitting_dates = [d.strftime('%Y-%m-%d') for d in self.sitting_days(dates)]
+        if not sitting_dates:
+            self.messages.put(('error', 'There are no sitting days in {}.'.format(self.sitting_date)))
+            return
+        if self.cancelled():
+            return
+
+        self.messages.put(('dates', sitting_dates))
+        self.messages.put(('status', 'Downloading {} day(s)...'.format(len(sitting_dates))))
+
+        start = time.perf_counter()
+        done = []
+        failed = []
+        # downloads share the http_client connection pool
+        with ThreadPoolExecutor(max_workers=min(len(sitting_dates), http_client.max_concurrency())) as executor:
+            futures = {executor.submit(self.download, d): d for d in sitting_dates}
+            # transform each day as soon as it has been downloaded
+            for future in as_completed(futures):
+                sitting_date = futures[future]
+                try:
+                    downloaded = future.result()
+                    if downloaded is None:
+                        continue
+                    infilename, download_time = downloaded
+                    if self._cancel.is_set():
+                        continue
+                    self.messages.put(('date', (sitting_date, 'Transforming...')))
+                    transform_start = time.perf_counter()
+                    output_file = cmd_version.transform_xml(infilename, working_folder=self.working_folder, sitting_date=sitting_date)
+                except Exception as e:
+                    print('\nERROR:\t{}: {}'.format(sitting_date, e))
+                    self.messages.put(('date', (sitting_date, 'Failed')))
+                    failed.append('{}: {}'.format(sitting_date, e))
+                    continue
+                self.messages.put(('date', (sitting_date, 'Done: {} (downloaded in {:.2f} s, transformed in {:.2f} s)'.format(
+                    path.basename(output_file), download_time, time.perf_counter() - transform_start))))
+                done.append(sitting_date)
+                self.messages.put(('status', '{} of {} day(s) done...'.format(len(done), len(sitting_dates))))
+
+        if self.cancelled():
+            return
+
+        summary = '{} of {} day(s) done in {:.2f} s.'.format(len(done), len(sitting_dates), time.perf_counter() - start)
+        if failed:
+            self.messages.put(('error', '{}\n\n{}'.format(summary, '\n'.join(sorted(failed)))))
+        else:
+            self.messages.put(('done', 'Done: ' + summary))
+
+
+class DateList(list):
+    """The dates entered in step 2. is_range is True if they are a range."""
+    is_range = False
+
+
+def parse_dates(text):
+    """Parse a date (YYYY-MM-DD), a range of dates (e.g. 2016-09-12 to
+    2016-09-16) or a list of dates separated by commas or spaces into a
+    sorted DateList of datetimes. Raises ValueError for anything else."""
+
+    dates = DateList()
+    text = text.strip()
+    if not text:
+        return dates
+
+    match = DATE_RANGE_PATTERN.match(text)
+    if match:
+        from_date = datetime.datetime.strptime(match.group(1), '%Y-%m-%d')
+        to_date = datetime.datetime.strptime(match.group(2), '%Y-%m-%d')
+        if to_date < from_date:
+            raise ValueError('{} is before {}'.format(match.group(2), match.group(1)))
+        dates.extend([from_date, to_date])
+        dates.is_range = True
+        return dates
+
+    for date_str in re.split(r'[\s,;]+', text):
+        dates.append(datetime.datetime.strptime(date_str, '%Y-%m-%d'))
+    dates[:] = sorted(set(dates))
+    return dates
+
+
 def get_todays_date():
     tomorrow = datetime.date.today()
     return tomorrow.strftime('%Y-%m-%d')
@@ -193,13 +421,14 @@ class Counter:
 
 def get_file_from_url(url, output_file_name='output.xml'):
     try:
-        # ignore the ssl certificate
-        context = ssl._create_unverified_context()
-        response = urllib.request.urlopen(url, context=context)
-    except:
+        # ignore the ssl certificate. ttl of 0 so that a cached copy is
+        # always revalidated, the VnP may have been corrected since
+        response = http_client.get(url, endpoint='vnp', ttl=datetime.timedelta(0), verify=False)
+        response.raise_for_status()
+    except Exception:
         print('\nERROR:\tCan\'t get the XML from:\n{}\nCheck the url is right.'.format(url))
         return -1
-    data = response.read()      # a `bytes` object
+    data = response.content      # a `bytes` object
     # text = data.decode('utf-8')  # a `str`; this step can't be used if data is binary
     output_file = open(output_file_name, 'wb')
     output_file.write(data)
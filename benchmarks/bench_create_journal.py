@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""Benchmark create_journal on synthetic VnP data.
+
+Generates a session of synthetic VnP XML (see synthetic_vnp.py), runs a
+from-folder build over it and reports days/sec, items/sec, peak RSS and the
+time spent in each stage. Runs offline. E.g.
+
+    python benchmarks/bench_create_journal.py --days 150 --items-per-day 120
+"""
+
+# std library imports
+import contextlib
+import io
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+# 3rd party imports
+import click
+from lxml import etree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# 1st party imports
+import create_journal
+from package import profiling
+from package.profiling import peak_rss_mb
+from synthetic_vnp import write_session
+
+
+def run_end_to_end(raw_dir: Path, out_dir: Path) -> float:
+    """Run a from-folder build and return the wall time in seconds."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return_code = create_journal.main(
+            raw_xml_dir=raw_dir, save_raw=False, output_file=out_dir
+        )
+    elapsed = time.perf_counter() - start
+    if return_code != 0:
+        raise click.ClickException(f"create_journal.main returned {return_code}")
+    return elapsed
+
+
+def run_stages(raw_dir: Path, out_dir: Path) -> Dict[str, float]:
+    """Run the build once more with profiling on and return seconds per stage."""
+    profiler = profiling.enable()
+    try:
+        run_end_to_end(raw_dir, out_dir)
+    finally:
+        profiling.disable()
+    return {name: stats.wall for name, stats in profiler.stages.items()}
+
+
+@click.command()
+@click.option("--days", default=60, show_default=True, help="Sitting days per session.")
+@click.option(
+    "--items-per-day", default=120, show_default=True, help="Vote items per day."
+)
+@click.option("--repeat", default=3, show_default=True, help="Number of timed runs.")
+@click.option("--seed", default=0, show_default=True, help="Seed for the generator.")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Optionally also write the results to this JSON file.",
+)
+def cli(days: int, items_per_day: int, repeat: int, seed: int, json_path: Optional[Path]):
+    """Benchmark a create_journal from-folder build on synthetic data."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = Path(tmp, "raw")
+        out_dir = Path(tmp, "out")
+        out_dir.mkdir()
+
+        write_session(raw_dir, days, items_per_day, seed)
+        items = sum(
+            len(etree.parse(str(f)).getroot()) for f in raw_dir.glob("*.xml")
+        )
+
+        # best of n
+        wall = min(run_end_to_end(raw_dir, out_dir) for _ in range(repeat))
+        stages = run_stages(raw_dir, out_dir)
+
+    results = {
+        "days": days,
+        "items": items,
+        "seconds": round(wall, 4),
+        "days_per_sec": round(days / wall, 2),
+        "items_per_sec": round(items / wall, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {name: round(secs, 4) for name, secs in stages.items()},
+    }
+
+    print(f"{days} days, {items} vote items (best of {repeat})")
+    print(f"  total:         {wall:.3f} s")
+    print(f"  days/sec:      {results['days_per_sec']}")
+    print(f"  items/sec:     {results['items_per_sec']}")
+    rss = results["peak_rss_mb"]
+    print(f"  peak RSS:      {rss:.1f} MB" if rss is not None else "  peak RSS:      n/a")
+    print("  stages:")
+    for name, secs in stages.items():
+        print(f"    {name:<14} {secs:.3f} s")
+
+    if json_path is not None:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to: {json_path.absolute()}")
+
+
+if __name__ == "__main__":
+    cli()
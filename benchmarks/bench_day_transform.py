@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""Compare the Python and XSLT day transform engines on synthetic VnP XML.
+
+Generates a session of synthetic VnP days (see synthetic_vnp.py), checks
+that both engines give the same output for each day and then times each of
+them transforming all the days, for the journal and VnP profiles. Parsing
+the input is not timed. Runs offline. E.g.
+
+    python benchmarks/bench_day_transform.py --days 60 --items-per-day 120
+"""
+
+# std library imports
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# 3rd party imports
+import click
+from lxml import etree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# 1st party imports
+from Python_Resources import day_transform, day_transform_xslt
+from synthetic_vnp import generate_day, sitting_dates
+
+ENGINES: Dict[str, Callable] = {
+    "python": day_transform.transform_day,
+    "xslt": day_transform_xslt.transform_day,
+}
+
+
+def transform_all(engine: Callable, profile, days: List[bytes], dates) -> List[bytes]:
+    return [
+        etree.tostring(engine(etree.fromstring(day), profile, date, i == 0))
+        for i, (day, date) in enumerate(zip(days, dates))
+    ]
+
+
+def time_engine(engine: Callable, profile, days: List[bytes], dates) -> float:
+    roots = [etree.fromstring(day) for day in days]
+    start = time.perf_counter()
+    for i, (root, date) in enumerate(zip(roots, dates)):
+        engine(root, profile, date, i == 0)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option("--days", default=60, show_default=True, help="Number of sitting days.")
+@click.option(
+    "--items-per-day", default=120, show_default=True, help="Vote items per day."
+)
+@click.option("--repeat", default=3, show_default=True, help="Number of timed runs.")
+@click.option("--seed", default=0, show_default=True, help="Seed for the generator.")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Optionally also write the results to this JSON file.",
+)
+def cli(days: int, items_per_day: int, repeat: int, seed: int, json_path: Optional[Path]):
+    """Compare the day transform engines on synthetic data."""
+
+    dates = sitting_dates(days)
+    raw_days = [
+        generate_day(date, i, items_per_day, seed) for i, date in enumerate(dates, start=1)
+    ]
+
+    # compile the stylesheet before timing
+    day_transform_xslt.get_xslt()
+
+    results: Dict[str, Dict] = {}
+    for profile in day_transform.PROFILES.values():
+        outputs = {
+            name: transform_all(engine, profile, raw_days, dates)
+            for name, engine in ENGINES.items()
+        }
+        if outputs["python"] != outputs["xslt"]:
+            different = sum(a != b for a, b in zip(outputs["python"], outputs["xslt"]))
+            raise click.ClickException(
+                f"The engines differ on {different} of {days} days ({profile.name} profile)"
+            )
+
+        print(f"{profile.name} profile, {days} days of {items_per_day} items (best of {repeat})")
+        for name, engine in ENGINES.items():
+            secs = min(time_engine(engine, profile, raw_days, dates) for _ in range(repeat))
+            results[f"{profile.name}_{name}"] = {
+                "seconds": round(secs, 4),
+                "days_per_sec": round(days / secs, 1),
+                "ms_per_day": round(secs / days * 1000, 2),
+            }
+            print(f"  {name:<7} {secs:.3f} s ({days / secs:.1f} days/sec)")
+
+    if json_path is not None:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to: {json_path.absolute()}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""Benchmark a create_journal from-api build against the local stand-in server.
+
+Generates synthetic API fixtures, serves them with package/stand_in_server.py
+(optionally with latency, errors and rate limiting) and times a complete
+`create_journal.py from-api 2017-19` run in a subprocess. E.g.
+
+    python benchmarks/bench_from_api.py --days 30 --latency 0.05 --error-rate 0.01
+"""
+
+# std library imports
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+# 3rd party imports
+import click
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# 1st party imports
+from package.stand_in_server import StandInServer
+from synthetic_vnp import write_api_fixtures
+
+
+@click.command()
+@click.option("--days", default=30, show_default=True, help="Sitting days to serve.")
+@click.option("--items-per-day", default=120, show_default=True)
+@click.option("--latency", default=0.0, show_default=True, help="Seconds per response.")
+@click.option("--jitter", default=0.0, show_default=True)
+@click.option("--error-rate", default=0.0, show_default=True)
+@click.option("--rate-limit", type=float, default=None)
+@click.option(
+    "--max-concurrency",
+    type=int,
+    default=None,
+    help="Passed to create_journal.py (the most requests at once).",
+)
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Optionally also write the results to this JSON file.",
+)
+def cli(
+    days: int,
+    items_per_day: int,
+    latency: float,
+    jitter: float,
+    error_rate: float,
+    rate_limit: Optional[float],
+    max_concurrency: Optional[int],
+    json_path: Optional[Path],
+):
+    """Time a from-api build served by the stand-in server."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = Path(tmp, "fixtures")
+        write_api_fixtures(fixtures, days, items_per_day)
+
+        with StandInServer(
+            fixtures,
+            latency=latency,
+            jitter=jitter,
+            error_rate=error_rate,
+            rate_limit=rate_limit,
+            seed=0,
+        ) as server:
+            env = dict(
+                os.environ,
+                **server.environ(),
+                COMMONS_JOURNAL_CACHE_DIR=str(Path(tmp, "cache")),
+            )
+            args = [sys.executable, "create_journal.py"]
+            if max_concurrency is not None:
+                args += ["--max-concurrency", str(max_concurrency)]
+            start = time.perf_counter()
+            result = subprocess.run(
+                [
+                    *args,
+                    "from-api",
+                    "2017-19",
+                    "--discard-raw-xml",
+                    "--output",
+                    str(Path(tmp, "out")),
+                ],
+                cwd=REPO_ROOT,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            wall = time.perf_counter() - start
+
+    results = {
+        "days": days,
+        "return_code": result.returncode,
+        "seconds": round(wall, 3),
+        "days_per_sec": round(days / wall, 2),
+        "server": server.stats,
+    }
+
+    print(f"from-api build of {days} days: {wall:.2f} s ({results['days_per_sec']} days/sec)")
+    print(f"exit code {result.returncode}, server stats: {server.stats}")
+    # the build's HTTP summary, including how many requests it made at once
+    if "HTTP:" in result.stdout:
+        print(result.stdout[result.stdout.index("HTTP:"):].strip())
+    if result.returncode != 0:
+        print(result.stdout[-2000:])
+        print(result.stderr[-2000:])
+
+    if json_path is not None:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to: {json_path.absolute()}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""Benchmark transform_journal_html on a synthetic InDesign HTML export.
+
+Generates a session of synthetic InDesign HTML (see synthetic_journal_html.py)
+and times transforming it, both one part at a time in this process (to
+measure the per-element work) and as a whole multi-part build. Runs
+offline. E.g.
+
+    python benchmarks/bench_transform_journal_html.py --days 150 --parts 4
+"""
+
+# std library imports
+import contextlib
+import io
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Optional
+
+# 3rd party imports
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# 1st party imports
+from package.profiling import peak_rss_mb
+from synthetic_journal_html import write_export
+import transform_journal_html
+
+
+@click.command()
+@click.option("--days", default=150, show_default=True, help="Sitting days in the session.")
+@click.option(
+    "--paragraphs-per-day", default=250, show_default=True, help="Paragraphs per day."
+)
+@click.option("--parts", default=4, show_default=True, help="Number of exported parts.")
+@click.option("--repeat", default=3, show_default=True, help="Number of timed runs.")
+@click.option("--seed", default=0, show_default=True, help="Seed for the generator.")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Optionally also write the results to this JSON file.",
+)
+def cli(
+    days: int,
+    paragraphs_per_day: int,
+    parts: int,
+    repeat: int,
+    seed: int,
+    json_path: Optional[Path],
+):
+    """Benchmark transform_journal_html on synthetic data."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        part_paths = write_export(Path(tmp, "export"), days, paragraphs_per_day, parts, seed)
+        export_bytes = sum(p.stat().st_size for p in part_paths)
+
+        def transform_serially() -> float:
+            start = time.perf_counter()
+            for part in part_paths:
+                transform_journal_html.transform_part(part)
+            return time.perf_counter() - start
+
+        def build() -> float:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                transform_journal_html.transform_parts(
+                    part_paths, output_path=Path(tmp, "output.html")
+                )
+            return time.perf_counter() - start
+
+        # best of n
+        with contextlib.redirect_stdout(io.StringIO()):
+            serial = min(transform_serially() for _ in range(repeat))
+        wall = min(build() for _ in range(repeat))
+        output_bytes = Path(tmp, "output.html").stat().st_size
+
+    paragraphs = days * paragraphs_per_day
+    results = {
+        "days": days,
+        "parts": parts,
+        "export_mb": round(export_bytes / 1e6, 2),
+        "output_mb": round(output_bytes / 1e6, 2),
+        "transform_seconds": round(serial, 4),
+        "paragraphs_per_sec": round(paragraphs / serial, 1),
+        "build_seconds": round(wall, 4),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(
+        f"{days} days, ~{paragraphs} paragraphs in {parts} parts "
+        f"({results['export_mb']} MB) (best of {repeat})"
+    )
+    print(f"  transform parts serially: {serial:.3f} s ({results['paragraphs_per_sec']} paragraphs/sec)")
+    print(f"  whole build:              {wall:.3f} s")
+    rss = results["peak_rss_mb"]
+    print(f"  peak RSS:                 {rss:.1f} MB" if rss is not None else "  peak RSS:      n/a")
+
+    if json_path is not None:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to: {json_path.absolute()}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""Compare the memory used per vote item by VoteItem records and element trees.
+
+Generates a session of synthetic VnP XML (see synthetic_vnp.py) and, in a
+new process for each, holds every day of it as
+  * tree:    the lxml element tree of the day (as the XSLT engine needs), or
+  * records: the day's VoteItem records (see Python_Resources/vote_items.py)
+and reports how much the peak RSS grew, in bytes per vote item. Runs
+offline. E.g.
+
+    python benchmarks/bench_vote_items.py --days 150 --items-per-day 120
+"""
+
+# std library imports
+import gc
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tracemalloc
+from typing import Dict, Optional
+
+# 3rd party imports
+import click
+from lxml import etree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# 1st party imports
+from package.profiling import peak_rss_mb
+from Python_Resources import vote_items
+from synthetic_vnp import generate_day, sitting_dates
+
+HOLDERS = {
+    "tree": etree.fromstring,
+    "records": vote_items.parse,
+}
+
+
+def measure(holder: str, days: int, items_per_day: int) -> Dict[str, Optional[float]]:
+    """Hold the session as holder and return the growth in peak RSS."""
+
+    contents = [
+        generate_day(sitting_date, i + 1, items_per_day)
+        for i, sitting_date in enumerate(sitting_dates(days))
+    ]
+    parse = HOLDERS[holder]
+    # warm up, so that the first parse does not count lxml's own set up
+    parse(contents[0])
+    gc.collect()
+
+    before = peak_rss_mb()
+    held = [parse(content) for content in contents]
+    gc.collect()
+    after = peak_rss_mb()
+
+    results: Dict[str, Optional[float]] = {
+        "rss_growth_mb": None if before is None or after is None else after - before
+    }
+    if holder == "records":
+        # the records are all Python objects, so tracemalloc sees all of them
+        vote_items.clear_shared_text()
+        tracemalloc.start()
+        held = [parse(content) for content in contents]
+        results["python_bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    del held
+    return results
+
+
+def count_items(days: int, items_per_day: int) -> int:
+    return sum(
+        len(vote_items.parse(generate_day(sitting_date, i + 1, items_per_day)))
+        for i, sitting_date in enumerate(sitting_dates(days))
+    )
+
+
+@click.command()
+@click.option("--days", default=150, show_default=True, help="Number of sitting days.")
+@click.option("--items-per-day", default=120, show_default=True, help="Vote items per day.")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Also write the results to this JSON file.",
+)
+@click.option("--measure", "only", type=click.Choice(list(HOLDERS)), hidden=True)
+def cli(days: int, items_per_day: int, json_path: Optional[Path], only: Optional[str]):
+    if only is not None:
+        # in a new process, see below
+        print(json.dumps(measure(only, days, items_per_day)))
+        return
+
+    items = count_items(days, items_per_day)
+    results = {"days": days, "items": items}
+    print(f"{days} days, {items} vote items")
+    for holder in HOLDERS:
+        # a new process for each, so each starts from the same peak RSS
+        completed = subprocess.run(
+            [sys.executable, __file__, "--days", str(days), "--items-per-day",
+             str(items_per_day), "--measure", holder],
+            capture_output=True, text=True, check=True,
+        )
+        measured = json.loads(completed.stdout)
+        growth = measured["rss_growth_mb"]
+        bytes_per_item = None if growth is None else round(growth * 1024 * 1024 / items)
+        results[holder] = dict(measured, bytes_per_item=bytes_per_item)
+
+        line = f"  {holder + ':':<9}"
+        line += "n/a" if growth is None else f"{growth:7.1f} MB  {bytes_per_item:>6} bytes/item"
+        if "python_bytes" in measured:
+            line += f"  ({measured['python_bytes'] / items:.0f} bytes/item on the Python heap)"
+        print(line)
+
+    if json_path is not None:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to: {json_path.absolute()}")
+
+
+if __name__ == "__main__":
+    cli()
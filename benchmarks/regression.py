@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+"""Check that the tools give the same output, at the same speed, as before.
+
+Runs recorded and synthetic inputs through create_journal.py (from-folder),
+make_papers_index.py (from-file) and transform_journal_html.py, each in a
+subprocess as they are run for real. Then
+
+  * the output is canonicalized (C14N) and compared with the golden file in
+    tests/golden/, and
+  * the wall time (best of --repeat runs) and peak memory of the process are
+    compared with benchmarks/baselines.json.
+
+Exits with an error if any output differs or if a case is slower, or uses
+more memory, than its baseline by more than the tolerance. A case only
+counts as slower if it is also more than --slack seconds (default 0.1)
+slower, as the cases are short and starting a process alone can vary by
+tens of ms. E.g.
+
+    python benchmarks/regression.py
+    python benchmarks/regression.py --update-golden      # after an intended change
+    python benchmarks/regression.py --update-baseline    # on the machine that runs the checks
+
+The baselines depend on the machine, so record them on the machine that
+runs the checks. make_papers_index.py looks up sitting dates, so it is run
+against the stand-in server (package/stand_in_server.py).
+"""
+
+# std library imports
+import difflib
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# 3rd party imports
+import click
+from lxml import etree
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# 1st party imports
+from package.stand_in_server import StandInServer
+from synthetic_journal_html import write_export
+from synthetic_papers import write_papers
+from synthetic_vnp import write_session
+
+FIXTURES = REPO_ROOT / "tests" / "fixtures" / "api"
+GOLDEN_DIR = REPO_ROOT / "tests" / "golden"
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+
+DEFAULT_TOLERANCE = 0.25  # fraction slower (or bigger) than the baseline
+DEFAULT_SLACK = 0.1  # seconds slower than the baseline that are never a failure
+
+
+class Case(NamedTuple):
+    name: str
+    # writes any input into the folder and returns (command line, output path)
+    prepare: Callable[[Path], Tuple[List[str], Path]]
+    html: bool = False
+    # needs the stand-in server for the web services
+    stand_in: bool = False
+
+
+def _journal_fixtures(folder: Path) -> Tuple[List[str], Path]:
+    args = ["create_journal.py", "from-folder", str(FIXTURES / "vnp"), "-o", str(folder)]
+    return args, folder / "session_None_for_id.xml"
+
+
+def _journal_synthetic(folder: Path) -> Tuple[List[str], Path]:
+    write_session(folder / "vnp", days=20, items_per_day=60, seed=0)
+    args = ["create_journal.py", "from-folder", str(folder / "vnp"), "-o", str(folder)]
+    return args, folder / "session_None_for_id.xml"
+
+
+def _papers_fixture(folder: Path) -> Tuple[List[str], Path]:
+    output = folder / "papers.xml"
+    args = ["make_papers_index.py", "from-file", str(FIXTURES / "paperslaid" / "daily.xml")]
+    return args + ["-o", str(output)], output
+
+
+def _papers_synthetic(folder: Path) -> Tuple[List[str], Path]:
+    raw = write_papers(folder / "papers_laid.xml", papers=600, seed=0)
+    output = folder / "papers.xml"
+    return ["make_papers_index.py", "from-file", str(raw), "-o", str(output)], output
+
+
+def _journal_html(folder: Path) -> Tuple[List[str], Path]:
+    parts = write_export(folder / "export", days=20, paragraphs_per_day=80, parts=2, seed=0)
+    output = folder / "journal.html"
+    args = ["transform_journal_html.py", *map(str, parts), "-o", str(output), "--jobs", "1"]
+    return args, output
+
+
+CASES: Dict[str, Case] = {
+    case.name: case
+    for case in (
+        Case("journal_fixtures", _journal_fixtures),
+        Case("journal_synthetic", _journal_synthetic),
+        Case("papers_fixture", _papers_fixture, stand_in=True),
+        Case("papers_synthetic", _papers_synthetic, stand_in=True),
+        Case("journal_html", _journal_html, html=True),
+    )
+}
+
+
+class Result(NamedTuple):
+    output: bytes  # canonicalized
+    wall_s: float
+    peak_rss_mb: Optional[float]
+
+
+def canonicalize(file_path: Path, html: bool = False) -> bytes:
+    parser = etree.HTMLParser() if html else None
+    return etree.tostring(etree.parse(str(file_path), parser), method="c14n")
+
+
+def _run(args: List[str], env: Dict[str, str], cwd: Path) -> Tuple[float, Optional[float]]:
+    """Run a tool and return its wall time and peak memory (MB)."""
+
+    command = [sys.executable, str(REPO_ROOT / args[0]), *args[1:]]
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=stderr
+        )
+        if hasattr(os, "wait4"):
+            # the resource usage of just this process
+            _, status, usage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # bytes on macOS, kilobytes on Linux
+            peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+            wall = time.perf_counter() - start
+            peak = None
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise click.ClickException(
+                f"{' '.join(args)} failed:\n{stderr.read().decode(errors='replace')}"
+            )
+    return wall, peak
+
+
+def run_case(case: Case, repeat: int) -> Result:
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        args, output_path = case.prepare(folder)
+        # a fresh cache so every run does the same work
+        env = dict(os.environ, COMMONS_JOURNAL_CACHE_DIR=str(folder / "cache"))
+        env.pop("COMMONS_JOURNAL_EVENT_LOG", None)
+
+        server = StandInServer(FIXTURES).start() if case.stand_in else None
+        try:
+            if server is not None:
+                env.update(server.environ())
+            runs = [_run(args, env, folder) for _ in range(repeat)]
+        finally:
+            if server is not None:
+                server.stop()
+
+        output = canonicalize(output_path, case.html)
+
+    peaks = [peak for _, peak in runs if peak is not None]
+    return Result(output, min(wall for wall, _ in runs), min(peaks) if peaks else None)
+
+
+def golden_path(case: Case) -> Path:
+    return GOLDEN_DIR / f"{case.name}.{'html' if case.html else 'xml'}"
+
+
+def diff(expected: bytes, actual: bytes, lines: int = 30) -> str:
+    # c14n keeps the line breaks of the output, so this is a line diff
+    return "\n".join(
+        list(
+            difflib.unified_diff(
+                expected.decode("utf-8").splitlines(),
+                actual.decode("utf-8").splitlines(),
+                "golden",
+                "output",
+                lineterm="",
+            )
+        )[:lines]
+    )
+
+
+def load_baselines() -> Dict:
+    try:
+        return json.loads(BASELINES_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"machine": None, "cases": {}}
+
+
+def machine() -> str:
+    return f"{platform.system()} {platform.machine()}, Python {platform.python_version()}"
+
+
+@click.command()
+@click.argument("case_names", nargs=-1, type=click.Choice(list(CASES)))
+@click.option("--repeat", default=5, show_default=True, help="Timed runs of each case (the best is used).")
+@click.option(
+    "--tolerance",
+    default=DEFAULT_TOLERANCE,
+    show_default=True,
+    help="How much slower (or bigger), as a fraction, a case can be than its baseline.",
+)
+@click.option(
+    "--slack",
+    default=DEFAULT_SLACK,
+    show_default=True,
+    help="A case must also be this many seconds slower than its baseline to fail.",
+)
+@click.option("--update-golden", is_flag=True, help="Replace the golden files with the output.")
+@click.option("--update-baseline", is_flag=True, help="Replace the baselines with these results.")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Optionally also write the results to this JSON file.",
+)
+def cli(
+    case_names: Tuple[str, ...],
+    repeat: int,
+    tolerance: float,
+    slack: float,
+    update_golden: bool,
+    update_baseline: bool,
+    json_path: Optional[Path],
+):
+    """Compare the output and performance of the tools with the golden files
+    and baselines. Runs all cases unless CASE_NAMES are given."""
+
+    baselines = load_baselines()
+    if baselines["cases"] and baselines["machine"] != machine() and not update_baseline:
+        print(f"Warning: the baselines were recorded on {baselines['machine']}")
+
+    failures: List[str] = []
+    results: Dict[str, Dict] = {}
+
+    for name in case_names or CASES:
+        case = CASES[name]
+        result = run_case(case, repeat)
+        results[name] = {"wall_s": round(result.wall_s, 4), "peak_rss_mb": result.peak_rss_mb}
+
+        golden = golden_path(case)
+        if update_golden:
+            GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+            golden.write_bytes(result.output)
+            output_status = "updated"
+        elif not golden.exists():
+            failures.append(f"{name}: there is no golden file ({golden})")
+            output_status = "no golden"
+        elif golden.read_bytes() != result.output:
+            failures.append(f"{name}: the output differs from {golden}\n{diff(golden.read_bytes(), result.output)}")
+            output_status = "DIFFERS"
+        else:
+            output_status = "same"
+
+        baseline = baselines["cases"].get(name)
+        perf_status = ""
+        if baseline is not None and not update_baseline:
+            change = result.wall_s / baseline["wall_s"] - 1
+            perf_status = f"{change:+.0%} time"
+            if change > tolerance and result.wall_s - baseline["wall_s"] > slack:
+                failures.append(
+                    f"{name}: {result.wall_s:.3f} s is {change:.0%} slower than the baseline"
+                    f" ({baseline['wall_s']:.3f} s)"
+                )
+            if result.peak_rss_mb is not None and baseline.get("peak_rss_mb"):
+                growth = result.peak_rss_mb / baseline["peak_rss_mb"] - 1
+                perf_status += f", {growth:+.0%} memory"
+                if growth > tolerance:
+                    failures.append(
+                        f"{name}: {result.peak_rss_mb:.1f} MB peak memory is {growth:.0%} more"
+                        f" than the baseline ({baseline['peak_rss_mb']:.1f} MB)"
+                    )
+
+        peak = f"{result.peak_rss_mb:.1f} MB" if result.peak_rss_mb is not None else "n/a"
+        print(f"{name:<20} output {output_status:<10} {result.wall_s:>7.3f} s {peak:>10}  {perf_status}")
+
+    if update_baseline:
+        baselines["machine"] = machine()
+        baselines["cases"].update(results)
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2) + "\n", encoding="utf-8")
+        print(f"Baselines written to: {BASELINES_PATH}")
+
+    if json_path is not None:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to: {json_path.absolute()}")
+
+    if failures:
+        raise click.ClickException("\n".join(failures))
+
+
+if __name__ == "__main__":
+    cli()
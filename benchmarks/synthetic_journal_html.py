@@ -0,0 +1,143 @@
+"""Generate realistic looking InDesign HTML exports of the journal.
+
+The HTML mimics what InDesign exports for the journal body: text frames
+(<div>s) of paragraphs with paragraph style classes such as
+Journal_VotesDate and Journal_Vote-Item-Numbered, character style spans
+(Bold, Italic, DateForHeader), ballot number markers, budget resolutions and
+tables. Output is generated from a seeded random number generator so the
+same arguments always produce byte for byte the same files.
+"""
+
+from pathlib import Path
+import random
+from typing import List
+
+from synthetic_vnp import _sentence, sitting_dates, WORDS
+
+
+HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+    "<!DOCTYPE html>\n"
+    '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en-GB" lang="en-GB">\n'
+    "<head><title>Journal-Body</title>"
+    '<meta charset="utf-8" />'
+    '<link href="css/idGeneratedStyles.css" rel="stylesheet" type="text/css" />'
+    "</head>\n"
+    '<body id="Journal-Body" lang="en-GB">\n'
+)
+TAIL = "</body>\n</html>\n"
+
+
+def _runs(rng: random.Random) -> str:
+    """A paragraph's content with some character style spans."""
+    runs = []
+    for _ in range(rng.randint(1, 4)):
+        roll = rng.random()
+        text = _sentence(rng, 2, 12)
+        if roll < 0.25:
+            runs.append(f'<span class="Bold">{text}</span> ')
+        elif roll < 0.4:
+            runs.append(f'<span class="Italic">{text}</span> ')
+        else:
+            runs.append(f"{text} ")
+    return "".join(runs)
+
+
+def _table(rng: random.Random) -> str:
+    cols = rng.randint(2, 5)
+    rows = []
+    for r in range(rng.randint(3, 10)):
+        cells = "".join(
+            f'<td class="Basic-Table _idGenCellStyle-{c % 2}">'
+            f'<p class="Journal_Table-Body" lang="en-GB">'
+            + (f'<span class="Bold">Col {c}</span>' if r == 0 else f"{rng.choice(WORDS)} {rng.randint(1, 999)}")
+            + "</p></td>"
+            for c in range(cols)
+        )
+        rows.append(f'<tr class="Basic-Table _idGenTableRowColumn-{r % 3}">{cells}</tr>')
+    col = '<col class="_idGenTableRowColumn-1" />'
+    return (
+        f'<table id="table-{rng.randint(0, 10**6)}" class="Basic-Table">'
+        + f"<colgroup>{col * cols}</colgroup>"
+        + "<tbody>"
+        + "".join(rows)
+        + "</tbody></table>"
+    )
+
+
+def _day(rng: random.Random, day_number: int, date_text: str, paragraphs: int) -> List[str]:
+    elements = [
+        f'<p class="Journal_DaySep" lang="en-GB">No. {day_number}</p>',
+        f'<p class="Journal_VotesDate" lang="en-GB"><span class="DateForHeader">{date_text}</span></p>',
+        '<p class="BodyIndented" lang="en-GB">The House met at 11.30 am.</p>',
+        '<p class="Journal_Line-Below" lang="en-GB">PRAYERS</p>',
+    ]
+    number = 0
+    for _ in range(max(paragraphs - 6, 0)):
+        roll = rng.random()
+        if roll < 0.08:
+            elements.append(
+                f'<p class="Journal_Heading-Line-Before" lang="en-GB">{_sentence(rng, 2, 6)}</p>'
+            )
+        elif roll < 0.12:
+            elements.append(f'<p class="Journal_Line-Above" lang="en-GB">{_sentence(rng, 2, 6)}</p>')
+        elif roll < 0.45:
+            number += 1
+            restart = "-Restart" if number == 1 else ""
+            elements.append(
+                f'<p class="Journal_Vote-Item-Numbered{restart}" lang="en-GB">'
+                f'<span class="_idGenBNMarker-1">{number}</span>{_runs(rng)}</p>'
+            )
+        elif roll < 0.5:
+            level = rng.randint(2, 5)
+            elements.append(
+                f'<p class="Budget-Resolutions_outdent{level}" lang="en-GB">'
+                f"\t({rng.choice('abcdefgh')})\t{_sentence(rng)}</p>"
+            )
+        elif roll < 0.53:
+            elements.append(_table(rng))
+        else:
+            elements.append(f'<p class="BodyIndented" lang="en-GB">{_runs(rng)}</p>')
+    elements.append(
+        '<p class="Journal_SpeakersCertificates" lang="en-GB">Speaker’s Certificates</p>'
+    )
+    elements.append(f'<p class="BodyIndented" lang="en-GB">{_sentence(rng)}</p>')
+    return elements
+
+
+def generate_export(days: int, paragraphs_per_day: int, seed: int = 0) -> List[str]:
+    """Return the elements (as HTML strings) of a session of journal days."""
+
+    rng = random.Random(seed)
+    elements: List[str] = []
+    for i, sitting_date in enumerate(sitting_dates(days), start=1):
+        date_text = f"{sitting_date:%A %d %B %Y}"
+        elements.extend(_day(rng, i, date_text, paragraphs_per_day))
+    return elements
+
+
+def write_export(
+    folder: Path, days: int, paragraphs_per_day: int, parts: int = 1, seed: int = 0
+) -> List[Path]:
+    """Write a session of synthetic InDesign HTML into folder, split into
+    `parts` files (named Journal-Body_PartN.html) at arbitrary points, as
+    InDesign does. Each part has several text frames. Return the paths."""
+
+    folder.mkdir(parents=True, exist_ok=True)
+    elements = generate_export(days, paragraphs_per_day, seed)
+
+    paths = []
+    per_part = -(-len(elements) // parts)
+    for p in range(parts):
+        chunk = elements[p * per_part : (p + 1) * per_part]
+        frames = []
+        for f in range(0, len(chunk), 200):
+            frames.append(
+                f'<div id="_idContainer{p:03d}{f:05d}" class="Basic-Text-Frame">'
+                + "\n".join(chunk[f : f + 200])
+                + "</div>\n"
+            )
+        file_path = folder / f"Journal-Body_Part{p + 1}.html"
+        file_path.write_text(HEAD + "".join(frames) + TAIL, encoding="utf-8")
+        paths.append(file_path)
+    return paths
@@ -0,0 +1,91 @@
+"""Generate realistic looking papers laid XML for benchmarking and testing.
+
+The XML mimics what the papers laid API returns (ArrayOfDailyPapers), for
+papers laid on the first few sitting days of the 2017-19 session, as served
+by package/stand_in_server.py. Everything is generated from a seeded random
+number generator so the same arguments always produce the same file.
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+import random
+
+from lxml import etree
+from lxml.etree import SubElement
+
+
+XSI = "http://www.w3.org/2001/XMLSchema-instance"
+
+SIDE_TITLES = (
+    "Agriculture", "Animals", "Civil Aviation", "Corporation Tax", "Customs",
+    "Education", "Electricity", "Environmental Protection", "Financial Services and Markets",
+    "Health and Social Care", "Income Tax", "Local Government", "Northern Ireland",
+    "Pensions", "Road Traffic", "Social Security", "Transport", "Water Industry",
+)
+
+SUBJECTS = (
+    "Accounts", "Amendment", "Charges", "Commencement", "Consequential Provisions",
+    "Fees", "Miscellaneous Provisions", "Regulations", "Revocation", "Transitional Provisions",
+)
+
+PAPER_TYPES = ("Statutory Instrument", "Command Paper", "Act Paper", "Unnumbered Act Paper")
+
+
+def _text(parent, tag: str, text: str):
+    SubElement(parent, tag).text = text
+
+
+def _nil(parent, tag: str):
+    SubElement(parent, tag, {f"{{{XSI}}}nil": "true"})
+
+
+def generate_papers(
+    papers: int, days: int = 3, start: datetime = datetime(2017, 6, 21), seed: int = 0
+) -> bytes:
+    """Return the bytes of papers laid XML with `papers` papers laid over
+    `days` days from start. A few papers are duplicated (as in the API),
+    withdrawn, drafts or have a subject heading."""
+
+    rng = random.Random(seed)
+    root = etree.Element("ArrayOfDailyPapers", nsmap={"xsi": XSI})
+
+    per_day = -(-papers // days)
+    paper_id = 30000
+    for d in range(days):
+        date_str = f"{start + timedelta(days=d):%Y-%m-%d}T00:00:00"
+        daily = SubElement(root, "DailyPapers")
+        _text(daily, "Date", date_str)
+        published = SubElement(daily, "PublishedPapers")
+
+        for _ in range(min(per_day, papers - d * per_day)):
+            paper_id += 1
+            repeats = 2 if rng.random() < 0.05 else 1
+            side_title = rng.choice(SIDE_TITLES)
+            year = str(rng.choice((2016, 2017)))
+            is_draft = rng.random() < 0.3
+            title = f"{side_title} ({rng.choice(SUBJECTS)}) Order"
+
+            for _ in range(repeats):
+                paper = SubElement(published, "Paper")
+                _text(paper, "Id", str(paper_id))
+                _text(paper, "DateLaidCommons", date_str)
+                if rng.random() < 0.05:
+                    _text(paper, "DateWithdrawn", f"{start + timedelta(days=days + 2):%Y-%m-%d}T00:00:00")
+                else:
+                    _nil(paper, "DateWithdrawn")
+                _text(paper, "Title", title)
+                _text(paper, "SideTitle", side_title)
+                _text(paper, "Year", year)
+                _text(paper, "Draft", "true" if is_draft else "false")
+                if rng.random() < 0.2:
+                    draft = "Draft " if is_draft else ""
+                    _text(paper, "SubjectHeading", f"{draft}{title} {year}")
+                _text(paper, "PaperType", rng.choice(PAPER_TYPES))
+
+    return etree.tostring(root, xml_declaration=True, encoding="utf-8", pretty_print=True)
+
+
+def write_papers(file_path: Path, papers: int, days: int = 3, seed: int = 0) -> Path:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_bytes(generate_papers(papers, days, seed=seed))
+    return file_path
@@ -0,0 +1,206 @@
+"""Generate realistic looking VnP XML for benchmarking and testing.
+
+The XML mimics what the VnP API returns for one sitting day: a list of
+VoteItemViewModel elements whose VoteEntry contains escaped HTML.
+Everything is generated from a seeded random number generator so the same
+arguments always produce byte for byte the same files.
+"""
+
+from datetime import datetime, timedelta
+import json
+from pathlib import Path
+import random
+import shutil
+from typing import List, Optional
+
+from lxml import etree
+from lxml.etree import SubElement
+
+
+XSI = "http://www.w3.org/2001/XMLSchema-instance"
+
+# a few entries from whatson calendar/sessions/list.json
+SESSIONS = [
+    {"SessionId": 28, "CommonsDescription": "2015-16", "StartDate": "2015-05-18T00:00:00", "EndDate": "2016-05-12T00:00:00"},
+    {"SessionId": 29, "CommonsDescription": "2016-17", "StartDate": "2016-05-18T00:00:00", "EndDate": "2017-04-27T00:00:00"},
+    {"SessionId": 30, "CommonsDescription": "2017-19", "StartDate": "2017-06-21T00:00:00", "EndDate": "2019-10-08T00:00:00"},
+    {"SessionId": 31, "CommonsDescription": "2019", "StartDate": "2019-10-14T00:00:00", "EndDate": "2019-11-06T00:00:00"},
+    {"SessionId": 32, "CommonsDescription": "2019-21", "StartDate": "2019-12-17T00:00:00", "EndDate": "2021-04-29T00:00:00"},
+]
+
+SECTIONS = ("Chamber", "Westminster Hall", "Other Proceedings")
+
+WORDS = (
+    "the House agreed motion that bill be now read a second time committee "
+    "question put and agreed to resolved amendment proposed negatived Secretary "
+    "of State Minister orders regulations laid papers select report ordered "
+    "printed accounts statutory instrument Northern Ireland Scotland Wales"
+).split()
+
+INDENTS = (30, 60, 90, 120, 150)
+
+
+def _sentence(rng: random.Random, min_words: int = 6, max_words: int = 30) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def _table(rng: random.Random, nested: bool = True) -> str:
+    cols = rng.randint(2, 4)
+    rows = []
+    # first row in italics so it gets promoted to a header
+    rows.append("<tr>" + "".join(f"<td><em>Col {c}</em></td>" for c in range(cols)) + "</tr>")
+    for _ in range(rng.randint(2, 6)):
+        cells = []
+        for _ in range(cols):
+            if nested and rng.random() < 0.1:
+                cells.append(f"<td>{_table(rng, nested=False)}</td>")
+            else:
+                cells.append(f"<td>{rng.choice(WORDS)} {rng.randint(1, 999)}</td>")
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    return "<table><tbody>" + "".join(rows) + "</tbody></table>"
+
+
+def _business_item(rng: random.Random) -> str:
+    parts = [f"<p><strong>{_sentence(rng, 3, 8)}</strong></p>", f"<p>{_sentence(rng)}</p>"]
+    for n in range(rng.randint(0, 4)):
+        indent = rng.choice(INDENTS)
+        parts.append(
+            f'<p style="padding-left: {indent}px;">({n + 1}) {_sentence(rng)}</p>'
+        )
+    if rng.random() < 0.3:
+        parts.append(f"<p>{_sentence(rng)}<br />{_sentence(rng)}</p>")
+    if rng.random() < 0.15:
+        parts.append(_table(rng))
+        parts.append("<p>\u00a0</p><p>\u00a0</p>")
+    if rng.random() < 0.2:
+        parts.append('<p class="HalfLine">\u00a0</p>')
+    if rng.random() < 0.1:
+        parts.append(f"<p>{'_' * 20}</p>")
+    return "".join(parts)
+
+
+def _add_item(
+    parent: etree._Element,
+    section: str,
+    entry: str,
+    entry_type: str = "Normal",
+    number: str = "",
+):
+    item = SubElement(parent, "VoteItemViewModel")
+    SubElement(item, "Number").text = number
+    SubElement(item, "Section").text = section
+    # lxml escapes the HTML (e.g. < becomes &lt;) when serialising
+    SubElement(item, "VoteEntry").text = entry
+    SubElement(item, "VoteEntryType").text = entry_type
+
+
+def generate_day(
+    sitting_date: datetime, vnp_number: int, items_per_day: int, seed: int = 0
+) -> bytes:
+    """Return the bytes of one day of VnP XML with items_per_day vote items."""
+
+    rng = random.Random(f"{seed}-{sitting_date:%Y-%m-%d}")
+
+    root = etree.Element("ArrayOfVoteItemViewModel", nsmap={"xsi": XSI})
+
+    _add_item(root, "Chamber", f"No. {vnp_number}", entry_type="Heading")
+    _add_item(
+        root, "Chamber", "<p>The House met at 11.30 am.</p>", entry_type="Heading"
+    )
+    _add_item(root, "Chamber", "<p>PRAYERS</p>", entry_type="Heading")
+
+    section_index = 0
+    number = 0
+    for _ in range(max(items_per_day - 6, 0)):
+        if rng.random() < 0.02 and section_index < len(SECTIONS) - 1:
+            section_index += 1
+        section = SECTIONS[section_index]
+        roll = rng.random()
+        if roll < 0.08:
+            _add_item(root, section, "", entry_type="FullLine")
+        elif roll < 0.15:
+            _add_item(
+                root, section, f"<p>{_sentence(rng, 2, 6)}</p>", entry_type="Heading"
+            )
+        elif roll < 0.22:
+            indent = rng.choice(INDENTS)
+            _add_item(
+                root,
+                section,
+                f'<p style="padding-left: {indent}px">{_sentence(rng)}</p>',
+            )
+        elif roll < 0.27:
+            _add_item(
+                root,
+                section,
+                f'<p style="text-align: center">{_sentence(rng, 2, 5)}</p>',
+            )
+        else:
+            number += 1
+            _add_item(root, section, _business_item(rng), number=str(number))
+
+    _add_item(root, "Certificates and Corrections", "", entry_type="FullLine")
+    _add_item(
+        root,
+        "Certificates and Corrections",
+        '<p style="text-align: center">Speaker’s Certificates</p>',
+        entry_type="Heading",
+    )
+    _add_item(
+        root,
+        "Certificates and Corrections",
+        '<p style="text-align: right;">Lindsay Hoyle</p>'
+        '<p style="text-align: right;">Speaker</p>',
+    )
+
+    return etree.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def sitting_dates(days: int, start: datetime = datetime(2017, 6, 21)) -> List[datetime]:
+    """Return `days` weekday dates starting from `start`."""
+
+    dates = []
+    current = start
+    while len(dates) < days:
+        if current.weekday() < 5:
+            dates.append(current)
+        current += timedelta(days=1)
+    return dates
+
+
+def write_session(
+    folder: Path, days: int, items_per_day: int, seed: int = 0
+) -> List[Path]:
+    """Write a session of synthetic VnP XML files named YYYY-MM-DD.xml into
+    folder. Return the file paths written."""
+
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, sitting_date in enumerate(sitting_dates(days), start=1):
+        file_path = folder / f"{sitting_date:%Y-%m-%d}.xml"
+        file_path.write_bytes(generate_day(sitting_date, i, items_per_day, seed))
+        paths.append(file_path)
+    return paths
+
+
+def write_api_fixtures(
+    folder: Path,
+    days: int,
+    items_per_day: int,
+    seed: int = 0,
+    papers_file: Optional[Path] = None,
+):
+    """Write a fixtures folder for package/stand_in_server.py. The VnP days
+    fall at the start of the 2017-19 session."""
+
+    whatson = folder / "whatson"
+    whatson.mkdir(parents=True, exist_ok=True)
+    (whatson / "sessions.json").write_text(json.dumps(SESSIONS, indent=1), encoding="utf-8")
+
+    write_session(folder / "vnp", days, items_per_day, seed)
+
+    if papers_file is not None:
+        (folder / "paperslaid").mkdir(exist_ok=True)
+        shutil.copyfile(papers_file, folder / "paperslaid" / "daily.xml")
@@ -1,73 +1,188 @@
 #!/usr/bin/env python3
 
 # std library imports
+import json
 import re  # regex
-import ssl
 import sys
-from concurrent.futures import ThreadPoolExecutor
-from copy import deepcopy
+import time
+from collections import OrderedDict
 from datetime import date, datetime, timedelta
-from os import path
+from functools import lru_cache
 from pathlib import Path
-from socket import timeout
-from typing import (Any, Dict, Iterable, List, Optional, Tuple, TypeVar, Union,
-                    cast)
+from typing import (
+    Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+)
 
 # 3rd party imports
 import click
-import requests
 from lxml import etree
-from lxml import html as lhtml
-from lxml.etree import Element, QName, SubElement, _Element, iselement
-from requests import Response
+from lxml.etree import Element, SubElement, _Element
 
 # 1st party imports
-from package.utilities import get_dates_from_session
+from package import endpoints, events, http_client, profiling, validation
+from package.fetch_checkpoint import FetchCheckpoint
+from package.fragment_store import FragmentStore, source_hash
+from package.session_manifest import (
+    Record,
+    SessionManifest,
+    manifest_path_for,
+    write_manifest,
+)
+from package.utilities import get_dates_from_session, get_sitting_dates_in_range
 
 # local imports
 try:
-    import Python_Resources.tables as tables
+    import Python_Resources.day_transform as day_transform
+    import Python_Resources.day_transform_xslt as day_transform_xslt
+    import Python_Resources.vote_items as vote_items
 except ModuleNotFoundError:
-    from . import tables  # type: ignore
-
-T = TypeVar("T")
-
-CONTEXT = ssl._create_unverified_context()
+    from . import day_transform  # type: ignore
+    from . import day_transform_xslt  # type: ignore
+    from . import vote_items  # type: ignore
 
 DEFAULT_OUTPUT_FILENAME = "output.xml"
 DEFAULT_RAW_XML_FOLDER = "datedJournalFragments"
 
-BASE_URL = "http://services.vnp.parliament.uk/voteitems"
+# the engines that can transform a day (they give the same output)
+DAY_TRANSFORMS = {
+    "python": day_transform.transform_day,
+    "xslt": day_transform_xslt.transform_day,
+}
+DEFAULT_ENGINE = "python"
 
-CAL_API_URL_TEMPLATE = "https://whatson-api.parliament.uk/calendar/proceduraldates/commons/nextsittingdate.json?dateToCheck={}&includeWeekendSittings=true"
+# sharded output
+SHARDS_MANIFEST_FILENAME = "manifest.json"
 
-# xml namespaces used
-AID = "http://ns.adobe.com/AdobeInDesign/4.0/"
-AID5 = "http://ns.adobe.com/AdobeInDesign/5.0/"
+# watch mode
+DEFAULT_STORE_FOLDER = "journalDays"
+DEFAULT_INTERVAL = 300  # seconds
+DEFAULT_MAX_INTERVAL = 3600  # seconds
+DEFAULT_RECHECK_DAYS = 3
 
-NS_ADOBE: Dict[str, str] = {"aid": AID, "aid5": AID5}
+# (VnP number, number of vote items, fragment) for a transformed day
+DayResult = Tuple[Optional[str], int, bytes]
+
+# transformed days kept in memory by enable_day_cache(), least recently used
+# first, keyed by (date, engine, sha256 of the VnP XML)
+DAY_CACHE_SIZE = 2000  # days
+_DAY_CACHE: Optional["OrderedDict[Tuple[str, str, str], DayResult]"] = None
+_DAY_CACHE_SIZE = DAY_CACHE_SIZE
+
+BASE_URL = endpoints.VOTE_ITEMS_URL
+
+# xml namespaces used
+NS_ADOBE = day_transform.NS_ADOBE
 
 ns2 = "http://www.w3.org/2001/XMLSchema-instance"
 # ns1 = 'http://www.w3.org/2001/XMLSchema'
 
-# Text before the following should get the speaker style
-chair_titles = ("SPEAKER", "CHAIRMAN OF WAYS AND MEANS", "SPEAKER ELECT")
 
-speaker_certificates = ("speaker's certificate", "speaker’s certificate",
-                        "speaker’s certificates", "speaker's certificates")
 
+# -------------------- Begin comand line interface ------------------- #
 
 
-# -------------------- Begin comand line interface ------------------- #
+def _shard_by(ctx: click.Context, param: click.Parameter, value: Optional[str]):
+    # "month" or a number of sitting days
+    if value is None or value == "month":
+        return value
+    try:
+        days = int(value)
+    except ValueError:
+        days = 0
+    if days < 1:
+        raise click.BadParameter("must be month or a number of sitting days")
+    return days
+
+
+shard_option = click.option(
+    "--shard",
+    "shard_by",
+    callback=_shard_by,
+    metavar="month|N",
+    help=(
+        "Split the output into a shard per month or per N sitting days, written"
+        " to a folder next to the output with a manifest.json. Only shards that"
+        " have changed are rewritten."
+    ),
+)
+
+skip_invalid_option = click.option(
+    "--skip-invalid",
+    is_flag=True,
+    default=False,
+    help=(
+        "Build the journal without the days whose VnP XML is not valid (they are"
+        " listed) rather than stopping."
+    ),
+)
 
 
 @click.group()
-def cli():
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print the time and memory used by each stage of the build.",
+)
+@click.option(
+    "--profile-json",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Also write the profile report to this JSON file (implies --profile).",
+)
+@click.option(
+    "--cprofile",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Also write a cProfile dump to this file (implies --profile).",
+)
+@click.option(
+    "--event-log",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    envvar="COMMONS_JOURNAL_EVENT_LOG",
+    help=(
+        "Append a JSON lines log of the run (timings, counts and a final summary)"
+        " to this file. Can also be set with COMMONS_JOURNAL_EVENT_LOG."
+    ),
+)
+@click.option(
+    "--max-concurrency",
+    type=click.IntRange(min=1),
+    help=(
+        "The most requests to make at once to each web service. How many are"
+        " made is adjusted up to this from how the service responds."
+        f" Can also be set with {http_client.MAX_CONCURRENCY_ENV_VAR}."
+        f" default={http_client.MAX_CONCURRENCY}"
+    ),
+)
+@click.option(
+    "--engine",
+    type=click.Choice(list(DAY_TRANSFORMS)),
+    default=DEFAULT_ENGINE,
+    show_default=True,
+    help="How each day is transformed. xslt uses a compiled XSLT stylesheet.",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    profile: bool,
+    profile_json: Optional[Path],
+    cprofile: Optional[Path],
+    event_log: Optional[Path],
+    max_concurrency: Optional[int],
+    engine: str,
+):
     """To get XML for the journal from the VnP API use from-api subcomand.
     If you have all the XML for each day in the Journal saved in a folder use
     the from-folder subcomand. You can get additional help by typing --help
     after the subcommands, e.g. create_journal.py from-api --help"""
-    pass
+    if profile or profile_json or cprofile:
+        profiling.enable(json_path=profile_json, cprofile_path=cprofile)
+        ctx.call_on_close(profiling.finish)
+    if event_log is not None:
+        events.enable(event_log, tool="create_journal")
+        ctx.call_on_close(lambda: events.finish(http=http_client.stats()))
+    if max_concurrency is not None:
+        http_client.set_max_concurrency(max_concurrency)
+    ctx.obj = {"engine": engine}
 
 
 @cli.command()
@@ -84,7 +199,16 @@ def cli():
     ),
     type=click.Path(writable=True, path_type=Path),
 )
-def from_folder(input_path: Path, output: Optional[Path] = None):
+@shard_option
+@skip_invalid_option
+@click.pass_obj
+def from_folder(
+    obj: dict,
+    input_path: Path,
+    output: Optional[Path] = None,
+    shard_by: Union[str, int, None] = None,
+    skip_invalid: bool = False,
+):
     """Create papers index XML from raw XML files stored in a folder INPUT_PATH
     already on your computer.
 
@@ -96,7 +220,16 @@ def from_folder(input_path: Path, output: Optional[Path] = None):
     If you have not already downloaded VnP XML files, use the from-api
     subcomand instead.
     """
-    sys.exit(main(raw_xml_dir=input_path, save_raw=False, output_file=output))
+    sys.exit(
+        main(
+            raw_xml_dir=input_path,
+            save_raw=False,
+            output_file=output,
+            engine=obj["engine"],
+            shard_by=shard_by,
+            skip_invalid=skip_invalid,
+        )
+    )
 
 
 @cli.command()
@@ -109,9 +242,9 @@ def from_folder(input_path: Path, output: Optional[Path] = None):
 )
 @click.option(
     "--raw-xml-folder",
-    type=click.Path(writable=True, dir_okay=True, file_okay=False),
+    type=click.Path(writable=True, dir_okay=True, file_okay=False, path_type=Path),
     help="Use this option to specify the folder for the raw XML to be saved in"
-    f"default={DEFAULT_RAW_XML_FOLDER}",
+    f" default={DEFAULT_RAW_XML_FOLDER}",
 )
 @click.option(
     "--output",
@@ -120,11 +253,17 @@ def from_folder(input_path: Path, output: Optional[Path] = None):
     help="Use this option to specify the folder for the raw XML to be saved in"
     f" default={DEFAULT_RAW_XML_FOLDER}",
 )
+@shard_option
+@skip_invalid_option
+@click.pass_obj
 def from_api(
+    obj: dict,
     session: str,
     discard_raw_xml: bool,
     raw_xml_folder: Optional[Path],
     output: Union[Path, None] = None,
+    shard_by: Union[str, int, None] = None,
+    skip_invalid: bool = False,
 ):
     """For a given SESSION, create the body of the commons journal
     (to be typeset in InDesign) from data downloaded from the vnp API.
@@ -132,8 +271,14 @@ def from_api(
     SESSION is a parliamentary session and should entered in the form YYYY-YY.
     E.g. 2017-19.
 
-    By default the XML downloaded from vnp will be saved alongside the
-    output. You can stop this behaviour with the --discard-raw-xml flag.
+    By default the XML downloaded from vnp will be saved in the
+    --raw-xml-folder. You can stop this behaviour with the --discard-raw-xml
+    flag.
+
+    If a run stops part way (e.g. the network drops), run it again and it
+    will carry on from where it got to, skipping the days already
+    downloaded. A day whose XML is not valid is asked for again and, if it
+    is still not valid, kept in a quarantine folder in --raw-xml-folder.
 
     You will need to be connected to the parliament network.
     For a list of parliamentary sessions check:
@@ -143,35 +288,197 @@ def from_api(
         main(
             session=session,
             save_raw=not (discard_raw_xml),
-            raw_xml_dir=raw_xml_folder,
+            raw_xml_folder=raw_xml_folder,
             output_file=output,
+            engine=obj["engine"],
+            shard_by=shard_by,
+            skip_invalid=skip_invalid,
+        )
+    )
+
+
+@cli.command()
+@click.argument("session")
+@click.option(
+    "--store",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=DEFAULT_STORE_FOLDER,
+    show_default=True,
+    help="Folder for the transformed days, which the output is assembled from.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    default=DEFAULT_OUTPUT_FILENAME,
+    show_default=True,
+    help="File path for the output XML (for InDesign).",
+)
+@click.option(
+    "--interval",
+    type=click.IntRange(min=1),
+    default=DEFAULT_INTERVAL,
+    show_default=True,
+    help="Seconds between polls.",
+)
+@click.option(
+    "--max-interval",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_INTERVAL,
+    show_default=True,
+    help="The interval doubles each time nothing has changed, up to this.",
+)
+@click.option(
+    "--recheck-days",
+    type=click.IntRange(min=0),
+    default=DEFAULT_RECHECK_DAYS,
+    show_default=True,
+    help="Also check this many of the latest days for corrections on each poll.",
+)
+@click.option(
+    "--once",
+    is_flag=True,
+    default=False,
+    help="Poll once, update the output and exit.",
+)
+@click.pass_obj
+def watch(
+    obj: dict,
+    session: str,
+    store: Path,
+    output: Path,
+    interval: int,
+    max_interval: int,
+    recheck_days: int,
+    once: bool,
+):
+    """Keep the journal XML for SESSION up to date during a sitting period.
+
+    Polls the sitting calendar and the VnP API. When a day is published, or
+    one of the latest days is corrected, only that day is transformed. Each
+    transformed day is kept in the --store folder and the output is
+    reassembled from there, so the store can be kept between runs.
+
+    Stop with Ctrl+C.
+    """
+    sys.exit(
+        watch_session(
+            session,
+            FragmentStore(store),
+            output,
+            interval=interval,
+            max_interval=max_interval,
+            recheck_days=recheck_days,
+            once=once,
+            engine=obj["engine"],
         )
     )
 
 
+@cli.command()
+@click.argument(
+    "manifest",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.argument("query")
+@click.option(
+    "--xml",
+    "show_xml",
+    is_flag=True,
+    default=False,
+    help="Also print the day's XML from the output.",
+)
+def lookup(manifest: Path, query: str, show_xml: bool):
+    """Find a day in the output from its session MANIFEST (the
+    ..._manifest.json file written alongside the output).
+
+    QUERY is a VnP number (e.g. "No. 184" or 184) or a date (YYYY-MM-DD).
+    """
+    session_manifest = SessionManifest(manifest)
+    try:
+        record = session_manifest.find(query)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="QUERY")
+
+    if record is None:
+        click.echo(f"There is no {query} in {manifest}", err=True)
+        sys.exit(1)
+
+    for key, value in record.items():
+        click.echo(f"{key + ':':<12}{value}")
+
+    if show_xml:
+        xml_bytes = session_manifest.day_xml(record)
+        if xml_bytes is not None:
+            click.echo()
+            click.echo(xml_bytes.decode("utf-8"))
+
+
 # --------------------- End comand line interface -------------------- #
 
 
-def request_vnp_data(
-    sitting_date: datetime,
-    save_to_disk: bool = True,
-    save_to_folder: Path = Path(DEFAULT_RAW_XML_FOLDER)
-) -> Tuple[requests.Response, datetime]:
+def fetch_days(
+    checkpoint: FetchCheckpoint, sitting_dates: List[datetime]
+) -> Tuple[Set[datetime], List[Tuple[datetime, str, bool]]]:
+    """Download the VnP XML for sitting_dates (concurrently) into the
+    checkpoint. Each day is checked as it arrives (see package.validation)
+    and one that is not valid is asked for again, then quarantined. Returns
+    the dates that are not published yet and the (date, problem, is not
+    valid) of those that could not be downloaded."""
+
+    not_published: Set[datetime] = set()
+    failed: List[Tuple[datetime, str, bool]] = []
+    if not sitting_dates:
+        return not_published, failed
+
+    def fetch(sitting_date: datetime) -> Tuple[datetime, str, Optional[str]]:
+        # returns the date, what happened (ok, not published, error or
+        # invalid) and the problem
+        url = f'{BASE_URL}/{sitting_date:%Y-%m-%d}.xml'
+        try:
+            response, problem = validation.get_valid(url, validation.VNP, endpoint="vnp")
+        except Exception as e:
+            return sitting_date, "error", repr(e)
+        if response.status_code == 404:
+            return sitting_date, "not published", None
+        if response.status_code != 200:
+            return sitting_date, "error", problem
+        if problem is not None:
+            quarantined = validation.quarantine(
+                checkpoint.folder, f"{sitting_date:%Y-%m-%d}.xml", response.content, problem
+            )
+            return sitting_date, "invalid", f"{problem} (quarantined as {quarantined})"
+        checkpoint.record(sitting_date, response.content)
+        return sitting_date, "ok", None
 
-    """Query the VnP API for papers laid in the date range."""
+    from concurrent.futures import ThreadPoolExecutor
 
-    formatted_sitting_date = sitting_date.strftime("%Y-%m-%d")
+    # Query papers VnP API
+    print("Getting data from VnP API.")
+    # query concurrently to save time, http_client adjusts how many
+    # requests are in flight from how the API responds
+    with profiling.stage("fetch"), ThreadPoolExecutor(
+        max_workers=http_client.max_concurrency()
+    ) as pool:
+        # create a progress bar and return a list
+        results = progress_bar(pool.map(fetch, sitting_dates), len(sitting_dates))
+        print()  # newline after progress bar
 
-    url = f'{BASE_URL}/{formatted_sitting_date}.xml'
+    for sitting_date, outcome, problem in results:
+        if outcome == "not published":
+            print(f"Warning: there is no VnP for {sitting_date:%Y-%m-%d} yet.")
+            not_published.add(sitting_date)
+        elif problem is not None:
+            failed.append((sitting_date, problem, outcome == "invalid"))
+    return not_published, failed
 
-    response = requests.get(url)
 
-    if save_to_disk:
-        file_path = save_to_folder.joinpath(f"{formatted_sitting_date}.xml")
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+def check_files(files: List[Path]) -> List[Tuple[Path, str]]:
+    """The (file, problem) of the VnP XML files that are not usable."""
 
-    return response, sitting_date
+    with profiling.stage("validate"):
+        problems = [(file, validation.check_file(file, validation.VNP)) for file in files]
+    return [(file, problem) for file, problem in problems if problem is not None]
 
 
 def progress_bar(iterable: Iterable, total: int) -> list:
@@ -190,312 +497,145 @@ def progress_bar(iterable: Iterable, total: int) -> list:
     return output
 
 
-def xml_sort_helper(item):
-    # item can either be a path or a tuple [Response, datetime]
-    # in either cased we want to sort by date
-    if isinstance(item, Path):
-        return item.name
-    else:
-        return item[1].strftime('%Y-%m-%d')
+def xml_sort_helper(item: Path) -> str:
+    # the files are named by date
+    return item.name
 
 def main(
     session: Optional[str] = None,
     save_raw: bool = True,
     raw_xml_dir: Optional[Path] = None,
     output_file: Optional[Path] = None,
+    engine: str = DEFAULT_ENGINE,
+    shard_by: Union[str, int, None] = None,
+    raw_xml_folder: Optional[Path] = None,
+    skip_invalid: bool = False,
 ) -> int:
+    """Build the journal XML from the VnP XML files in raw_xml_dir or, if
+    not given, for session from the VnP API. The downloaded XML is saved to
+    raw_xml_folder (default datedJournalFragments) and kept if save_raw.
+
+    Days that are not valid VnP XML stop the build before any are
+    transformed, unless skip_invalid, when they are left out."""
 
     print("main")
 
+    checkpoint: Optional[FetchCheckpoint] = None
+
     if raw_xml_dir is not None:
         # Do not query API
         # insted assume path is dir with vnp xml files.
         # Each filename should be the date
 
         glob = raw_xml_dir.glob("*.xml")
-        files_or_responses: List[Union[Tuple[Response, datetime], Path]] = list(glob)
-
-    elif session is not None:
-        try:
-            # first get the dates for the session
-            print("Getting session data")
+        raw_files: List[Path] = list(glob)
 
-            session_start, session_end = get_dates_from_session(session)
+        # check all the files before spending time on any
+        bad_files = check_files(raw_files)
+        for file, problem in bad_files:
+            print(f"{file.name}: {problem}")
+        if bad_files and not skip_invalid:
+            print(
+                f"\n{len(bad_files)} files are not valid VnP XML. Use --skip-invalid"
+                " to build the journal without them."
+            )
+            return 1
+        if bad_files:
+            print(f"Warning: leaving out {len(bad_files)} files that are not valid VnP XML.")
+            events.count("days_invalid", len(bad_files))
+            bad = {file for file, _ in bad_files}
+            raw_files = [f for f in raw_files if f not in bad]
 
-            print(f"Session starts: {session_start.strftime('%y-%m-%d')}.")
-            print(f"Session ends: {session_end.strftime('%y-%m-%d')}.")
+    elif session is not None:
+        # the days are saved as they are downloaded, with a checkpoint, so
+        # that if the run stops part way the next run carries on from there
+        checkpoint = FetchCheckpoint(raw_xml_folder or Path(DEFAULT_RAW_XML_FOLDER), session)
+        sitting_dates = checkpoint.sitting_dates
 
-            sitting_dates = get_sitting_dates_in_range(session_start, session_end)
+        if sitting_dates is not None:
+            print(f"Carrying on from the checkpoint at:\n{checkpoint.path.resolve()}")
             print(f"There are {len(sitting_dates)} sitting days this session.")
+        else:
+            try:
+                # first get the dates for the session
+                print("Getting session data")
+
+                with profiling.stage("session lookup"):
+                    session_start, session_end = get_dates_from_session(session)
+
+                print(f"Session starts: {session_start.strftime('%y-%m-%d')}.")
+                print(f"Session ends: {session_end.strftime('%y-%m-%d')}.")
+
+                with profiling.stage("sitting dates"):
+                    sitting_dates = get_sitting_dates_in_range(session_start, session_end)
+                print(f"There are {len(sitting_dates)} sitting days this session.")
+
+            except Exception as e:
+                print(repr(e))
+                print("Error: Could not get session data from whats on.")
+                return 1
+            checkpoint.set_sitting_dates(sitting_dates)
+
+        to_fetch = [d for d in sitting_dates if not checkpoint.is_done(d)]
+        skipped = len(sitting_dates) - len(to_fetch)
+        events.count("days_skipped", skipped)
+        if skipped:
+            print(
+                f"Skipping {skipped} of {len(sitting_dates)} days already downloaded,"
+                f" {len(to_fetch)} to go."
+            )
 
-        except Exception as e:
-            print(repr(e))
-            print("Error: Could not get session data from whats on.")
-            return 1
-        try:
-            # Query papers VnP API
-            print("Getting data from VnP API.")
-            # query concurrently to save time
-            with ThreadPoolExecutor(max_workers=8) as pool:
-
-                # create a progress bar and return a list
-                files_or_responses = progress_bar(
-                    pool.map(
-                        lambda sitting_date: request_vnp_data(sitting_date, save_raw),
-                        sitting_dates,
-                    ),
-                    len(sitting_dates),
-                )
-                print()  # newline after progress bar
+        not_published, failed = fetch_days(checkpoint, to_fetch)
 
-        except Exception as e:
-            print(e)
+        for sitting_date, problem, _ in failed:
+            print(f"{sitting_date:%Y-%m-%d}: {problem}")
+        invalid = {sitting_date for sitting_date, _, is_invalid in failed if is_invalid}
+        if failed and not (skip_invalid and len(invalid) == len(failed)):
             print(
-                "\nCould not get XML from the VnP API. "
-                "Check that you are connected to the parliament network."
+                f"\nCould not get XML for {len(failed)} days from the VnP API. "
+                "Check that you are connected to the parliament network.\n"
+                "Run again to carry on, the days already downloaded will be skipped."
             )
+            if invalid and not skip_invalid:
+                print("Use --skip-invalid to build the journal without the days that are not valid.")
             return 1
+        if invalid:
+            print(f"Warning: leaving out {len(invalid)} days that are not valid VnP XML.")
+            events.count("days_invalid", len(invalid))
+
+        raw_files = [
+            checkpoint.file_for(d)
+            for d in sitting_dates
+            if d not in not_published and d not in invalid
+        ]
 
     else:
         return 1
 
-    # transform and combine a bunch of files.
-
-    output_root = Element("root", nsmap=NS_ADOBE)
-
     # sort the VnP XML by date
-    files_or_responses.sort(key=xml_sort_helper)
-
-
-    for i, item in enumerate(files_or_responses):
-        # parse and build up a tree for the input file
-
-        if isinstance(item, Path):
-            date = datetime.strptime(item.name[:10], "%Y-%m-%d")
-            tree = etree.parse(str(item))
-            input_root = tree.getroot()
-        else:
-            # assume tuple
-            date = item[1]
-            response = item[0]
-            input_root = etree.fromstring(response.content)
-            tree = etree.ElementTree(input_root)
-
-        temp_output_root = Element(
-            "day", nsmap=NS_ADOBE, attrib={"date": date.strftime("%Y-%m-%d")}
+    with profiling.stage("sort"):
+        raw_files.sort(key=xml_sort_helper)
+
+    # for the session manifest, one per sitting day
+    records: List[Record] = []
+    fragments: List[bytes] = []
+
+    for i, item in enumerate(raw_files):
+        date = datetime.strptime(item.name[:10], "%Y-%m-%d")
+        content = item.read_bytes()
+
+        sha256 = source_hash(content)
+        vnp_number, items, fragment = cached_transform(content, date, engine, sha256)
+        records.append(
+            {
+                "date": date.strftime("%Y-%m-%d"),
+                "vnp_number": vnp_number,
+                "ordinal": i + 1,
+                "sha256": sha256,
+                "items": items,
+            }
         )
-
-        # get all the VoteItemViewModel elements
-        VoteItems = input_root.xpath(".//VoteItemViewModel")
-        VoteItems = cast(List[_Element], VoteItems)
-
-        # put the vote number as an attribute into the root element
-        # e.g. <root VnPNumber="No. 184">
-        # input_root.find finds the first match. (The number is always first)
-        first_VoteEntry = input_root.find("VoteItemViewModel/VoteEntry")
-        if first_VoteEntry is not None and first_VoteEntry.text:
-            # case insensitive search
-            m = re.search(r"No\. ?[0-9]+", first_VoteEntry.text, flags=re.I)
-            if m:
-                temp_output_root.set("VnPNumber", m.group(0))
-
-                if i > 0:
-                    # we want a line between days (bun not before the first day)
-                    DayLine = SubElement(temp_output_root, "DayLine")
-                    DayLine.tail = "\n"
-
-
-                first_VoteEntry.text = f"[{m.group(0)}]"
-                first_VoteEntry.tag = "DaySep"
-                first_VoteEntry.tail = "\n"
-                temp_output_root.append(first_VoteEntry)
-
-            # insert date element
-            date_ele = SubElement(temp_output_root, "VotesDate")
-            date_ele.text = date.strftime("%A") + " "
-            date_for_header = SubElement(date_ele, "DateForHeader")
-            date_for_header.text = date.strftime("%d %B %Y").lstrip("0")
-            date_ele.tail = "\n"
-
-        # variable to contain the section
-        last_section = "chamber"
-        # used to help tell if numbering should restart in InDesign
-        restart_numbers = True
-
-        for vote_item in VoteItems:
-
-            # If the section changes we need a new heading. There is not section heading needed for the chamber
-            section_text = vote_item.findtext("Section")
-            if section_text:
-                section_text = section_text.strip()
-                section_text_cf = section_text.casefold()
-                # There is also no heading needed for Certificates and Corrections
-                if section_text_cf not in (
-                    last_section,
-                    "certificates and corrections",
-                ):
-                    SubElement(temp_output_root, "OPHeading1").text = (
-                        section_text + "\n"
-                    )
-                    last_section = section_text_cf
-                    # The numbering is also supposed to restart after new sections
-                    # unless section is other proceedings
-                    if section_text_cf != "other proceedings":
-                        restart_numbers = True
-
-            # add a line to InDesign XML if vote Entry is 'FullLine'
-            if vote_item.findtext("VoteEntryType") == "FullLine":
-                SubElement(temp_output_root, "FullLine").text = " \n"
-                continue
-
-            # get the vote entry text
-            vote_entry_text = vote_item.findtext("VoteEntry", default="")
-            # convert vote entry text back to html and replace breaks with InDesign forced line breaks
-            vote_entry_text = (
-                vote_entry_text.replace("&lt;", "<")
-                .replace("&gt;", ">")
-                .replace("&amp;", "&")
-                .replace("<br />", "&#8232;")
-            )
-            # also remove any divs
-            vote_entry_text = vote_entry_text.replace("<div>", "").replace("</div>", "")
-
-            if len(vote_entry_text) > 0 and vote_entry_text[0] != "<":
-                vote_entry_text = "<p>" + vote_entry_text + "</p>"
-            cleaned_html_elements = lhtml.fromstring(
-                "<div>" + vote_entry_text + "</div>"
-            )
-
-            for i, item in enumerate(cleaned_html_elements):
-                next_item = item.getnext()  # returns the next element or None
-
-                next_item_tag = ""
-                next_item_text = ""
-                if iselement(next_item):
-                    next_item_tag = next_item.tag
-                    if next_item.text:
-                        next_item_text = next_item.text.strip()
-
-                item_text = ""
-                if item.text:
-                    item_text = item.text.strip()
-
-                # remove multiple new paragraphs, this sometimes happens after tables
-                if (
-                    item.tag == "p"
-                    and next_item_tag == "p"
-                    and item_text == "\u00A0"
-                    and next_item_text == "\u00A0"
-                ):
-                    continue
-
-                # if the element is an html table...
-                if item.tag == "table":
-                    # temp_output_root.append(convert_table(item))
-                    indesign_table = tables.html_table_to_indesign(
-                        item, tablestyle="Table Style 2", max_table_width=540
-                    )
-                    TableContainerPara = SubElement(
-                        temp_output_root, "TableContainerPara"
-                    )
-                    TableContainerPara.append(indesign_table)
-                    # if a tables first row has all cell have the <em> element then promote to header
-                    try:
-                        cols = int(indesign_table.get(QName(AID, "tcols")))
-
-                        cells_that_should_be_headers = indesign_table.xpath(
-                            f"Cell[position() <= {cols}][em]"
-                        )
-                        if len(cells_that_should_be_headers) == cols:
-                            for cell in cells_that_should_be_headers:
-                                cell.set(QName(AID, "theader"), "")
-                    except ValueError:
-                        pass
-
-                    continue
-
-                # get the style attribute if it exists
-                item_style = item.get("style", "").rstrip(
-                    ";"
-                )  # sometimes there is an unwanted `;`
-
-                # decide what tag we need to give it
-                number_ele = vote_item.find("Number")
-                vote_entry_type = vote_item.find("VoteEntryType")
-                if i == 0 and number_ele is not None and number_ele.text:
-                    item.tag = "BusinessItemHeadingNumbered"
-                    if restart_numbers is True:
-                        item.tag = "BusinessItemHeadingNumberedRestart"
-                        restart_numbers = False
-
-                elif item.get("class", "") == "HalfLine":
-                    item.tag = "HalfLine"
-
-                elif (
-                    item_style == "text-align: right"
-                ):
-                    # apply the special style to the speaker or chairs name
-                    if next_item_text.upper().strip() in chair_titles:
-                        # We need to remove the speakers signature as it is
-                        # not needed for the journal
-                        # print(f"\n{etree.tostring(date_ele)}")
-                        # print(f"{next_item_text=}")
-                        # print(etree.tostring(item))
-                        continue
-                        # item.getparent().remove(item)
-                        # item.tag = 'SpeakerName'
-                    if item_text.upper().strip() in chair_titles:
-                        continue
-
-                    # other wise right align
-                    item.tag = "RightAlign"
-
-                # some elements are headings and take particular styles
-                elif iselement(vote_entry_type) and vote_entry_type.text == "Heading":
-                    item.tag = "OPHeading2"
-                    if item_text.upper().strip() in chair_titles:
-                        # print(f"{etree.tostring(vote_entry_type)}")
-                        # print(f"{vote_entry_type.text=}")
-                        # print(etree.tostring(item))
-                        continue
-                        # item.getparent().remove(item)
-                        # item.tag = 'RightAlign'
-
-                    # put The House met at in the center
-                    if re.search(r"^The House met at", item_text) is not None:
-                        item.tag = "NormalCentred"
-                    if item_text.upper() == "PRAYERS":
-                        item.tag = "MotionText"
-                    if item_text.casefold().strip() in speaker_certificates:
-                        item.tag = "SpeakersCertificates"
-
-                elif item_style == "text-align: center":
-                    item.tag = "NormalCentred"
-                    if item.text and item.text.casefold().strip() in speaker_certificates:
-                        item.tag = "SpeakersCertificates"
-
-                elif item_style == "padding-left: 30px":
-                    item.tag = "Indent1"
-                elif item_style == "padding-left: 60px":
-                    item.tag = "Indent2"
-                elif item_style == "padding-left: 90px":
-                    item.tag = "Indent3"
-                elif item_style == "padding-left: 120px":
-                    item.tag = "Indent4"
-                elif item_style == "padding-left: 150px":
-                    item.tag = "Indent5"
-                else:
-                    item.tag = "MotionText"
-
-
-                # item.text = re.sub(r"[ \u00A0]+", " ", item.text.strip())
-
-                item.tail = "\n"
-                temp_output_root.append(deepcopy(item))
-
-            output_root.append(temp_output_root)
-
-    output_root = journal_mods(output_root)
+        fragments.append(fragment)
 
     # write out the file
     if output_file is None:
@@ -505,13 +645,61 @@ def main(
         output_file.mkdir(parents=True, exist_ok=True)
         output_file = output_file / f"session_{session}_for_id.xml"
 
-    et = etree.ElementTree(output_root)
+    events.count("days_written", sum(bool(fragment) for fragment in fragments))
+
+    if shard_by is not None:
+        # the shards go in a folder named after the output
+        shards_folder = output_file.with_name(f"{output_file.stem}_shards")
+        with profiling.stage("write"):
+            manifest = write_shards(list(zip(records, fragments)), shards_folder, shard_by)
+        changed = sum(shard["changed"] for shard in manifest["shards"])
+        print(
+            f"\n{len(manifest['shards'])} shards ({changed} changed) of transformed XML"
+            f" (for InDesign) are in:\n{shards_folder.resolve()}"
+        )
+    else:
+        with profiling.stage("serialize"):
+            xml_bytes, spans = join_days(fragments)
+        for record, span in zip(records, spans):
+            _set_position(record, output_file.name, span)
+
+        with profiling.stage("write"):
+            output_file.write_bytes(xml_bytes)
+        print(f"\nTransformed XML (for InDesign) is at:\n{output_file.resolve()}")
+
+    manifest_path = manifest_path_for(output_file)
+    write_manifest(manifest_path, records, session=session)
+    print(f"Session manifest (for create_journal.py lookup) is at:\n{manifest_path.resolve()}")
+
+    if checkpoint is not None:
+        if save_raw:
+            checkpoint.finish()
+            print(f"The downloaded VnP XML is in:\n{checkpoint.folder.resolve()}")
+        else:
+            checkpoint.discard()
+
+    http_summary = http_client.summary()
+    if http_summary:
+        print(http_summary)
 
-    et.write(str(output_file), encoding="utf-8", xml_declaration=True)
-    print(f"\nTransformed XML (for InDesign) is at:\n{output_file.resolve()}")
     return 0
 
 
+def transform_day(
+    input_root: _Element,
+    date: datetime,
+    first_day: bool = False,
+    engine: str = DEFAULT_ENGINE,
+) -> Optional[_Element]:
+    """Transform one day of VnP XML into a <day> element for the journal.
+
+    Returns None if the day has no vote items."""
+
+    return DAY_TRANSFORMS[engine](
+        input_root, day_transform.JOURNAL, date=date, first_day=first_day
+    )
+
+
 def journal_mods(output_root: _Element) -> _Element:
 
     allowed_empty_paras = ("DaySep", "ThinLine", "TableContainerPara")
@@ -573,57 +761,328 @@ def journal_mods(output_root: _Element) -> _Element:
 
     return output_root
 
-def json_from_uri(
-    uri: str, default: Optional[T] = None, showerror=True
-) -> Union[T, Any]:
-    headers = {"Content-Type": "application/json"}
-    try:
-        response = requests.get(uri, headers=headers)
-        json_obj = response.json()
-    except Exception as e:
-        if showerror:
-            print(f"Error getting data from:\n{uri}\n{e}")
-        return default
-    else:
-        return json_obj
+@lru_cache(maxsize=None)
+def _root_tags() -> Tuple[bytes, bytes]:
+    # the bytes before and after the days in the output
+    root = Element("root", nsmap=NS_ADOBE)
+    SubElement(root, "day")
+    start, end = etree.tostring(root, encoding="UTF-8", xml_declaration=True).split(b"<day/>")
+    return start, end
+
+
+def transform_source(
+    content: bytes, date: datetime, engine: str = DEFAULT_ENGINE
+) -> DayResult:
+    """Transform one day of VnP XML (as bytes) into its fragment of the
+    output (see day_fragment). Returns (VnP number, number of vote items,
+    fragment). The fragment is empty if the day has no vote items.
+
+    Every day is transformed with a DayLine, join_days removes the first."""
+
+    with profiling.stage("parse"):
+        if engine == "python":
+            # compact records of the vote items rather than the whole tree
+            records = vote_items.parse(content)
+            items = len(records)
+        else:
+            input_root = etree.fromstring(content)
+            items = len(day_transform.VOTE_ITEMS(input_root))
 
+    with profiling.stage("classify"), profiling.item("day", f"{date:%Y-%m-%d}"):
+        if engine == "python":
+            day = day_transform.transform_items(records, day_transform.JOURNAL, date=date)
+        else:
+            day = transform_day(input_root, date, engine=engine)
+    if day is None:
+        return None, items, b""
+
+    with profiling.stage("journal_mods"):
+        temp_root = Element("root", nsmap=NS_ADOBE)
+        temp_root.append(day)
+        journal_mods(temp_root)
+
+    with profiling.stage("serialize"):
+        fragment = day_fragment(day)
+    return day.get("VnPNumber"), items, fragment
+
+
+def enable_day_cache(max_days: int = DAY_CACHE_SIZE):
+    """Keep transformed days in memory so that later builds in this process
+    (e.g. in the build server) only transform the days that have changed."""
+    global _DAY_CACHE, _DAY_CACHE_SIZE
+    if _DAY_CACHE is None:
+        _DAY_CACHE = OrderedDict()
+    _DAY_CACHE_SIZE = max_days
+
+
+def cached_transform(
+    content: bytes,
+    date: datetime,
+    engine: str = DEFAULT_ENGINE,
+    sha256: Optional[str] = None,
+) -> DayResult:
+    """transform_source, using the day cache if it is enabled."""
+
+    if _DAY_CACHE is None:
+        return transform_source(content, date, engine)
+
+    key = (date.strftime("%Y-%m-%d"), engine, sha256 or source_hash(content))
+    result = _DAY_CACHE.get(key)
+    if result is not None:
+        _DAY_CACHE.move_to_end(key)
+        events.count("days_cached")
+        return result
+
+    result = transform_source(content, date, engine)
+    _DAY_CACHE[key] = result
+    while len(_DAY_CACHE) > _DAY_CACHE_SIZE:
+        _DAY_CACHE.popitem(last=False)
+    return result
+
+
+def update_day(
+    store: FragmentStore,
+    date: datetime,
+    content: bytes,
+    engine: str = DEFAULT_ENGINE,
+) -> bool:
+    """Transform one day of VnP XML into the store, unless the store already
+    has it. Returns True if the store was changed."""
+
+    date_str = date.strftime("%Y-%m-%d")
+    if store.is_current(date_str, content):
+        return False
+
+    # empty days are kept too so they are not transformed again
+    _, _, fragment = cached_transform(content, date, engine)
+    store.put(date_str, content, fragment)
+    return True
+
+
+def day_fragment(day: _Element) -> bytes:
+    """The bytes of a <day> as they are in the output. day is moved out of
+    its tree."""
+
+    temp_root = Element("root", nsmap=NS_ADOBE)
+    temp_root.append(day)
+    # serialize as part of the output so that the bytes are the same as in it
+    start, end = _root_tags()
+    xml_bytes = etree.tostring(temp_root, encoding="UTF-8", xml_declaration=True)
+    return xml_bytes[len(start):-len(end)]
+
+
+def assemble(store: FragmentStore) -> bytes:
+    """The journal XML made from all the days in the store. The same as the
+    output of main for the same days. The days are not parsed again."""
+
+    return join_days([store.get(date_str) for date_str in store.dates()])[0]
+
+
+def join_days(fragments: List[bytes]) -> Tuple[bytes, List[Optional[Tuple[int, int]]]]:
+    """Journal XML made from day fragments (see day_fragment), in order.
+    Every day may start with a DayLine, the first day's is removed.
+
+    Also returns the (offset, length) of each fragment in the XML, or None
+    for empty fragments."""
+
+    fragments = list(fragments)
+    spans: List[Optional[Tuple[int, int]]] = [None] * len(fragments)
+    non_empty = [i for i, fragment in enumerate(fragments) if fragment]
+    if not non_empty:
+        xml_bytes = etree.tostring(
+            Element("root", nsmap=NS_ADOBE), encoding="UTF-8", xml_declaration=True
+        )
+        return xml_bytes, spans
+
+    # no line before the first day
+    first = fragments[non_empty[0]]
+    after_start_tag = first.index(b">") + 1
+    if first.startswith(b"<DayLine/>\n", after_start_tag):
+        fragments[non_empty[0]] = (
+            first[:after_start_tag] + first[after_start_tag + len(b"<DayLine/>\n"):]
+        )
 
-def get_sitting_dates_in_range(
-    from_date: datetime, to_date: datetime
-) -> List[datetime]:
-    """get return a list of sitting days"""
+    start, end = _root_tags()
+    offset = len(start)
+    for i in non_empty:
+        spans[i] = (offset, len(fragments[i]))
+        offset += len(fragments[i])
+    return b"".join((start, *(fragments[i] for i in non_empty), end)), spans
 
-    # the calendar api gives you the next sitting day so we need to start form the day before
-    start_date = from_date - timedelta(days=1)
 
-    current_date = start_date
-    dates = []
-    count = 0
-    while current_date < to_date:
-        current_date = start_date + timedelta(days=count)
-        dates.append(current_date)
-        count += 1
+def _set_position(record: Record, file_name: str, span: Optional[Tuple[int, int]]):
+    # where the day is in the output, for the session manifest
+    if span is None:
+        record.update(file=None, offset=None, length=None)
+    else:
+        record.update(file=file_name, offset=span[0], length=span[1])
+
+
+def _shard_key(date_str: str, index: int, shard_by: Union[str, int]) -> str:
+    if shard_by == "month":
+        return date_str[:7]
+    return f"part-{index // int(shard_by) + 1:03}"
+
+
+def write_shards(
+    days: List[Tuple[Record, bytes]],
+    folder: Path,
+    shard_by: Union[str, int],
+) -> Dict[str, Any]:
+    """Write days, a list of (session manifest record, fragment) in order,
+    to a file per month (shard_by="month") or per shard_by sitting days in
+    folder, along with a manifest. Each shard is a complete journal XML
+    file. Where each day is written is filled in in its record.
+
+    Shards that are the same as the ones already in folder are not written
+    again, so their modification times show which shards have changed.
+    Returns the manifest."""
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    folder.mkdir(parents=True, exist_ok=True)
+    manifest_path = folder / SHARDS_MANIFEST_FILENAME
+
+    groups: Dict[str, List[Tuple[Record, bytes]]] = {}
+    for i, day in enumerate(days):
+        groups.setdefault(_shard_key(day[0]["date"], i, shard_by), []).append(day)
+
+    def write(key: str) -> Dict[str, Any]:
+        group = groups[key]
+        xml_bytes, spans = join_days([fragment for _, fragment in group])
+        file_path = folder / f"{key}.xml"
+        changed = not file_path.exists() or file_path.read_bytes() != xml_bytes
+        if changed:
+            file_path.write_bytes(xml_bytes)
+        for (record, _), span in zip(group, spans):
+            _set_position(record, f"{folder.name}/{file_path.name}", span)
+        vnp_numbers = [record["vnp_number"] for record, _ in group if record["vnp_number"]]
+        return {
+            "file": file_path.name,
+            "first_date": group[0][0]["date"],
+            "last_date": group[-1][0]["date"],
+            "days": len(group),
+            "first_vnp_number": vnp_numbers[0] if vnp_numbers else None,
+            "last_vnp_number": vnp_numbers[-1] if vnp_numbers else None,
+            "changed": changed,
+        }
+
+    with ThreadPoolExecutor() as pool:
+        shards = list(pool.map(write, groups))
+
+    # remove shards from a previous run that are no longer needed
+    try:
+        old_manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        old_files = {shard["file"] for shard in old_manifest["shards"]}
+    except (OSError, ValueError, KeyError):
+        old_files = set()
+    for file_name in old_files - {shard["file"] for shard in shards}:
+        (folder / file_name).unlink(missing_ok=True)
 
-    sitting_dates = []
-    for d in dates:
+    manifest = {"shard_by": shard_by, "shards": shards}
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
 
-        next_sitting_date_str = json_from_uri(
-            CAL_API_URL_TEMPLATE.format(d.strftime("%Y-%m-%d"))
-        )
 
-        if not next_sitting_date_str:
-            continue
+def poll(
+    session: str,
+    store: FragmentStore,
+    recheck_days: int = DEFAULT_RECHECK_DAYS,
+    engine: str = DEFAULT_ENGINE,
+) -> List[str]:
+    """Bring the store up to date for session. Returns the dates that changed.
+
+    Days that are not in the store yet, and the latest recheck_days days, are
+    requested. The latest days are always revalidated with the VnP API, so
+    if they have not changed this is cheap."""
+
+    session_start, session_end = get_dates_from_session(session)
+    today = datetime.combine(date.today(), datetime.min.time())
+    sitting_dates = get_sitting_dates_in_range(session_start, min(session_end, today))
+    sitting_date_strs = {d.strftime("%Y-%m-%d") for d in sitting_dates}
+
+    changed: List[str] = []
+
+    # the calendar can change, e.g. when a sitting is cancelled
+    for date_str in store.dates():
+        if date_str not in sitting_date_strs:
+            store.remove(date_str)
+            changed.append(date_str)
+
+    in_store = set(store.dates())
+    latest = sitting_dates[-recheck_days:] if recheck_days else []
+    to_check = [
+        d for d in sitting_dates
+        if d.strftime("%Y-%m-%d") not in in_store or d in latest
+    ]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch(sitting_date: datetime) -> Tuple[datetime, Optional[bytes]]:
+        url = f'{BASE_URL}/{sitting_date.strftime("%Y-%m-%d")}.xml'
+        # ttl of 0 so that a cached copy is always revalidated
+        response = http_client.get(url, endpoint="vnp", ttl=timedelta(0))
+        if response.status_code == 404:
+            # not published yet
+            return sitting_date, None
+        response.raise_for_status()
+        return sitting_date, response.content
+
+    with ThreadPoolExecutor(max_workers=http_client.max_concurrency()) as pool:
+        for sitting_date, content in pool.map(fetch, to_check):
+            if content is not None and update_day(store, sitting_date, content, engine):
+                changed.append(sitting_date.strftime("%Y-%m-%d"))
+
+    store.save()
+    return sorted(changed)
+
+
+def watch_session(
+    session: str,
+    store: FragmentStore,
+    output_file: Path,
+    interval: int = DEFAULT_INTERVAL,
+    max_interval: int = DEFAULT_MAX_INTERVAL,
+    recheck_days: int = DEFAULT_RECHECK_DAYS,
+    once: bool = False,
+    engine: str = DEFAULT_ENGINE,
+) -> int:
+    """Poll until interrupted, writing output_file whenever a day changes.
+    The wait between polls doubles (up to max_interval) while nothing
+    changes and goes back to interval when something does."""
 
-        next_sitting_date = datetime.strptime(
-            next_sitting_date_str[:10], "%Y-%m-%d"
-        )
+    unchanged_polls = 0
+    try:
+        while True:
+            try:
+                changed = poll(session, store, recheck_days=recheck_days, engine=engine)
+            except Exception as e:
+                # e.g. the network is down, try again next time
+                print(f"{datetime.now():%H:%M:%S} Error: {e!r}")
+                changed = []
+                if once:
+                    return 1
+
+            if changed or not output_file.exists():
+                output_file.write_bytes(assemble(store))
+                print(
+                    f"{datetime.now():%H:%M:%S} Updated {', '.join(changed) or 'nothing'}."
+                    f" {len(store.dates())} days in:\n{output_file.resolve()}"
+                )
+                unchanged_polls = 0
+            else:
+                unchanged_polls = min(unchanged_polls + 1, 32)
 
-        if next_sitting_date not in sitting_dates:
-            sitting_dates.append(next_sitting_date)
+            if once:
+                return 0
 
-    print(f"{[sd.strftime('%y-%m-%d') for sd in sitting_dates]}")
+            wait = min(interval * 2 ** max(unchanged_polls - 1, 0), max_interval)
 
-    return sitting_dates
+            print(f"{datetime.now():%H:%M:%S} Next check in {wait} seconds.")
+            time.sleep(wait)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+        return 0
 
 
 if __name__ == "__main__":
@@ -7,21 +7,23 @@
 
 # python standard library imports
 from datetime import datetime, date, timedelta
-from functools import cached_property
+from functools import cached_property, lru_cache
 from pathlib import Path
 import re
 import sys
-from typing import cast, Union
+from typing import TYPE_CHECKING, cast, Union
 import os
 
-from cache_to_disk import cache_to_disk
 import click
 from lxml import etree
 from lxml.etree import _Element
 from lxml.etree import iselement
-import requests
+
+if TYPE_CHECKING:
+    from requests import Response
 
 # 1st party imports
+from package import endpoints, events, http_client, profiling, validation
 from package.utilities import get_dates_from_session
 
 
@@ -29,6 +31,9 @@ OUTPUT_XML_NAME = "for-id7.xml"
 
 DEFAULT_RAW_XML_TEMPLATE = "as_downloaded_papers_{session}.xml"
 
+# a session's papers are requested this many days at a time, concurrently
+PAPERS_CHUNK_DAYS = 31
+
 NS_MAP = {"xsi": "http://www.w3.org/2001/XMLSchema-instance"}
 
 WORD_FOR_PATTERN = re.compile(r"([12]\d\d\d(?:-\d\d)? ?(?:\([A-Za-z0-9 ]*\))?)$")
@@ -209,12 +214,20 @@ def main(
     local_input_file: Union[Path, None] = None,
     output_file_or_dir: Union[Path, None] = None,
     save_raw: bool = True,
+    skip_invalid: bool = False,
 ) -> int:
 
     if local_input_file is not None:
         # use local file as input rather than querying API
-        papers_xml_tree = etree.parse(str(local_input_file))
-        papers_xml = papers_xml_tree.getroot()
+        with profiling.stage("validate"):
+            problem = validation.check_file(local_input_file, validation.PAPERS_LAID)
+        if problem is not None:
+            print(f"{local_input_file}: {problem}")
+            print("The file is not valid papers laid XML.")
+            sys.exit(1)
+        with profiling.stage("parse"):
+            papers_xml_tree = etree.parse(str(local_input_file))
+            papers_xml = papers_xml_tree.getroot()
 
     elif session is not None:
         # Query papers laid API. First use passed in session to work out what
@@ -222,15 +235,32 @@ def main(
 
         try:
             # first get the dates for the session
-            session_start, session_end = get_dates_from_session(session)
+            with profiling.stage("session lookup"):
+                session_start, session_end = get_dates_from_session(session)
         except Exception as e:
             print(e)
             print("Could not get session data from whats on.")
             sys.exit(1)
+        as_downloaded_file_name = DEFAULT_RAW_XML_TEMPLATE.format(session=session)
+        if output_file_or_dir is None:
+            output_path = Path(as_downloaded_file_name)
+        elif output_file_or_dir.is_dir():
+            output_path = Path(output_file_or_dir, as_downloaded_file_name)
+        else:
+            # assume file instead of dir
+            output_path = Path(output_file_or_dir.parent, as_downloaded_file_name)
+
         try:
             # Query papers laid API
             print("Getting data from papers laid")
-            response = request_papers_data(session_start, session_end)
+            with profiling.stage("fetch"):
+                papers_content = request_papers_xml(
+                    session_start,
+                    session_end,
+                    # bad XML is kept next to the raw XML
+                    quarantine_folder=output_path.parent,
+                    skip_invalid=skip_invalid,
+                )
         except Exception as e:
             print(e)
             print(
@@ -240,36 +270,42 @@ def main(
             sys.exit(1)
 
         if save_raw:
-            as_downloaded_file_name = DEFAULT_RAW_XML_TEMPLATE.format(session=session)
-            if output_file_or_dir is None:
-                output_path = Path(as_downloaded_file_name)
-            elif output_file_or_dir.is_dir():
-                output_path = Path(output_file_or_dir, as_downloaded_file_name)
-            else:
-                # assume file instead of dir
-                output_path = Path(output_file_or_dir.parent, as_downloaded_file_name)
             with open(output_path, "wb") as f:
-                f.write(response.content)
+                f.write(papers_content)
                 print(f"Downloaded: {output_path.absolute()}")
 
-        papers_xml = etree.fromstring(response.content)
+        with profiling.stage("parse"):
+            papers_xml = etree.fromstring(papers_content)
     else:
         print("Error: Must have either an XML file or a session.")
         sys.exit(1)
 
-    filtered_papers = filter_papers(papers_xml)
+    with profiling.stage("classify"):
+        filtered_papers = filter_papers(papers_xml)
+
+        print(f"After filtering, there are {len(filtered_papers)} papers.")
+        events.count("papers_written", len(filtered_papers))
 
-    print(f"After filtering, there are {len(filtered_papers)} papers.")
+    with profiling.stage("sitting dates"):
+        prefetch_sitting_dates(filtered_papers)
 
-    papers_data = populate_papers_data(filtered_papers)
+    with profiling.stage("classify"):
+        papers_data = populate_papers_data(filtered_papers)
 
     # fix_relayed(papers_data)
 
-    sorted_papers_data = sort_papers(papers_data)
+    with profiling.stage("sort"):
+        sorted_papers_data = sort_papers(papers_data)
+
+    with profiling.stage("serialize"):
+        output_xml = convert_to_xml(sorted_papers_data)
 
-    output_xml = convert_to_xml(sorted_papers_data)
+    with profiling.stage("write"):
+        write_xml(output_xml, output_file_or_dir)
 
-    write_xml(output_xml, output_file_or_dir)
+    http_summary = http_client.summary()
+    if http_summary:
+        print(http_summary)
 
     return 0
 
@@ -278,8 +314,58 @@ def main(
 
 
 @click.group()
-def cli():
-    pass
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print the time and memory used by each stage of the build.",
+)
+@click.option(
+    "--profile-json",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Also write the profile report to this JSON file (implies --profile).",
+)
+@click.option(
+    "--cprofile",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="Also write a cProfile dump to this file (implies --profile).",
+)
+@click.option(
+    "--event-log",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    envvar="COMMONS_JOURNAL_EVENT_LOG",
+    help=(
+        "Append a JSON lines log of the run (timings, counts and a final summary)"
+        " to this file. Can also be set with COMMONS_JOURNAL_EVENT_LOG."
+    ),
+)
+@click.option(
+    "--max-concurrency",
+    type=click.IntRange(min=1),
+    help=(
+        "The most requests to make at once to each web service. How many are"
+        " made is adjusted up to this from how the service responds."
+        f" Can also be set with {http_client.MAX_CONCURRENCY_ENV_VAR}."
+        f" default={http_client.MAX_CONCURRENCY}"
+    ),
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    profile: bool,
+    profile_json: Union[Path, None],
+    cprofile: Union[Path, None],
+    event_log: Union[Path, None],
+    max_concurrency: Union[int, None],
+):
+    if profile or profile_json or cprofile:
+        profiling.enable(json_path=profile_json, cprofile_path=cprofile)
+        ctx.call_on_close(profiling.finish)
+    if event_log is not None:
+        events.enable(event_log, tool="make_papers_index")
+        ctx.call_on_close(lambda: events.finish(http=http_client.stats()))
+    if max_concurrency is not None:
+        http_client.set_max_concurrency(max_concurrency)
 
 
 @cli.command()
@@ -315,7 +401,21 @@ def from_file(input_path: Path, output: Union[Path, None] = None):
     help="Optionally provide the directory or file path for the output XML",
     type=click.Path(writable=True, path_type=Path),
 )
-def from_api(session: str, discard_raw_xml: bool, output: Union[Path, None] = None):
+@click.option(
+    "--skip-invalid",
+    is_flag=True,
+    default=False,
+    help=(
+        "Make the index without any part of the session whose papers laid XML"
+        " is not valid (they are listed) rather than stopping."
+    ),
+)
+def from_api(
+    session: str,
+    discard_raw_xml: bool,
+    output: Union[Path, None] = None,
+    skip_invalid: bool = False,
+):
     """For a given SESSION, create papers index XML (to be typeset in InDesign)
     from data downloaded from the papers laid API.
 
@@ -324,6 +424,7 @@ def from_api(session: str, discard_raw_xml: bool, output: Union[Path, None] = No
 
     By default the XML downloaded from papers laid will be saved alongside the
     output. You can stop this behaviour with the --discard-raw-xml flag.
+    XML that is not valid is kept in a quarantine folder there.
 
     \b
     You will need to be connected to the parliament network.
@@ -331,7 +432,10 @@ def from_api(session: str, discard_raw_xml: bool, output: Union[Path, None] = No
     https://whatson-api.parliament.uk/calendar/sessions/list.json
     """
     return main(
-        session=session, save_raw=not (discard_raw_xml), output_file_or_dir=output
+        session=session,
+        save_raw=not (discard_raw_xml),
+        output_file_or_dir=output,
+        skip_invalid=skip_invalid,
     )
 
 
@@ -406,22 +510,101 @@ def filter_papers(papers_xml: Union[_Element, list[_Element]]) -> list[_Element]
 
 
 
-def request_papers_data(date_from: datetime, date_to: datetime) -> requests.Response:
-    """Query the papers laid API for papers laid in the date range."""
-
+def papers_url(date_from: datetime, date_to: datetime) -> str:
     session_from_str = date_from.strftime("%Y-%m-%d")
     session_to_str = date_to.strftime("%Y-%m-%d")
 
-    url = (
-        "http://services.paperslaid.parliament.uk/papers/list/daily.xml"
+    return (
+        f"{endpoints.PAPERS_LAID_DAILY_URL}"
         f"?fromDate={session_from_str}&toDate={session_to_str}&house=commons"
     )
 
-    response = requests.get(url)
+
+def request_papers_data(date_from: datetime, date_to: datetime) -> "Response":
+    """Query the papers laid API for papers laid in the date range."""
+
+    response = http_client.get(papers_url(date_from, date_to), endpoint="papers_laid")
 
     return response
 
 
+def request_papers_xml(
+    date_from: datetime,
+    date_to: datetime,
+    chunk_days: int = PAPERS_CHUNK_DAYS,
+    quarantine_folder: Union[Path, None] = None,
+    skip_invalid: bool = False,
+) -> bytes:
+    """Papers laid XML for the date range, requested chunk_days at a time
+    (concurrently) and combined into one ArrayOfDailyPapers.
+
+    Smaller requests are quicker for the API, can be retried on their own
+    and stay in the HTTP cache separately, so when a session is built again
+    only the recent chunks have changed.
+
+    Each chunk is checked as it arrives (see package.validation). One that
+    is not valid is asked for again and, if still not valid, kept in
+    quarantine_folder/quarantine. Then a ValueError listing the bad chunks
+    is raised, unless skip_invalid, when they are left out."""
+
+    chunks = []
+    chunk_start = date_from
+    while True:
+        # the chunks overlap by a day, so it doesn't matter whether the API
+        # includes toDate, and each day is kept once
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), date_to)
+        chunks.append((chunk_start, chunk_end))
+        if chunk_end >= date_to:
+            break
+        chunk_start = chunk_end
+
+    def fetch(chunk: tuple[datetime, datetime]) -> tuple[bytes, Union[str, None]]:
+        response, problem = validation.get_valid(
+            papers_url(*chunk), validation.PAPERS_LAID, endpoint="papers_laid"
+        )
+        response.raise_for_status()
+        if problem is not None:
+            file_name = f"papers_{chunk[0]:%Y-%m-%d}_{chunk[1]:%Y-%m-%d}.xml"
+            problem = f"{chunk[0]:%Y-%m-%d} to {chunk[1]:%Y-%m-%d}: {problem}"
+            if quarantine_folder is not None:
+                quarantined = validation.quarantine(
+                    quarantine_folder, file_name, response.content, problem
+                )
+                problem += f" (quarantined as {quarantined})"
+        return response.content, problem
+
+    if len(chunks) == 1:
+        results = [fetch(chunks[0])]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), http_client.max_concurrency())) as pool:
+            results = list(pool.map(fetch, chunks))
+
+    problems = [problem for _, problem in results if problem is not None]
+    contents = [content for content, problem in results if problem is None]
+    if problems and (not skip_invalid or not contents):
+        raise ValueError(
+            "Papers laid XML that is not valid:\n" + "\n".join(problems)
+        )
+    for problem in problems:
+        print(f"Warning: leaving out {problem}")
+    events.count("chunks_invalid", len(problems))
+
+    if len(contents) == 1:
+        return contents[0]
+
+    root = etree.fromstring(contents[0])
+    dates = {daily.findtext("Date") for daily in root.iterchildren("DailyPapers")}
+    for content in contents[1:]:
+        for daily in etree.fromstring(content).iterchildren("DailyPapers"):
+            date_str = daily.findtext("Date")
+            if date_str not in dates:
+                dates.add(date_str)
+                root.append(daily)
+    return etree.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
 def convert_to_xml(papers_data: Papers_Structure) -> _Element:
     """create a lxml.etree._Element from Papers structure"""
 
@@ -499,7 +682,8 @@ def populate_papers_data(
     for p in papers_of_interest:
         if iselement(p):
             # p is an element
-            paper = Paper(p)
+            with profiling.item("paper", p.findtext("Title", "")):
+                paper = Paper(p)
         else:
             # p must already be a Paper instance
             paper = cast(Paper, p)
@@ -626,18 +810,51 @@ def format_date(date_: date) -> str:
     return date_.strftime("%d %b %Y").lstrip("0")
 
 
-@cache_to_disk(1)
+def prefetch_sitting_dates(papers: list[_Element]):
+    """Look up (concurrently) the sitting dates of the dates that papers
+    were laid and withdrawn, so that they are cached for Paper."""
+
+    dates = set()
+    for paper in papers:
+        for tag in ("DateLaidCommons", "DateWithdrawn"):
+            try:
+                dates.add(datetime.strptime(paper.findtext(tag, "").strip()[0:10], "%Y-%m-%d"))
+            except ValueError:
+                pass
+    if len(dates) < 2:
+        return
+
+    def lookup(date_: datetime):
+        try:
+            get_sitting_date(date_)
+        except Exception:
+            # Paper will try again (and handle the error)
+            pass
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(len(dates), http_client.max_concurrency())) as pool:
+        list(pool.map(lookup, sorted(dates)))
+
+
+@lru_cache(maxsize=None)
 def get_sitting_date(date_: datetime) -> datetime:
     """If input date is a sitting date return the input date
     else return the next sitting date"""
 
-    url_template = "https://whatson-api.parliament.uk/calendar/proceduraldates/Commons/nextsittingdate.json?dateToCheck={}"
+    # responses are also cached on disk by http_client
+
+    url_template = endpoints.NEXT_SITTING_DATE_URL + "?dateToCheck={}"
 
     one_day_ago = date_ - timedelta(days=1)
 
     url = url_template.format(one_day_ago.strftime("%Y-%m-%d"))
 
-    response = requests.get(url)
+    if date_ < datetime.now() - http_client.SETTLED_CALENDAR_AGE:
+        endpoint = "past_sitting_date"
+    else:
+        endpoint = "sitting_date"
+    response = http_client.get(url, endpoint=endpoint)
 
     return datetime.strptime(response.json(), "%Y-%m-%dT%H:%M:%S")
 
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+"""A long running build server that keeps the tools' data warm between builds.
+
+Each run of create_journal.py or make_papers_index.py is a new Python
+process, which has to import lxml, load the sessions list, look up the
+sitting calendar (from the cache on disk) and parse and transform every day
+again. The build server does all of that once and keeps it in memory:
+
+  * the tools' modules, the session registry and the HTTP client (with its
+    connection pool and an in-memory copy of the cached responses, see
+    http_client.enable_memory_cache), and
+  * the transformed days, by the hash of their VnP XML (see
+    create_journal.enable_day_cache), so a repeat build only transforms the
+    days that have changed.
+
+Start it in a terminal that is left open
+
+    python -m package.build_server serve
+
+then submit builds, with the same arguments as the tools themselves, e.g.
+
+    python -m package.build_server submit create_journal from-api 2017-19
+    python -m package.build_server submit make_papers_index from-api 2017-19 -o papers.xml
+
+The output of the build is shown by submit, which exits with the build's
+exit code. Builds are run one at a time, in the folder submit was run from.
+The server uses its own environment variables (e.g. for the endpoints), not
+those of submit.
+
+The server listens on a local socket (a named pipe on Windows) and only
+accepts clients that have the key in the cache folder.
+"""
+
+# std library imports
+from contextlib import redirect_stderr, redirect_stdout
+import getpass
+import io
+import os
+from pathlib import Path
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Sequence, TextIO
+
+# 3rd party imports
+import click
+
+# 1st party imports
+from package.http_client import CACHE_DIR
+
+TOOLS = ("create_journal", "make_papers_index")
+
+ADDRESS_ENV_VAR = "COMMONS_JOURNAL_BUILD_SERVER"
+KEY_FILENAME = "build_server.key"
+
+
+def default_address() -> str:
+    """The address of the server, a socket file in the cache folder (or a
+    named pipe on Windows) unless set with COMMONS_JOURNAL_BUILD_SERVER."""
+
+    address = os.environ.get(ADDRESS_ENV_VAR)
+    if address:
+        return address
+    if sys.platform == "win32":
+        return rf"\\.\pipe\commons-journal-build-{getpass.getuser()}"
+    return str(CACHE_DIR / "build_server.sock")
+
+
+def authkey(key_file: Optional[Path] = None, create: bool = False) -> bytes:
+    """The key shared by the server and its clients, made by the server."""
+
+    key_file = key_file or CACHE_DIR / KEY_FILENAME
+    if create and not key_file.exists():
+        key_file.parent.mkdir(parents=True, exist_ok=True)
+        # only readable by this user
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32).hex().encode("ascii"))
+    return key_file.read_bytes()
+
+
+class _ConnectionWriter(io.TextIOBase):
+    """stdout and stderr of a build, sent to the client as it is written."""
+
+    def __init__(self, send: Callable[[Any], None]):
+        self._send = send
+        self.connected = True
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text and self.connected:
+            try:
+                self._send(("output", text))
+            except OSError:
+                # the client has gone, finish the build anyway
+                self.connected = False
+        return len(text)
+
+
+class BuildServer:
+    def __init__(self, address: Optional[str] = None, key_file: Optional[Path] = None):
+        self.address = address or default_address()
+        self.key = authkey(key_file, create=True)
+        self.started = time.time()
+        self.jobs = 0
+        self.tools: Dict[str, Any] = {}
+        self._listener = None
+
+    def warm_up(self):
+        """Import the tools and turn on the in-memory caches."""
+
+        # the tools are in the folder above this package
+        repo_root = str(Path(__file__).resolve().parent.parent)
+        if repo_root not in sys.path:
+            sys.path.insert(0, repo_root)
+
+        # 1st party imports
+        import create_journal
+        import make_papers_index
+        from package import http_client
+        from package.utilities import get_session_registry
+
+        self.tools = {"create_journal": create_journal, "make_papers_index": make_papers_index}
+        create_journal.enable_day_cache()
+        http_client.enable_memory_cache()
+        try:
+            get_session_registry()
+        except Exception as e:
+            # e.g. offline with nothing cached, try again with the first build
+            print(f"Warning: could not load the sessions list: {e!r}")
+
+    def _listen(self):
+        from multiprocessing.connection import Listener
+
+        if sys.platform != "win32" and os.path.exists(self.address):
+            # left over from a server that did not stop cleanly?
+            try:
+                _call({"command": "status"}, self.address, self.key)
+            except (OSError, EOFError):
+                os.unlink(self.address)
+            else:
+                raise click.ClickException(f"A build server is already running at {self.address}")
+        self._listener = Listener(self.address, authkey=self.key)
+
+    def serve_forever(self, ready: Optional[Callable[[], None]] = None):
+        """Answer requests one at a time until asked to stop."""
+
+        from multiprocessing import AuthenticationError
+
+        # listen first, so that clients can connect while warming up
+        self._listen()
+        if ready is not None:
+            ready()
+        self.warm_up()
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    # e.g. a client with the wrong key
+                    print(f"Warning: rejected a connection: {e!r}")
+                    continue
+                with conn:
+                    try:
+                        request = conn.recv()
+                    except (OSError, EOFError):
+                        continue
+                    if request.get("command") == "stop":
+                        conn.send(("exit", 0))
+                        break
+                    self.handle(request, conn.send)
+        finally:
+            self._listener.close()
+
+    def handle(self, request: Dict[str, Any], send: Callable[[Any], None]):
+        command = request.get("command")
+        try:
+            if command == "run":
+                send(("exit", self.run(request["tool"], request["args"], request["cwd"], send)))
+            elif command == "status":
+                send(("status", self.status()))
+            else:
+                send(("error", f"Unknown command: {command!r}"))
+        except OSError:
+            # the client has gone
+            pass
+
+    def run(self, tool: str, args: Sequence[str], cwd: str, send: Callable[[Any], None]) -> int:
+        """Run one of the tools' command line interface with args in cwd,
+        sending its output with send. Returns its exit code."""
+
+        from package import http_client
+
+        module = self.tools.get(tool)
+        writer = _ConnectionWriter(send)
+        if module is None:
+            writer.write(f"Error: unknown tool {tool!r}, use one of: {', '.join(TOOLS)}\n")
+            return 2
+
+        self.jobs += 1
+        http_client.reset_stats()
+        if tool == "make_papers_index":
+            # recent dates in the calendar can change
+            module.get_sitting_date.cache_clear()
+
+        started = time.perf_counter()
+        old_cwd = os.getcwd()
+        with redirect_stdout(writer), redirect_stderr(writer):  # type: ignore[type-var]
+            try:
+                os.chdir(cwd)
+                result = module.cli.main(list(args), prog_name=f"{tool}.py", standalone_mode=False)
+                exit_code = result if isinstance(result, int) else 0
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except click.exceptions.Exit as e:
+                exit_code = e.exit_code
+            except click.ClickException as e:
+                e.show(writer)
+                exit_code = e.exit_code
+            except click.Abort:
+                exit_code = 1
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os.chdir(old_cwd)
+
+        print(f"{time.strftime('%H:%M:%S')} {tool} {' '.join(args)}: exit code {exit_code}"
+              f" in {time.perf_counter() - started:.2f} s")
+        return exit_code
+
+    def status(self) -> Dict[str, Any]:
+        import create_journal
+        from package import http_client
+
+        day_cache = create_journal._DAY_CACHE
+        memory_cache = getattr(http_client._CLIENT, "cache", None)
+        return {
+            "address": self.address,
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "jobs": self.jobs,
+            "days_cached": len(day_cache) if day_cache is not None else 0,
+            "responses_in_memory": len(getattr(memory_cache, "_entries", ())),
+        }
+
+
+def _call(request: Dict[str, Any], address: str, key: bytes, out: Optional[TextIO] = None) -> Any:
+    # send a request and return the final reply, writing any output to out
+    from multiprocessing.connection import Client
+
+    with Client(address, authkey=key) as conn:
+        conn.send(request)
+        while True:
+            kind, value = conn.recv()
+            if kind == "output":
+                if out is not None:
+                    out.write(value)
+                    out.flush()
+            elif kind == "error":
+                raise click.ClickException(value)
+            else:
+                return value
+
+
+def submit(
+    tool: str,
+    args: Sequence[str],
+    cwd: Optional[Path] = None,
+    address: Optional[str] = None,
+    key_file: Optional[Path] = None,
+    out: Optional[TextIO] = None,
+) -> int:
+    """Run a build on the server and return its exit code. The output is
+    written to out (default stdout) as the build runs."""
+
+    request = {"command": "run", "tool": tool, "args": list(args), "cwd": str(cwd or os.getcwd())}
+    return _call(request, address or default_address(), authkey(key_file), out or sys.stdout)
+
+
+def status(address: Optional[str] = None, key_file: Optional[Path] = None) -> Dict[str, Any]:
+    return _call({"command": "status"}, address or default_address(), authkey(key_file))
+
+
+def stop(address: Optional[str] = None, key_file: Optional[Path] = None):
+    _call({"command": "stop"}, address or default_address(), authkey(key_file))
+
+
+def _not_running(e: Exception) -> click.ClickException:
+    return click.ClickException(
+        f"Could not connect to the build server ({e}). "
+        "Start it with: python -m package.build_server serve"
+    )
+
+
+# -------------------- Begin comand line interface ------------------- #
+
+
+@click.group()
+def cli():
+    """Keep the journal and papers index builds warm in a long running
+    server (serve) and run builds on it (submit)."""
+
+
+@cli.command()
+def serve():
+    """Run the build server until stopped (Ctrl-C or the stop command)."""
+
+    server = BuildServer()
+    try:
+        server.serve_forever(
+            ready=lambda: print(f"Build server listening at {server.address}. Stop with Ctrl-C.")
+        )
+    except KeyboardInterrupt:
+        pass
+    print("Build server stopped.")
+
+
+@cli.command("submit", context_settings={"ignore_unknown_options": True})
+@click.argument("tool", type=click.Choice(TOOLS))
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def submit_command(tool: str, args: List[str]):
+    """Run TOOL (create_journal or make_papers_index) with ARGS on the
+    build server, e.g. submit create_journal from-api 2017-19"""
+
+    try:
+        exit_code = submit(tool, args)
+    except (OSError, EOFError) as e:
+        raise _not_running(e)
+    sys.exit(exit_code)
+
+
+@cli.command("status")
+def status_command():
+    """Show what the build server has in memory."""
+
+    try:
+        info = status()
+    except (OSError, EOFError) as e:
+        raise _not_running(e)
+    for key, value in info.items():
+        print(f"{key + ':':<21}{value}")
+
+
+@cli.command("stop")
+def stop_command():
+    """Stop the build server."""
+
+    try:
+        stop()
+    except (OSError, EOFError) as e:
+        raise _not_running(e)
+    print("Build server stopped.")
+
+
+# --------------------- End comand line interface -------------------- #
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,36 @@
+"""Base URLs for the parliamentary web services used by these tools.
+
+The defaults are the live services. Each base URL can be overridden with an
+environment variable, e.g. to run against the local stand-in server in
+package/stand_in_server.py:
+
+    COMMONS_JOURNAL_WHATSON_URL      (default https://whatson-api.parliament.uk)
+    COMMONS_JOURNAL_VNP_URL          (default http://services.vnp.parliament.uk)
+    COMMONS_JOURNAL_PAPERS_LAID_URL  (default http://services.paperslaid.parliament.uk)
+"""
+
+import os
+
+WHATSON_ENV_VAR = "COMMONS_JOURNAL_WHATSON_URL"
+VNP_ENV_VAR = "COMMONS_JOURNAL_VNP_URL"
+PAPERS_LAID_ENV_VAR = "COMMONS_JOURNAL_PAPERS_LAID_URL"
+
+WHATSON_URL = os.environ.get(
+    WHATSON_ENV_VAR, "https://whatson-api.parliament.uk"
+).rstrip("/")
+VNP_URL = os.environ.get(VNP_ENV_VAR, "http://services.vnp.parliament.uk").rstrip("/")
+PAPERS_LAID_URL = os.environ.get(
+    PAPERS_LAID_ENV_VAR, "http://services.paperslaid.parliament.uk"
+).rstrip("/")
+
+# whatson
+SESSIONS_LIST_URL = f"{WHATSON_URL}/calendar/sessions/list.json"
+NEXT_SITTING_DATE_URL = (
+    f"{WHATSON_URL}/calendar/proceduraldates/commons/nextsittingdate.json"
+)
+
+# VnP
+VOTE_ITEMS_URL = f"{VNP_URL}/voteitems"
+
+# papers laid
+PAPERS_LAID_DAILY_URL = f"{PAPERS_LAID_URL}/papers/list/daily.xml"
@@ -0,0 +1,157 @@
+"""A structured log of what a run of one of the command line tools did.
+
+With `--event-log FILE` (or the COMMONS_JOURNAL_EVENT_LOG environment
+variable) each run appends JSON lines to FILE, one per event:
+
+    {"ts": 1718000000.123, "run": "3f2a9c1b", "tool": "create_journal", "event": "start", "argv": [...]}
+    {"ts": ..., "event": "span", "name": "fetch", "wall_s": 1.52, "cpu_s": 0.31}
+    ...
+    {"ts": ..., "event": "summary", "status": "ok", "exit_code": 0, "duration_s": 9.8,
+     "counters": {"days": 150}, "stages": {"fetch": {"calls": 1, "wall_s": 1.52}}, ...}
+
+Every run ends with one summary record (also when it fails), for job
+runners to pick up. The spans are the stages of profiling.stage(), so this
+needs no instrumentation of its own, and counters are added with count().
+
+When the log is not enabled every function here returns straight away.
+"""
+
+# std library imports
+from contextlib import contextmanager, nullcontext
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class EventLog:
+    def __init__(self, file_path: Path, tool: str):
+        self.file_path = Path(file_path)
+        self.tool = tool
+        self.run_id = os.urandom(4).hex()
+        self.counters: Dict[str, int] = {}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        # line buffered so that a line is written as soon as it is complete
+        self._file = open(self.file_path, "a", encoding="utf-8", buffering=1)
+        self.emit("start", argv=sys.argv[1:], pid=os.getpid())
+
+    def emit(self, event: str, **fields: Any):
+        record = {"ts": round(time.time(), 3), "run": self.run_id, "tool": self.tool, "event": event}
+        record.update(fields)
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def span(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {"calls": 0, "wall_s": 0.0}
+            stats["calls"] += 1
+            stats["wall_s"] += wall
+        self.emit("span", name=name, wall_s=round(wall, 6), cpu_s=round(cpu, 6))
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self, exit_code: int, error: Optional[str] = None, **fields: Any):
+        with self._lock:
+            stages = {
+                name: {"calls": stats["calls"], "wall_s": round(stats["wall_s"], 6)}
+                for name, stats in self.stages.items()
+            }
+            counters = dict(self.counters)
+        self.emit(
+            "summary",
+            status="ok" if exit_code == 0 else "error",
+            exit_code=exit_code,
+            error=error,
+            duration_s=round(time.perf_counter() - self.started, 6),
+            counters=counters,
+            stages=stages,
+            **fields,
+        )
+        self._file.close()
+
+
+# the active log, None when there isn't one
+_LOG: Optional[EventLog] = None
+
+
+def enable(file_path: Path, tool: str) -> EventLog:
+    global _LOG
+    _LOG = EventLog(file_path, tool)
+    return _LOG
+
+
+def enabled() -> bool:
+    return _LOG is not None
+
+
+def emit(event: str, **fields: Any):
+    """Write an event (no-op when disabled)."""
+    if _LOG is not None:
+        _LOG.emit(event, **fields)
+
+
+def count(name: str, n: int = 1):
+    """Add n to a counter in the summary (no-op when disabled)."""
+    if _LOG is not None:
+        _LOG.count(name, n)
+
+
+def record_span(name: str, wall: float, cpu: float):
+    """Record a span that has already been timed (no-op when disabled)."""
+    if _LOG is not None:
+        _LOG.span(name, wall, cpu)
+
+
+@contextmanager
+def _span(log: EventLog, name: str) -> Iterator[None]:
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        log.span(name, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+
+def span(name: str):
+    """Context manager timing a span (no-op when disabled)."""
+    if _LOG is None:
+        return nullcontext()
+    return _span(_LOG, name)
+
+
+def _exit_status() -> Tuple[int, Optional[str]]:
+    # the exit code and error of the exception being handled, if any
+    exc = sys.exc_info()[1]
+    if exc is None:
+        return 0, None
+    if isinstance(exc, SystemExit):
+        if exc.code is None or isinstance(exc.code, int):
+            return exc.code or 0, None
+        return 1, str(exc.code)
+    # e.g. click's usage errors have their own exit code
+    return getattr(exc, "exit_code", 1), repr(exc)
+
+
+def finish(**fields: Any):
+    """Write the summary record and close the log, if there is one.
+
+    Call while the tool is exiting (e.g. with click's call_on_close) so the
+    exit code can be taken from the SystemExit (or error) being raised."""
+    global _LOG
+    if _LOG is None:
+        return
+    exit_code, error = _exit_status()
+    log, _LOG = _LOG, None
+    log.finish(exit_code, error, **fields)
@@ -0,0 +1,133 @@
+"""A checkpoint of a session's VnP XML being downloaded, so that a run of
+create_journal.py from-api that stops part way (e.g. the network drops)
+carries on from where it got to when it is run again.
+
+The checkpoint is kept in the folder the raw XML is saved to, next to the
+files, and records the session's sitting dates and the days that have
+been downloaded and checked, with the sha256 of each file:
+
+    datedJournalFragments/
+        session_2017-19_checkpoint.json
+        2017-06-21.xml
+        ...
+
+    {
+        "session": "2017-19",
+        "sitting_dates": ["2017-06-21", ...],
+        "days": {"2017-06-21": {"sha256": "...", "bytes": 48213}},
+        "complete": false
+    }
+
+A day only counts as done if its file is still there and has the same
+hash. Once a run has finished the checkpoint is marked complete and the
+next run starts again (re-requesting the days, which the HTTP cache makes
+cheap), as the sitting dates and latest days may have changed since.
+"""
+
+# std library imports
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Any, Dict, List, Optional
+
+# 1st party imports
+from package.fragment_store import source_hash
+
+CHECKPOINT_TEMPLATE = "session_{session}_checkpoint.json"
+
+
+def _write(file_path: Path, data: bytes):
+    # write to a temp file first so a reader never sees half a file
+    temp_path = file_path.with_name(
+        f"{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    temp_path.write_bytes(data)
+    os.replace(temp_path, file_path)
+
+
+class FetchCheckpoint:
+    """The days of session downloaded into folder so far."""
+
+    def __init__(self, folder: Path, session: str):
+        self.folder = Path(folder)
+        self.session = session
+        self.path = self.folder / CHECKPOINT_TEMPLATE.format(session=session)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.data: Dict[str, Any] = {
+            "session": session,
+            "sitting_dates": None,
+            "days": {},
+            "complete": False,
+        }
+        # True if carrying on from a run that did not finish
+        self.resumed = False
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+            if (
+                saved["session"] == session
+                and not saved["complete"]
+                and isinstance(saved["days"], dict)
+            ):
+                self.data = saved
+                self.resumed = True
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    @property
+    def sitting_dates(self) -> Optional[List[datetime]]:
+        """The sitting dates recorded by set_sitting_dates, if any."""
+        dates = self.data["sitting_dates"]
+        if dates is None:
+            return None
+        return [datetime.strptime(d, "%Y-%m-%d") for d in dates]
+
+    def set_sitting_dates(self, sitting_dates: List[datetime]):
+        self.data["sitting_dates"] = [d.strftime("%Y-%m-%d") for d in sitting_dates]
+        self.save()
+
+    def file_for(self, date: datetime) -> Path:
+        return self.folder / f"{date:%Y-%m-%d}.xml"
+
+    def is_done(self, date: datetime) -> bool:
+        """True if date has been downloaded and its file is unchanged."""
+        entry = self.data["days"].get(f"{date:%Y-%m-%d}")
+        if entry is None:
+            return False
+        try:
+            return source_hash(self.file_for(date).read_bytes()) == entry["sha256"]
+        except OSError:
+            return False
+
+    def record(self, date: datetime, content: bytes):
+        """Save a downloaded (and checked) day and checkpoint it."""
+        _write(self.file_for(date), content)
+        with self._lock:
+            self.data["days"][f"{date:%Y-%m-%d}"] = {
+                "sha256": source_hash(content),
+                "bytes": len(content),
+            }
+        self.save()
+
+    def save(self):
+        with self._lock:
+            _write(self.path, json.dumps(self.data, indent=1).encode("utf-8"))
+
+    def finish(self):
+        """Mark the run as complete, so the next run starts again."""
+        self.data["complete"] = True
+        self.save()
+
+    def discard(self):
+        """Remove the checkpoint and the files it recorded."""
+        for date_str in self.data["days"]:
+            (self.folder / f"{date_str}.xml").unlink(missing_ok=True)
+        self.path.unlink(missing_ok=True)
+        try:
+            # only if empty
+            self.folder.rmdir()
+        except OSError:
+            pass
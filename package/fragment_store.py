@@ -0,0 +1,83 @@
+"""A folder of transformed days that a whole output can be assembled from.
+
+Each day is kept as its own fragment file, named by the date, alongside a
+manifest (store.json) with a hash of the source the fragment was made
+from. When a day's source has not changed the day does not need to be
+transformed again, so adding a new day to an output only means
+transforming that day and reassembling.
+
+    store/
+        store.json       {"days": {"2017-06-21": {"sha256": ..., "fragment": ...}}}
+        2017-06-21.xml
+        ...
+"""
+
+# std library imports
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+MANIFEST_FILENAME = "store.json"
+
+
+def source_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write(file_path: Path, data: bytes):
+    # write to a temp file first so a reader never sees half a file
+    temp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, file_path)
+
+
+class FragmentStore:
+    """Fragments by date (YYYY-MM-DD) in folder."""
+
+    def __init__(self, folder: Path, suffix: str = ".xml"):
+        self.folder = Path(folder)
+        self.suffix = suffix
+        self.manifest_path = self.folder / MANIFEST_FILENAME
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            self.days: Dict[str, Dict[str, str]] = manifest["days"]
+        except (OSError, ValueError, KeyError):
+            self.days = {}
+
+    def dates(self) -> List[str]:
+        """The dates in the store, in order."""
+        return sorted(self.days)
+
+    def is_current(self, date: str, data: bytes) -> bool:
+        """True if date's fragment was made from data (and still exists)."""
+        entry = self.days.get(date)
+        return (
+            entry is not None
+            and entry["sha256"] == source_hash(data)
+            and (self.folder / entry["fragment"]).exists()
+        )
+
+    def put(self, date: str, data: bytes, fragment: bytes):
+        """Store the fragment made from (source) data for date."""
+        file_name = f"{date}{self.suffix}"
+        _write(self.folder / file_name, fragment)
+        self.days[date] = {"sha256": source_hash(data), "fragment": file_name}
+
+    def get(self, date: str) -> bytes:
+        return (self.folder / self.days[date]["fragment"]).read_bytes()
+
+    def remove(self, date: str):
+        entry = self.days.pop(date, None)
+        if entry is not None:
+            (self.folder / entry["fragment"]).unlink(missing_ok=True)
+
+    def save(self):
+        """Write the manifest. Call after a batch of puts and removes."""
+        _write(
+            self.manifest_path,
+            json.dumps({"days": self.days}, indent=1, sort_keys=True).encode("utf-8"),
+        )
@@ -0,0 +1,576 @@
+"""One HTTP client for all the tools.
+
+Every request to whatson, VnP and papers laid goes through `get()`, which
+uses a shared, pooled requests.Session with uniform timeouts and retries
+(including on HTTP 429 and 5xx) and a cache of responses on disk.
+
+Each kind of endpoint has its own time to live (see ENDPOINT_TTLS). Within
+the TTL a cached response is returned without touching the network. After
+it, the request is made with the cached ETag/Last-Modified validators so an
+unchanged resource costs only a 304. The cache is limited to
+MAX_CACHE_BYTES and the least recently used responses are evicted first.
+
+The number of requests in flight to each host is adjusted as responses
+come back (see AdaptiveLimiter), up to MAX_CONCURRENCY, so callers can
+submit all their requests to a thread pool of max_concurrency() threads.
+
+Cache hits and misses are counted and can be printed with `summary()`.
+
+requests is only imported when the first request is made, so that the
+tools start quickly when they don't use the network (e.g. --help).
+"""
+
+# std library imports
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    # 3rd party imports
+    import requests
+
+# 1st party imports
+from package import events
+
+# where downloaded data is cached between runs
+CACHE_DIR = Path(
+    os.environ.get("COMMONS_JOURNAL_CACHE_DIR", Path.home() / ".commons_journal_cache")
+)
+
+HTTP_CACHE_DIR = CACHE_DIR / "http"
+
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# see enable_memory_cache()
+MAX_MEMORY_CACHE_BYTES = 128 * 1024 * 1024
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
+
+RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled on each retry
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+POOL_SIZE = 16
+
+# the most requests in flight to one host (see AdaptiveLimiter)
+MAX_CONCURRENCY_ENV_VAR = "COMMONS_JOURNAL_MAX_CONCURRENCY"
+MAX_CONCURRENCY = int(os.environ.get(MAX_CONCURRENCY_ENV_VAR, POOL_SIZE))
+INITIAL_CONCURRENCY = 4
+# the limit only grows while the average latency is within this factor of
+# the lowest seen
+LATENCY_TOLERANCE = 2.0
+
+# How long a cached response is used without checking with the server.
+# Endpoints not listed here (or endpoint=None) are not cached.
+ENDPOINT_TTLS: Dict[str, timedelta] = {
+    "sessions": timedelta(days=1),
+    "sitting_date": timedelta(days=1),
+    # the calendar for dates long past does not change
+    "past_sitting_date": timedelta(days=90),
+    "vnp": timedelta(hours=1),
+    "papers_laid": timedelta(hours=1),
+}
+
+# dates older than this use the "past_sitting_date" TTL
+SETTLED_CALENDAR_AGE = timedelta(days=30)
+
+# headers worth keeping with a cached response
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class DiskCache:
+    """Responses stored as <key>.body with metadata in <key>.json.
+
+    The metadata file's modification time is used as the last access time
+    for least recently used eviction."""
+
+    def __init__(self, directory: Path, max_bytes: int = MAX_CACHE_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # total bytes, worked out when needed
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        self.touch(key)
+        return meta, body
+
+    def touch(self, key: str):
+        try:
+            os.utime(self._paths(key)[0])
+        except OSError:
+            pass
+
+    def remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                continue
+            if path.suffix == ".body":
+                with self._lock:
+                    if self._size is not None:
+                        self._size -= size
+
+    def save(self, key: str, meta: Dict[str, Any], body: Optional[bytes] = None):
+        """Save a response. If body is None only the metadata is updated."""
+
+        meta_path, body_path = self._paths(key)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if body is not None:
+                old_size = body_path.stat().st_size if body_path.exists() else 0
+                _atomic_write(body_path, body)
+                with self._lock:
+                    if self._size is not None:
+                        self._size += len(body) - old_size
+            _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            print(f"Warning: could not write to the HTTP cache: {e}")
+            return
+        if body is not None:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used responses until under max_bytes."""
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self.directory.glob("*.body"))
+            if self._size <= self.max_bytes:
+                return
+
+            entries = []
+            for meta_path in self.directory.glob("*.json"):
+                body_path = meta_path.with_suffix(".body")
+                try:
+                    entries.append(
+                        (meta_path.stat().st_mtime, body_path.stat().st_size, meta_path, body_path)
+                    )
+                except OSError:
+                    continue
+            entries.sort()
+
+            # go a bit below the limit so we don't evict on every save
+            target = self.max_bytes * 0.9
+            for _, size, meta_path, body_path in entries:
+                if self._size <= target:
+                    break
+                for p in (meta_path, body_path):
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+                self._size -= size
+
+
+class MemoryCache:
+    """A DiskCache that also keeps the most recently used responses in
+    memory, up to max_bytes of bodies. For long running processes, such as
+    the build server, where the same responses are read again and again."""
+
+    def __init__(self, disk: DiskCache, max_bytes: int = MAX_MEMORY_CACHE_BYTES):
+        self.disk = disk
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                # a copy, as the caller may change the metadata
+                return dict(entry[0]), entry[1]
+        cached = self.disk.load(key)
+        if cached is not None:
+            self._remember(key, *cached)
+        return cached
+
+    def touch(self, key: str):
+        self.disk.touch(key)
+
+    def remove(self, key: str):
+        self.disk.remove(key)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= len(entry[1])
+
+    def save(self, key: str, meta: Dict[str, Any], body: Optional[bytes] = None):
+        self.disk.save(key, meta, body)
+        if body is None:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                return
+            body = entry[1]
+        self._remember(key, dict(meta), body)
+
+    def _remember(self, key: str, meta: Dict[str, Any], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (meta, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+def _atomic_write(file_path: Path, data: bytes):
+    temp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, file_path)
+
+
+def _response_from_cache(url: str, meta: Dict[str, Any], body: bytes) -> "requests.Response":
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response._content = body
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = url
+    response.from_cache = True  # type: ignore[attr-defined]
+    return response
+
+
+class AdaptiveLimiter:
+    """Limits the requests in flight to one host, adjusting the limit from
+    how the host responds (additive increase, multiplicative decrease).
+
+    The limit starts at initial and goes up by one each time `limit`
+    requests in a row succeed while the latency is steady (the moving
+    average within LATENCY_TOLERANCE of the lowest seen), up to ceiling. It
+    is halved when a request fails, is rate limited (429) or gets a 5xx,
+    but only once for requests that were already in flight when it was
+    last lowered. Each change is kept in decisions and written to the
+    event log."""
+
+    def __init__(self, host: str, ceiling: int = MAX_CONCURRENCY, initial: int = INITIAL_CONCURRENCY):
+        self.host = host
+        self.ceiling = max(1, ceiling)
+        self.limit = max(1, min(initial, self.ceiling))
+        self.peak = self.limit
+        self.in_flight = 0
+        self.decisions: List[Dict[str, Any]] = []
+
+        self._successes = 0  # in a row, since the limit last changed
+        self._lowest_latency: Optional[float] = None
+        self._latency: Optional[float] = None  # moving average
+        self._generation = 0  # incremented when the limit is lowered
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        """Wait for a free slot. Returns a token for release()."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+            return self._generation
+
+    def release(self, token: int, latency: float, overloaded: bool):
+        """Free the slot from acquire(). overloaded is True if the request
+        failed or the host said it was busy."""
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                self._successes = 0
+                # requests sent before the last decrease don't count again
+                if token == self._generation and self.limit > 1:
+                    self._generation += 1
+                    self._change(max(1, self.limit // 2), "overloaded")
+            else:
+                self._observe(latency)
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.ceiling:
+                    self._successes = 0
+                    if self._latency <= self._lowest_latency * LATENCY_TOLERANCE:
+                        self._change(self.limit + 1, "latency steady")
+            self._condition.notify_all()
+
+    def _observe(self, latency: float):
+        if self._lowest_latency is None or latency < self._lowest_latency:
+            self._lowest_latency = latency
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += 0.2 * (latency - self._latency)
+
+    def _change(self, limit: int, reason: str):
+        decision = {
+            "host": self.host,
+            "limit": limit,
+            "previous": self.limit,
+            "reason": reason,
+            "latency_s": None if self._latency is None else round(self._latency, 4),
+        }
+        self.limit = limit
+        self.peak = max(self.peak, limit)
+        self.decisions.append(decision)
+        events.emit("concurrency", **decision)
+
+
+class HttpClient:
+    def __init__(
+        self,
+        cache_dir: Path = HTTP_CACHE_DIR,
+        max_cache_bytes: int = MAX_CACHE_BYTES,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        retries: int = RETRIES,
+        pool_size: int = POOL_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache: Union[DiskCache, MemoryCache] = DiskCache(cache_dir, max_cache_bytes)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            # give back the last response rather than raising
+            raise_on_status=False,
+        )
+        # enough connections for the most requests in flight
+        pool_size = max(pool_size, max_concurrency)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats: Dict[str, int] = dict.fromkeys(
+            ("requests", "hits", "revalidated", "misses", "uncached", "retries"), 0
+        )
+        self._lock = threading.Lock()
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def get(
+        self,
+        url: str,
+        endpoint: Optional[str] = None,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        ttl: Optional[timedelta] = None,
+        use_cache: bool = True,
+        **kwargs,
+    ) -> "requests.Response":
+        """GET url. endpoint (a key of ENDPOINT_TTLS) decides how long the
+        response is cached for, unless ttl is given. Other keyword arguments
+        are passed to requests.Session.get (e.g. stream, verify)."""
+
+        self._count("requests")
+
+        if ttl is None and endpoint is not None:
+            ttl = ENDPOINT_TTLS.get(endpoint)
+        if not use_cache or ttl is None or kwargs.get("stream"):
+            self._count("uncached")
+            return self._fetch(url, params=params, headers=headers, **kwargs)
+
+        import requests
+
+        full_url = requests.Request("GET", url, params=params).prepare().url or url
+        key = DiskCache.key(full_url)
+        cached = self.cache.load(key)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            meta, body = cached
+            if time.time() - meta["stored_at"] < ttl.total_seconds():
+                self._count("hits")
+                return _response_from_cache(full_url, meta, body)
+            # stale, so ask the server if it has changed
+            if meta["headers"].get("ETag"):
+                request_headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        response = self._fetch(full_url, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            meta, body = cached
+            meta["stored_at"] = time.time()
+            self.cache.save(key, meta)
+            self._count("revalidated")
+            return _response_from_cache(full_url, meta, body)
+
+        self._count("misses")
+        if response.status_code == 200:
+            meta = {
+                "url": full_url,
+                "status": response.status_code,
+                "stored_at": time.time(),
+                "headers": {h: response.headers[h] for h in _KEPT_HEADERS if h in response.headers},
+            }
+            self.cache.save(key, meta, response.content)
+        return response
+
+    def forget(self, url: str, params: Optional[Dict[str, str]] = None):
+        """Remove url's response from the cache, e.g. if it was bad."""
+        import requests
+
+        full_url = requests.Request("GET", url, params=params).prepare().url or url
+        self.cache.remove(DiskCache.key(full_url))
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        """The AdaptiveLimiter for url's host."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self.limiters.get(host)
+            if limiter is None:
+                limiter = self.limiters[host] = AdaptiveLimiter(host, self.max_concurrency)
+            return limiter
+
+    def _fetch(self, url: str, **kwargs) -> "requests.Response":
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self.limiter(url)
+        token = limiter.acquire()
+        start = time.perf_counter()
+        overloaded = True
+        try:
+            response = self.session.get(url, **kwargs)
+            retries = getattr(getattr(response.raw, "retries", None), "history", ())
+            if retries:
+                self._count("retries", len(retries))
+            overloaded = bool(retries) or response.status_code in RETRY_STATUSES
+        finally:
+            limiter.release(token, time.perf_counter() - start, overloaded)
+        return response
+
+    def hit_rate(self) -> Optional[float]:
+        cacheable = self.stats["hits"] + self.stats["revalidated"] + self.stats["misses"]
+        if cacheable == 0:
+            return None
+        return (self.stats["hits"] + self.stats["revalidated"]) / cacheable
+
+    def summary(self) -> str:
+        s = self.stats
+        hit_rate = self.hit_rate()
+        rate = f"{hit_rate:.0%}" if hit_rate is not None else "n/a"
+        return (
+            f"HTTP: {s['requests']} requests, cache hit rate {rate} "
+            f"({s['hits']} hits, {s['revalidated']} revalidated, {s['misses']} misses, "
+            f"{s['uncached']} not cacheable), {s['retries']} retries"
+        ) + "".join(
+            f"\n  {host}: up to {limiter.peak} requests at once,"
+            f" {len(limiter.decisions)} changes, now {limiter.limit}"
+            for host, limiter in self.limiters.items()
+        )
+
+
+_CLIENT: Optional[HttpClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Return the shared HttpClient, creating it on first use."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HttpClient()
+        return _CLIENT
+
+
+def max_concurrency() -> int:
+    """The most requests that will be in flight to one host, e.g. for the
+    number of threads making requests."""
+    if _CLIENT is not None:
+        return _CLIENT.max_concurrency
+    return MAX_CONCURRENCY
+
+
+def set_max_concurrency(ceiling: int):
+    """Change the most requests in flight to one host. Best called before
+    the first request, as the connection pool is sized from it."""
+    global MAX_CONCURRENCY
+    MAX_CONCURRENCY = ceiling
+    if _CLIENT is not None:
+        _CLIENT.max_concurrency = ceiling
+        for limiter in _CLIENT.limiters.values():
+            limiter.ceiling = ceiling
+            limiter.limit = min(limiter.limit, ceiling)
+
+
+def enable_memory_cache(max_bytes: int = MAX_MEMORY_CACHE_BYTES):
+    """Also keep cached responses in memory (see MemoryCache), so that a
+    long running process does not read them from disk every time."""
+    client = get_client()
+    if not isinstance(client.cache, MemoryCache):
+        client.cache = MemoryCache(client.cache, max_bytes)
+
+
+def reset_stats():
+    """Start counting the shared client's requests again, e.g. for each job
+    in a long running process."""
+    if _CLIENT is not None:
+        with _CLIENT._lock:
+            _CLIENT.stats = dict.fromkeys(_CLIENT.stats, 0)
+
+
+def get(url: str, **kwargs) -> "requests.Response":
+    """GET url with the shared client. See HttpClient.get()"""
+    return get_client().get(url, **kwargs)
+
+
+def forget(url: str, params: Optional[Dict[str, str]] = None):
+    """Remove url's response from the shared client's cache."""
+    get_client().forget(url, params)
+
+
+def stats() -> Optional[Dict[str, Any]]:
+    """The shared client's counts (see HttpClient.stats) and cache hit rate
+    (None if no requests were made)."""
+    if _CLIENT is None or _CLIENT.stats["requests"] == 0:
+        return None
+    concurrency = {
+        host: {"limit": limiter.limit, "peak": limiter.peak, "changes": len(limiter.decisions)}
+        for host, limiter in _CLIENT.limiters.items()
+    }
+    return dict(_CLIENT.stats, hit_rate=_CLIENT.hit_rate(), concurrency=concurrency)
+
+
+def summary() -> Optional[str]:
+    """Summary of the shared client's requests (None if none were made)."""
+    if _CLIENT is None or _CLIENT.stats["requests"] == 0:
+        return None
+    return _CLIENT.summary()
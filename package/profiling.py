@@ -0,0 +1,218 @@
+"""Per-stage timing for the command line tools.
+
+Code marks the stages of a build with `profiling.stage(name)` and individual
+days or papers with `profiling.item(kind, key)`. These do nothing until
+`profiling.enable()` is called (the --profile option of the command line
+tools), after which wall time, CPU time, call counts and peak memory are
+recorded for each stage and the slowest items are kept.
+
+Stages can be nested (e.g. "tables" inside "classify"); times are inclusive.
+The stages are also written to the event log as spans (see events.py), and
+items are counted there, whether or not profiling is enabled.
+Peak memory is the process's peak resident set size (so it includes memory
+used by lxml) when the stage finishes, together with how much the peak grew
+during the stage.
+"""
+
+# std library imports
+from contextlib import contextmanager, nullcontext
+import cProfile
+import heapq
+import json
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 1st party imports
+from package import events
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+
+SLOWEST_ITEMS = 10
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None if unknown)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # bytes on macOS, kilobytes on Linux
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
+class StageStats:
+    __slots__ = ("calls", "wall", "cpu", "peak_rss_mb", "rss_growth_mb")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_mb: Optional[float] = None
+        self.rss_growth_mb = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(self.cpu, 6),
+            "peak_rss_mb": self.peak_rss_mb,
+            "rss_growth_mb": round(self.rss_growth_mb, 3),
+        }
+
+
+class Profiler:
+    def __init__(self, cprofile_path: Optional[Path] = None):
+        self.stages: Dict[str, StageStats] = {}
+        # kind -> heap of (seconds, key) with the slowest items
+        self.items: Dict[str, List[Tuple[float, str]]] = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+        self.cprofile_path = cprofile_path
+        self._cprofile: Optional[cProfile.Profile] = None
+        if cprofile_path is not None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        rss_before = peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            rss_after = peak_rss_mb()
+            with self._lock:
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = self.stages[name] = StageStats()
+                stats.calls += 1
+                stats.wall += wall
+                stats.cpu += cpu
+                if rss_after is not None and rss_before is not None:
+                    stats.peak_rss_mb = rss_after
+                    stats.rss_growth_mb += rss_after - rss_before
+            events.record_span(name, wall, cpu)
+
+    @contextmanager
+    def item(self, kind: str, key: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_item(kind, key, time.perf_counter() - start)
+
+    def record_item(self, kind: str, key: str, seconds: float):
+        with self._lock:
+            heap = self.items.setdefault(kind, [])
+            if len(heap) < SLOWEST_ITEMS:
+                heapq.heappush(heap, (seconds, key))
+            else:
+                heapq.heappushpop(heap, (seconds, key))
+
+    def slowest(self, kind: str) -> List[Tuple[float, str]]:
+        return sorted(self.items.get(kind, []), reverse=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_wall_s": round(time.perf_counter() - self.started, 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+            "slowest": {
+                kind: [{"key": key, "seconds": round(secs, 6)} for secs, key in self.slowest(kind)]
+                for kind in self.items
+            },
+        }
+
+    def report(self) -> str:
+        lines = [
+            f"{'Stage':<16}{'Calls':>8}{'Wall (s)':>11}{'CPU (s)':>10}{'Peak RSS (MB)':>15}{'Growth (MB)':>13}"
+        ]
+        for name, stats in self.stages.items():
+            peak = f"{stats.peak_rss_mb:.1f}" if stats.peak_rss_mb is not None else "n/a"
+            lines.append(
+                f"{name:<16}{stats.calls:>8}{stats.wall:>11.3f}{stats.cpu:>10.3f}"
+                f"{peak:>15}{stats.rss_growth_mb:>13.1f}"
+            )
+        lines.append(f"Total wall time: {time.perf_counter() - self.started:.3f} s")
+
+        for kind in self.items:
+            lines.append(f"\nSlowest {kind}s:")
+            for secs, key in self.slowest(kind):
+                lines.append(f"  {secs:>8.3f} s  {key}")
+
+        return "\n".join(lines)
+
+    def finish(self, json_path: Optional[Path] = None):
+        """Stop profiling, print the report and optionally write it as JSON."""
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(str(self.cprofile_path))
+
+        print("\n" + self.report())
+
+        if self.cprofile_path is not None:
+            print(f"cProfile stats written to: {Path(self.cprofile_path).absolute()}")
+
+        if json_path is not None:
+            Path(json_path).write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+            print(f"Profile written to: {Path(json_path).absolute()}")
+
+
+# the active profiler, None when profiling is off
+_PROFILER: Optional[Profiler] = None
+_JSON_PATH: Optional[Path] = None
+
+
+def enable(json_path: Optional[Path] = None, cprofile_path: Optional[Path] = None) -> Profiler:
+    global _PROFILER, _JSON_PATH
+    _PROFILER = Profiler(cprofile_path=cprofile_path)
+    _JSON_PATH = json_path
+    return _PROFILER
+
+
+def enabled() -> bool:
+    return _PROFILER is not None
+
+
+def stage(name: str):
+    """Context manager timing a stage of the build (no-op when disabled)."""
+    if _PROFILER is None:
+        return events.span(name)
+    return _PROFILER.stage(name)
+
+
+def item(kind: str, key: str):
+    """Context manager timing one item, e.g. a day or a paper."""
+    events.count(f"{kind}s")
+    if _PROFILER is None:
+        return nullcontext()
+    return _PROFILER.item(kind, key)
+
+
+def disable() -> Optional[Profiler]:
+    """Stop profiling without a report and return the profiler used."""
+    global _PROFILER
+    profiler, _PROFILER = _PROFILER, None
+    return profiler
+
+
+def finish():
+    """Print (and write) the report if profiling is enabled."""
+    global _PROFILER
+    if _PROFILER is None:
+        return
+    _PROFILER.finish(_JSON_PATH)
+    _PROFILER = None
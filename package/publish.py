@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""Prepare the journal HTML for a static host.
+
+Each HTML and JSON file is minified and written to the publish folder along
+with precompressed .gz and (if the brotli package is installed) .br copies,
+so the host can serve them without compressing on the fly.
+
+The HTML minifier only removes what a browser ignores: comments (other than
+conditional comments) and runs of spaces, tabs and newlines, which become a
+single space or newline. The text of <pre>, <textarea>, <script> and
+<style> is left alone, as are non-breaking spaces. This assumes the pages do
+not use the CSS white-space property to preserve whitespace elsewhere.
+
+A hash of each source file is kept in a manifest in the publish folder and
+files that have not changed since they were last published are skipped.
+
+    python -m package.publish OUTPUT_FOLDER PUBLISH_FOLDER
+"""
+
+# std library imports
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+from typing import Callable, Dict, Iterable, Optional
+
+# 3rd party imports
+import click
+from lxml import etree
+from lxml import html
+from lxml.html import HtmlComment, HtmlElement
+
+try:
+    import brotli
+except ImportError:  # optional, only .gz files are written without it
+    brotli = None  # type: ignore
+
+
+PUBLISH_MANIFEST_FILENAME = ".publish-manifest.json"
+
+# whitespace that HTML collapses. Not \s, which includes non-breaking spaces
+HTML_WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+
+# elements whose text must not be changed
+PRESERVE_WHITESPACE_TAGS = frozenset(("pre", "textarea", "script", "style"))
+
+_UTF8_PARSER = html.HTMLParser(encoding="utf-8")
+
+
+# ------------------------------ minifiers ------------------------------ #
+
+
+def _collapse(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return text
+    return HTML_WHITESPACE.sub(lambda m: "\n" if "\n" in m.group() else " ", text)
+
+
+def _minify_element(element: HtmlElement):
+    for child in list(element):
+        if isinstance(child, HtmlComment) and not (child.text or "").startswith("[if"):
+            # drop_tree keeps the tail
+            child.drop_tree()
+
+    element.text = _collapse(element.text)
+    for child in element:
+        child.tail = _collapse(child.tail)
+        if isinstance(child.tag, str) and child.tag not in PRESERVE_WHITESPACE_TAGS:
+            _minify_element(child)
+
+
+def minify_html(data: bytes) -> bytes:
+    """Minify a whole HTML page or, if there is no <html> element, an HTML
+    fragment (e.g. one day). data must be UTF-8."""
+
+    if re.search(rb"<html[\s>]", data[:2048], flags=re.I):
+        tree = html.document_fromstring(data, parser=_UTF8_PARSER).getroottree()
+        _minify_element(tree.getroot())
+        return etree.tostring(
+            tree, method="html", encoding="utf-8", doctype=tree.docinfo.doctype
+        )
+
+    # wrap the fragment so it can be treated like an element
+    wrapper = html.fragment_fromstring(data.decode("utf-8"), create_parent="div")
+    _minify_element(wrapper)
+    return (wrapper.text or "").encode("utf-8") + b"".join(
+        html.tostring(child, encoding="utf-8") for child in wrapper
+    )
+
+
+def minify_json(data: bytes) -> bytes:
+    return json.dumps(
+        json.loads(data), separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+MINIFIERS: Dict[str, Callable[[bytes], bytes]] = {
+    ".html": minify_html,
+    ".json": minify_json,
+}
+
+
+# ------------------------------ publishing ----------------------------- #
+
+
+def _compressed(data: bytes) -> Dict[str, bytes]:
+    # mtime=0 so the same input always gives the same .gz
+    compressed = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed[".br"] = brotli.compress(data, quality=11)
+    return compressed
+
+
+def _write(file_path: Path, data: bytes):
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, file_path)
+
+
+class Publisher:
+    """Publish files from source_dir into publish_dir."""
+
+    def __init__(self, source_dir: Path, publish_dir: Path):
+        self.source_dir = Path(source_dir)
+        self.publish_dir = Path(publish_dir)
+        self.manifest_path = self.publish_dir / PUBLISH_MANIFEST_FILENAME
+        self.stats: Dict[str, int] = dict.fromkeys(
+            ("files", "skipped", "source_bytes", "minified_bytes", "gz_bytes", "br_bytes"),
+            0,
+        )
+
+        try:
+            self.manifest: Dict[str, Dict] = json.loads(
+                self.manifest_path.read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _is_current(self, name: str, digest: str) -> bool:
+        entry = self.manifest.get(name)
+        if entry is None or entry["sha256"] != digest:
+            return False
+        # check nothing has been deleted from the publish folder
+        return all(
+            (self.publish_dir / f"{name}{suffix}").exists()
+            for suffix in [""] + entry["compressed"]
+        )
+
+    def publish_file(self, source_path: Path):
+        name = source_path.relative_to(self.source_dir).as_posix()
+        data = source_path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+
+        self.stats["files"] += 1
+        self.stats["source_bytes"] += len(data)
+
+        if self._is_current(name, digest):
+            self.stats["skipped"] += 1
+            entry = self.manifest[name]
+        else:
+            minifier = MINIFIERS.get(source_path.suffix.lower())
+            minified = minifier(data) if minifier is not None else data
+            compressed = _compressed(minified)
+
+            target = self.publish_dir / name
+            _write(target, minified)
+            for suffix, compressed_data in compressed.items():
+                _write(target.with_name(target.name + suffix), compressed_data)
+
+            entry = {
+                "sha256": digest,
+                "bytes": len(minified),
+                "compressed": sorted(compressed),
+                **{f"{s[1:]}_bytes": len(d) for s, d in compressed.items()},
+            }
+            self.manifest[name] = entry
+
+        self.stats["minified_bytes"] += entry["bytes"]
+        self.stats["gz_bytes"] += entry.get("gz_bytes", 0)
+        self.stats["br_bytes"] += entry.get("br_bytes", 0)
+
+    def publish(self, source_paths: Iterable[Path]) -> Dict[str, int]:
+        for source_path in source_paths:
+            self.publish_file(Path(source_path))
+        _write(self.manifest_path, json.dumps(self.manifest, indent=1).encode("utf-8"))
+        return self.stats
+
+    def report(self) -> str:
+        s = self.stats
+
+        def size(n: int) -> str:
+            return f"{n / 1024:,.0f} KB"
+
+        def saving(n: int) -> str:
+            return f"{1 - n / s['source_bytes']:.0%}" if s["source_bytes"] else "n/a"
+
+        lines = [
+            f"Published {s['files']} files to {self.publish_dir} "
+            f"({s['skipped']} unchanged and skipped)",
+            f"  original: {size(s['source_bytes'])}",
+            f"  minified: {size(s['minified_bytes'])} ({saving(s['minified_bytes'])} smaller)",
+            f"  gzip:     {size(s['gz_bytes'])} ({saving(s['gz_bytes'])} smaller)",
+        ]
+        if brotli is not None:
+            lines.append(
+                f"  brotli:   {size(s['br_bytes'])} ({saving(s['br_bytes'])} smaller)"
+            )
+        else:
+            lines.append("  brotli:   not written (pip install brotli)")
+        return "\n".join(lines)
+
+
+def publish(
+    source_dir: Path, publish_dir: Path, source_paths: Optional[Iterable[Path]] = None
+) -> Publisher:
+    """Publish source_paths (default: all the HTML and JSON files in
+    source_dir) to publish_dir, keeping their paths relative to source_dir.
+    Prints a report of the sizes and returns the Publisher."""
+
+    source_dir = Path(source_dir)
+    if source_paths is None:
+        # not the files in publish_dir, if it is inside source_dir
+        published = Path(publish_dir).resolve()
+        source_paths = sorted(
+            p
+            for p in source_dir.rglob("*")
+            if p.suffix.lower() in MINIFIERS and published not in p.resolve().parents
+        )
+    publisher = Publisher(source_dir, publish_dir)
+    publisher.publish(source_paths)
+    print(publisher.report())
+    return publisher
+
+
+# -------------------- Begin comand line interface ------------------- #
+
+
+@click.command()
+@click.argument(
+    "source_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+)
+@click.argument(
+    "publish_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+)
+def cli(source_dir: Path, publish_dir: Path):
+    """Minify and precompress the HTML and JSON files in SOURCE_DIR into
+    PUBLISH_DIR, skipping files that have not changed."""
+    publish(source_dir, publish_dir)
+
+
+# --------------------- End comand line interface -------------------- #
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,106 @@
+"""A search index for the HTML journal that can be searched in the browser.
+
+The index is inverted: each term maps to the days and paragraphs it is in.
+Days are numbered from 0 in the order they are in the page (or manifest).
+Paragraphs are numbered from 0 within a day and count the children of the
+day's collapsible-content that are not <hr>s or the day number, which is how
+the page's script finds them again.
+
+The index is written as JSON shards, one per first character of the term,
+so a search only downloads the shards for the terms searched for:
+
+    search/meta.json   {"days": [{"heading": ..., "date": ...}, ...],
+                        "shards": {"a": "a.json", ...}, "terms": 1234}
+    search/a.json      {"act": [[day, [paragraph, gap, gap, ...]], ...], ...}
+
+To keep the shards small the paragraph numbers after the first are stored as
+the gap from the previous one, e.g. paragraphs 3, 10, 12 are [3, 7, 2].
+
+The page's script must split text into terms the same way as `terms()`.
+"""
+
+# std library imports
+import json
+from pathlib import Path
+import re
+from typing import Dict, Iterable, List, Set
+
+SEARCH_FOLDER = "search"
+META_FILENAME = "meta.json"
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+MIN_TERM_LENGTH = 2
+
+# too common to be worth indexing
+STOP_WORDS = frozenset(
+    """
+    an and are as at be been by for from had has have he her his if in into is
+    it its no not of on or our shall so such than that the their them then
+    there these they this to was were which who will with would
+    """.split()
+)
+
+# term -> paragraph numbers (within one day)
+Postings = Dict[str, List[int]]
+
+
+def terms(text: str) -> Set[str]:
+    """The distinct terms to index in text."""
+    return {
+        term
+        for term in TERM_PATTERN.findall(text.lower())
+        if len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS
+    }
+
+
+def add_paragraph(postings: Postings, paragraph: int, text: str):
+    """Add the terms in a paragraph's text to a day's postings."""
+    for term in terms(text):
+        postings.setdefault(term, []).append(paragraph)
+
+
+def _gaps(paragraphs: List[int]) -> List[int]:
+    paragraphs = sorted(paragraphs)
+    return paragraphs[:1] + [b - a for a, b in zip(paragraphs, paragraphs[1:])]
+
+
+class SearchIndex:
+    def __init__(self):
+        # term -> day -> paragraph numbers
+        self.terms: Dict[str, Dict[int, List[int]]] = {}
+
+    def add_postings(self, day: int, postings: Postings, offset: int = 0):
+        """Add postings for (part of) a day. offset is added to the
+        paragraph numbers, for days that continue from a previous part."""
+        for term, paragraphs in postings.items():
+            day_paragraphs = self.terms.setdefault(term, {}).setdefault(day, [])
+            day_paragraphs.extend(p + offset for p in paragraphs)
+
+    def shards(self) -> Dict[str, Dict[str, list]]:
+        """The index split up by the first character of the terms."""
+        shards: Dict[str, Dict[str, list]] = {}
+        for term in sorted(self.terms):
+            days = self.terms[term]
+            shards.setdefault(term[0], {})[term] = [
+                [day, _gaps(days[day])] for day in sorted(days)
+            ]
+        return shards
+
+    def write(self, folder: Path, days: Iterable[Dict]) -> Dict:
+        """Write the shards and meta.json to folder. days are the heading
+        and date of each day. Returns the metadata."""
+
+        folder.mkdir(parents=True, exist_ok=True)
+
+        shard_files = {}
+        for key, shard in self.shards().items():
+            shard_files[key] = f"{key}.json"
+            (folder / shard_files[key]).write_text(
+                json.dumps(shard, separators=(",", ":")), encoding="utf-8"
+            )
+
+        meta = {"days": list(days), "shards": shard_files, "terms": len(self.terms)}
+        (folder / META_FILENAME).write_text(
+            json.dumps(meta, separators=(",", ":")), encoding="utf-8"
+        )
+        return meta
@@ -0,0 +1,102 @@
+"""A manifest of the days in a session's journal XML, for looking days up.
+
+create_journal.py writes one next to its output (<output>_manifest.json).
+For each sitting day it has the date, VnP number, sitting day ordinal,
+sha256 of the raw VnP XML, number of vote items and where the day is in
+the output: the file (relative to the manifest) and the byte offset and
+length of the <day> element.
+
+    {
+        "session": "2017-19",
+        "days": [
+            {"date": "2017-06-21", "vnp_number": "No. 1", "ordinal": 1,
+             "sha256": "...", "items": 41,
+             "file": "output.xml", "offset": 142, "length": 10532},
+            ...
+        ],
+        "by_date": {"2017-06-21": 0, ...},
+        "by_vnp_number": {"1": 0, ...}
+    }
+
+by_date and by_vnp_number index into days, so a lookup is a dictionary
+access. No XML is parsed.
+"""
+
+# std library imports
+from datetime import datetime
+import json
+from pathlib import Path
+import re
+from typing import Any, Dict, List, Optional
+
+MANIFEST_SUFFIX = "_manifest.json"
+
+NUMBER_PATTERN = re.compile(r"^\s*(?:No\.?\s*)?(\d+)\s*$", flags=re.I)
+
+Record = Dict[str, Any]
+
+
+def manifest_path_for(output_file: Path) -> Path:
+    return output_file.with_name(f"{output_file.stem}{MANIFEST_SUFFIX}")
+
+
+def vnp_number_key(vnp_number: str) -> Optional[str]:
+    """The number in e.g. "No. 184", "no.184" or "184" ("184")."""
+    m = NUMBER_PATTERN.match(vnp_number)
+    return str(int(m.group(1))) if m else None
+
+
+def write_manifest(file_path: Path, days: List[Record], session: Optional[str] = None):
+    """Write the manifest for days (see the module docstring), in order."""
+
+    by_date = {}
+    by_vnp_number = {}
+    for i, record in enumerate(days):
+        by_date[record["date"]] = i
+        key = vnp_number_key(record.get("vnp_number") or "")
+        if key is not None:
+            by_vnp_number[key] = i
+
+    manifest = {
+        "session": session,
+        "days": days,
+        "by_date": by_date,
+        "by_vnp_number": by_vnp_number,
+    }
+    file_path.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+
+
+class SessionManifest:
+    def __init__(self, file_path: Path):
+        self.file_path = Path(file_path)
+        manifest = json.loads(self.file_path.read_text(encoding="utf-8"))
+        self.session: Optional[str] = manifest.get("session")
+        self.days: List[Record] = manifest["days"]
+        self.by_date: Dict[str, int] = manifest["by_date"]
+        self.by_vnp_number: Dict[str, int] = manifest["by_vnp_number"]
+
+    def find(self, query: str) -> Optional[Record]:
+        """The day for query, either a date (YYYY-MM-DD) or a VnP number
+        (e.g. "No. 184" or 184). None if there is no such day."""
+
+        try:
+            date_str = datetime.strptime(query.strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            key = vnp_number_key(query)
+            if key is None:
+                raise ValueError(f"{query!r} is not a date (YYYY-MM-DD) or a VnP number")
+            index = self.by_vnp_number.get(key)
+        else:
+            index = self.by_date.get(date_str)
+
+        return None if index is None else self.days[index]
+
+    def day_xml(self, record: Record) -> Optional[bytes]:
+        """The day's <day> element as it is in the output (None if the day
+        had nothing in it)."""
+
+        if record.get("file") is None:
+            return None
+        with open(self.file_path.parent / record["file"], "rb") as f:
+            f.seek(record["offset"])
+            return f.read(record["length"])
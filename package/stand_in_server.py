@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+"""A local stand-in for the whatson, VnP and papers laid web services.
+
+The server replays recorded fixtures so that the networked parts of
+create_journal.py and make_papers_index.py can be run (and load tested) off
+the parliament network. It can also inject latency, server errors and rate
+limiting (HTTP 429) to exercise retry behaviour.
+
+The fixtures folder should be laid out as follows:
+
+    FIXTURES/
+        whatson/sessions.json       copy of calendar/sessions/list.json
+        whatson/sitting_dates.json  optional list of "YYYY-MM-DD" sitting dates
+        vnp/YYYY-MM-DD.xml          one VnP file per sitting day
+        paperslaid/daily.xml        papers laid XML (ArrayOfDailyPapers)
+
+The raw files that create_journal.py and make_papers_index.py save can be
+used as they are. If sitting_dates.json is missing, the sitting dates are
+taken from the names of the files in vnp/.
+
+Run with e.g.
+
+    python -m package.stand_in_server tests/fixtures/api --port 8765 --latency 0.05
+
+and point the tools at it with the environment variables printed on startup
+(see package/endpoints.py).
+"""
+
+# std library imports
+from bisect import bisect_right
+from datetime import datetime
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# 3rd party imports
+import click
+from lxml import etree
+
+# 1st party imports
+from package import endpoints
+
+VNP_PATH_PATTERN = re.compile(r"^/voteitems/(\d{4}-\d{2}-\d{2})(?:\.xml)?$", flags=re.I)
+SESSIONS_PATH = "/calendar/sessions/list.json"
+NEXT_SITTING_DATE_PATH = "/calendar/proceduraldates/commons/nextsittingdate.json"
+PAPERS_LAID_PATH = "/papers/list/daily.xml"
+
+
+class StandInServer:
+    """Serve fixtures from fixtures_dir on a background thread.
+
+    latency:    seconds to wait before answering each request
+    jitter:     up to this many extra seconds are added at random
+    error_rate: fraction of requests (0 to 1) answered with a 503
+    rate_limit: requests per second allowed before answering with a 429
+
+    Use as a context manager, e.g.
+
+        with StandInServer(Path("tests/fixtures/api"), latency=0.01) as server:
+            os.environ.update(server.environ())
+    """
+
+    def __init__(
+        self,
+        fixtures_dir: Path,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "ok": 0,
+            "not_modified": 0,
+            "not_found": 0,
+            "injected_errors": 0,
+            "rate_limited": 0,
+        }
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # token bucket for the rate limit
+        self._tokens = rate_limit or 0.0
+        self._last_refill = time.monotonic()
+
+        self._load_fixtures()
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------------------- fixtures ---------------------------- #
+
+    def _load_fixtures(self):
+        whatson = self.fixtures_dir / "whatson"
+        self.vnp_dir = self.fixtures_dir / "vnp"
+
+        sessions_file = whatson / "sessions.json"
+        self.sessions_json = sessions_file.read_bytes() if sessions_file.exists() else None
+
+        sitting_dates_file = whatson / "sitting_dates.json"
+        if sitting_dates_file.exists():
+            sitting_dates = json.loads(sitting_dates_file.read_text(encoding="utf-8"))
+        else:
+            sitting_dates = [p.stem for p in self.vnp_dir.glob("*.xml")]
+        self.sitting_dates: List[str] = sorted(d[:10] for d in sitting_dates)
+
+        papers_file = self.fixtures_dir / "paperslaid" / "daily.xml"
+        self.papers_root = etree.parse(str(papers_file)).getroot() if papers_file.exists() else None
+
+    # ---------------------------- responses --------------------------- #
+
+    def next_sitting_date(self, date_to_check: str) -> Optional[str]:
+        """Return the first sitting date after date_to_check (like whatson)."""
+        index = bisect_right(self.sitting_dates, date_to_check[:10])
+        if index == len(self.sitting_dates):
+            return None
+        return f"{self.sitting_dates[index]}T00:00:00"
+
+    def papers_laid(self, from_date: str, to_date: str) -> Optional[bytes]:
+        """Return the papers laid fixture limited to DailyPapers in the range."""
+        if self.papers_root is None:
+            return None
+        root = etree.Element(self.papers_root.tag, nsmap=self.papers_root.nsmap)
+        for daily_papers in self.papers_root.iterchildren("DailyPapers"):
+            day = daily_papers.findtext("Date", "")[:10]
+            if (not from_date or day >= from_date) and (not to_date or day <= to_date):
+                root.append(etree.fromstring(etree.tostring(daily_papers)))
+        return etree.tostring(root, encoding="utf-8", xml_declaration=True)
+
+    def respond(self, raw_path: str) -> Tuple[int, str, bytes]:
+        """Return status, content type and body for a request path."""
+        split = urlsplit(raw_path)
+        path = split.path.rstrip("/")
+        query = {k: v[0] for k, v in parse_qs(split.query).items()}
+
+        if path.lower() == SESSIONS_PATH and self.sessions_json is not None:
+            return 200, "application/json", self.sessions_json
+
+        if path.lower() == NEXT_SITTING_DATE_PATH:
+            next_date = self.next_sitting_date(query.get("dateToCheck", ""))
+            return 200, "application/json", json.dumps(next_date).encode()
+
+        m = VNP_PATH_PATTERN.match(path)
+        if m:
+            vnp_file = self.vnp_dir / f"{m.group(1)}.xml"
+            if vnp_file.exists():
+                return 200, "application/xml", vnp_file.read_bytes()
+
+        if path.lower() == PAPERS_LAID_PATH:
+            body = self.papers_laid(query.get("fromDate", ""), query.get("toDate", ""))
+            if body is not None:
+                return 200, "application/xml", body
+
+        return 404, "text/plain", b"Not found"
+
+    # ------------------------------ faults ---------------------------- #
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit,
+                self._tokens + (now - self._last_refill) * self.rate_limit,
+            )
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def fault(self) -> Optional[int]:
+        """Sleep for the configured latency and return an HTTP error status
+        to inject (or None)."""
+
+        with self._lock:
+            self.stats["requests"] += 1
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+            inject_error = self._random.random() < self.error_rate
+
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+        if not self._take_token():
+            self._count("rate_limited")
+            return 429
+        if inject_error:
+            self._count("injected_errors")
+            return 503
+        return None
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    # ---------------------------- lifecycle --------------------------- #
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environ(self) -> Dict[str, str]:
+        """Environment variables that point the tools at this server."""
+        return {
+            endpoints.WHATSON_ENV_VAR: self.url,
+            endpoints.VNP_ENV_VAR: self.url,
+            endpoints.PAPERS_LAID_ENV_VAR: self.url,
+        }
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "StandIn/1.0"
+
+    def do_GET(self):
+        stand_in: StandInServer = self.server.stand_in  # type: ignore[attr-defined]
+
+        error_status = stand_in.fault()
+        if error_status is not None:
+            self.send_response(error_status)
+            if error_status == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        status, content_type, body = stand_in.respond(self.path)
+
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            stand_in._count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        stand_in._count("ok" if status == 200 else "not_found")
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep quiet, the stats are reported on shutdown
+        pass
+
+
+# -------------------- Begin comand line interface ------------------- #
+
+
+@click.command()
+@click.argument(
+    "fixtures_dir",
+    type=click.Path(exists=True, dir_okay=True, file_okay=False, path_type=Path),
+)
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8765, show_default=True, type=int)
+@click.option("--latency", default=0.0, show_default=True, help="Seconds added to every response.")
+@click.option("--jitter", default=0.0, show_default=True, help="Up to this many random extra seconds.")
+@click.option(
+    "--error-rate",
+    default=0.0,
+    show_default=True,
+    help="Fraction of requests (0 to 1) answered with HTTP 503.",
+)
+@click.option(
+    "--rate-limit",
+    type=float,
+    default=None,
+    help="Requests per second allowed before answering with HTTP 429.",
+)
+@click.option("--seed", type=int, default=None, help="Seed for the fault injection.")
+def cli(
+    fixtures_dir: Path,
+    host: str,
+    port: int,
+    latency: float,
+    jitter: float,
+    error_rate: float,
+    rate_limit: Optional[float],
+    seed: Optional[int],
+):
+    """Serve the whatson, VnP and papers laid fixtures in FIXTURES_DIR."""
+
+    server = StandInServer(
+        fixtures_dir,
+        host=host,
+        port=port,
+        latency=latency,
+        jitter=jitter,
+        error_rate=error_rate,
+        rate_limit=rate_limit,
+        seed=seed,
+    )
+    print(f"Serving {fixtures_dir} at {server.url} ({len(server.sitting_dates)} sitting days)")
+    print("Point the tools at this server with:")
+    for name, value in server.environ().items():
+        print(f"    {name}={value}")
+    print("Press Ctrl+C to stop.")
+
+    started = datetime.now()
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        seconds = (datetime.now() - started).total_seconds()
+        print(f"\nServed for {seconds:.0f} s: {server.stats}")
+
+
+# --------------------- End comand line interface -------------------- #
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,6 +1,178 @@
-
 from datetime import datetime, timedelta
-import requests
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from package import endpoints, http_client
+from package.http_client import CACHE_DIR
+
+SESSIONS_CACHE_FILE = "sessions.json"
+
+CAL_API_URL_TEMPLATE = (
+    endpoints.NEXT_SITTING_DATE_URL + "?dateToCheck={}&includeWeekendSittings=true"
+)
+
+# how long before the cached sessions list is refreshed (in the background)
+SESSIONS_CACHE_TTL = timedelta(days=1)
+
+
+class SessionRegistry:
+    """The whatson sessions list, cached on disk and indexed by
+    CommonsDescription (e.g. '2017-19') and SessionId.
+
+    If there is a cached copy it is used straight away, even when it is
+    older than ttl, in which case a fresh copy is downloaded in a
+    background thread for next time. So after the first run no network
+    access is needed before work can start, and the registry works offline.
+    """
+
+    def __init__(
+        self,
+        cache_file: Optional[Path] = None,
+        ttl: timedelta = SESSIONS_CACHE_TTL,
+        url: Optional[str] = None,
+    ):
+        self.cache_file = cache_file or CACHE_DIR / SESSIONS_CACHE_FILE
+        self.ttl = ttl
+        self.url = url or endpoints.SESSIONS_LIST_URL
+
+        self.by_description: Dict[str, Dict[str, Any]] = {}
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.fetched_at = 0.0  # unix time that the sessions list was downloaded
+        self.refreshed = False  # True once downloaded by this process
+
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        if not self._load_cache():
+            # nothing cached so we have to wait for the network
+            self.refresh()
+        elif self.is_stale:
+            self.refresh_in_background()
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self.fetched_at > self.ttl.total_seconds()
+
+    def _index(self, sessions: List[Dict[str, Any]], fetched_at: float):
+        by_description = {}
+        by_id = {}
+        for session_obj in sessions:
+            by_id[session_obj["SessionId"]] = session_obj
+            by_description[session_obj["CommonsDescription"]] = session_obj
+        with self._lock:
+            self.by_description = by_description
+            self.by_id = by_id
+            self.fetched_at = fetched_at
+
+    def _load_cache(self) -> bool:
+        """Load the cached sessions list. Return False if there isn't one."""
+        try:
+            cached = json.loads(self.cache_file.read_text(encoding="utf-8"))
+            if cached["url"] != self.url:
+                # cached from a different server (e.g. the stand-in)
+                return False
+            self._index(cached["sessions"], cached["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return True
+
+    def refresh(self):
+        """Download the sessions list, re-index it and update the cache."""
+
+        # the registry does its own caching
+        response = http_client.get(self.url, use_cache=False)
+        response.raise_for_status()
+        sessions = response.json()
+        fetched_at = time.time()
+        self._index(sessions, fetched_at)
+        self.refreshed = True
+
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temp file first so a reader never sees half a file
+            temp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            temp_file.write_text(
+                json.dumps(
+                    {"url": self.url, "fetched_at": fetched_at, "sessions": sessions}
+                ),
+                encoding="utf-8",
+            )
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            print(f"Warning: could not cache the sessions list: {e}")
+
+    def refresh_in_background(self) -> threading.Thread:
+        with self._lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(
+                    target=self._quiet_refresh, daemon=True
+                )
+                self._refresh_thread.start()
+            return self._refresh_thread
+
+    def _quiet_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            # offline, keep using the cached copy
+            pass
+
+    def get(self, session_code: str) -> Dict[str, Any]:
+        """Return the whatson session object for e.g. '2015-16'."""
+
+        session_obj = self.by_description.get(session_code)
+        if session_obj is None and not self.refreshed:
+            # the session may be newer than our cached copy
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            session_obj = self.by_description.get(session_code)
+        if session_obj is None:
+            raise ValueError(
+                f"Dates for session, {session_code} could not be found.\nCheck {self.url}"
+            )
+        return session_obj
+
+    def session_dates(self, session_code: str) -> tuple[datetime, datetime]:
+        """See get_dates_from_session()"""
+
+        session_obj = self.get(session_code)
+        session_of_interest_id = session_obj["SessionId"]
+
+        # see if we can find previous session
+        previous_session = self.by_id.get(session_of_interest_id - 1)
+        if previous_session is not None:
+            start_date_str = previous_session["EndDate"]
+        else:
+            start_date_str = session_obj["StartDate"]
+
+        end_date_str = session_obj["EndDate"]
+
+        start_date = datetime.strptime(start_date_str[:10], "%Y-%m-%d")
+        if previous_session is not None:
+            # remember to add one day to the end of last session date
+            start_date = start_date + timedelta(days=1)
+
+        end_date = datetime.strptime(end_date_str[:10], "%Y-%m-%d")
+
+        return start_date, end_date
+
+
+_REGISTRY: Optional[SessionRegistry] = None
+
+
+def get_session_registry() -> SessionRegistry:
+    """Return the shared SessionRegistry, creating it on first use."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = SessionRegistry()
+    return _REGISTRY
+
 
 def get_dates_from_session(session_code: str) -> tuple[datetime, datetime]:
 
@@ -11,40 +183,88 @@ def get_dates_from_session(session_code: str) -> tuple[datetime, datetime]:
 
     # session code e.g. '2015-16'
 
-    # Get the dates from API
-    url = "https://whatson-api.parliament.uk/calendar/sessions/list.json"
-    response = requests.get(url)
+    return get_session_registry().session_dates(session_code)
 
-    session_json = response.json()
 
-    session_dict: dict[int, dict] = {}
+def next_sitting_date(
+    date_to_check: datetime, url_template: str = CAL_API_URL_TEMPLATE
+) -> Optional[datetime]:
+    """Return the first sitting day after date_to_check, or None if
+    there isn't one (yet) or the calendar can't be reached."""
 
-    session_of_interest_id = -1
-
-    for session_obj in session_json:
-        session_dict[session_obj["SessionId"]] = session_obj
-        if session_obj["CommonsDescription"] == session_code:
-            session_of_interest_id = session_obj["SessionId"]
+    if date_to_check < datetime.now() - http_client.SETTLED_CALENDAR_AGE:
+        endpoint = "past_sitting_date"
+    else:
+        endpoint = "sitting_date"
 
-    if session_of_interest_id == -1:
-        raise ValueError(
-            f"Dates for session, {session_code} could not be found.\nCheck {url}"
+    uri = url_template.format(date_to_check.strftime("%Y-%m-%d"))
+    try:
+        response = http_client.get(
+            uri, endpoint=endpoint, headers={"Content-Type": "application/json"}
         )
+        next_sitting_date_str = response.json()
+    except Exception as e:
+        print(f"Error getting data from:\n{uri}\n{e}")
+        return None
 
-    # see if we can find previous session
-    previous_session_id = session_of_interest_id - 1
-    if previous_session_id in session_dict:
-        start_date_str = session_dict[previous_session_id]["EndDate"]
-    else:
-        start_date_str = session_dict[session_of_interest_id]["StartDate"]
+    if not next_sitting_date_str:
+        return None
+
+    return datetime.strptime(next_sitting_date_str[:10], "%Y-%m-%d")
+
+
+def _next_sitting_dates(
+    dates: List[datetime], url_template: str
+) -> List[Optional[datetime]]:
+    # one request per date, made concurrently over the http_client pool
+    if len(dates) < 2:
+        return [next_sitting_date(d, url_template) for d in dates]
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(len(dates), http_client.max_concurrency())) as executor:
+        return list(executor.map(lambda d: next_sitting_date(d, url_template), dates))
+
+
+def get_sitting_dates_in_range(
+    from_date: datetime, to_date: datetime, url_template: str = CAL_API_URL_TEMPLATE
+) -> List[datetime]:
+    """get return a list of sitting days"""
+
+    # the calendar api gives you the next sitting day so we need to start form the day before
+    start_date = from_date - timedelta(days=1)
+
+    current_date = start_date
+    dates = []
+    count = 0
+    while current_date < to_date:
+        current_date = start_date + timedelta(days=count)
+        dates.append(current_date)
+        count += 1
+
+    sitting_dates = []
+    for next_date in _next_sitting_dates(dates, url_template):
+
+        if next_date is None or next_date > to_date:
+            continue
+
+        if next_date not in sitting_dates:
+            sitting_dates.append(next_date)
+
+    print(f"{[sd.strftime('%y-%m-%d') for sd in sitting_dates]}")
 
-    end_date_str = session_dict[session_of_interest_id]["EndDate"]
+    return sitting_dates
 
-    start_date = datetime.strptime(start_date_str[:10], "%Y-%m-%d")
-    if previous_session_id in session_dict:
-        # remember to add one day to the end of last session date
-        start_date = start_date + timedelta(days=1)
 
-    end_date = datetime.strptime(end_date_str[:10], "%Y-%m-%d")
+def get_sitting_dates_in(
+    dates: Iterable[datetime], url_template: str = CAL_API_URL_TEMPLATE
+) -> List[datetime]:
+    """Return the dates (in order) that are sitting days."""
 
-    return start_date, end_date
+    dates = sorted(set(dates))
+    # the calendar api gives you the next sitting day
+    day_befores = [d - timedelta(days=1) for d in dates]
+    return [
+        d
+        for d, next_date in zip(dates, _next_sitting_dates(day_befores, url_template))
+        if next_date == d
+    ]
@@ -0,0 +1,126 @@
+"""Checks for the XML downloaded from the VnP and papers laid APIs.
+
+A truncated download or an HTML error page served with HTTP 200 used to be
+saved as if it were XML and only failed when it was parsed, part way
+through a build. These checks are made as soon as a response arrives:
+
+  * the HTTP status and content type (an HTML error page is not XML),
+  * that the XML is well formed, with an incremental parser (XMLPullParser)
+    that stops at the first problem and does not keep the tree, and
+  * that the root element is the one expected (ArrayOfVoteItemViewModel of
+    VoteItemViewModel for VnP, ArrayOfDailyPapers of DailyPapers for papers
+    laid).
+
+Each check returns a description of the problem, or None if there isn't
+one. get_valid() removes a bad response from the cache and asks again, and
+quarantine() keeps a copy of a bad payload for a closer look.
+"""
+
+# std library imports
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple
+
+# 3rd party imports
+from lxml import etree
+
+if TYPE_CHECKING:
+    from requests import Response
+
+# 1st party imports
+from package import http_client
+
+QUARANTINE_FOLDER = "quarantine"
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Expected(NamedTuple):
+    root: str
+    # the tag of the root's children
+    child: str
+
+
+VNP = Expected("ArrayOfVoteItemViewModel", "VoteItemViewModel")
+PAPERS_LAID = Expected("ArrayOfDailyPapers", "DailyPapers")
+
+
+def check_xml(content: bytes, expected: Expected) -> Optional[str]:
+    """The problem with content as XML with the expected elements, if any."""
+
+    if not content.strip():
+        return "empty"
+
+    parser = etree.XMLPullParser(events=("start", "end"))
+    depth = 0
+    try:
+        for offset in range(0, len(content), CHUNK_SIZE):
+            parser.feed(content[offset:offset + CHUNK_SIZE])
+            for event, element in parser.read_events():
+                if event == "end":
+                    depth -= 1
+                    # the tree isn't needed, keep memory down
+                    if depth == 1:
+                        element.clear()
+                    continue
+                depth += 1
+                tag = etree.QName(element).localname
+                if depth == 1 and tag != expected.root:
+                    return f"the root element is <{tag}>, not <{expected.root}>"
+                if depth == 2 and tag != expected.child:
+                    return f"<{tag}> in <{expected.root}>, expected <{expected.child}>"
+        parser.close()
+    except etree.XMLSyntaxError as e:
+        return f"not well formed XML: {e}"
+    return None
+
+
+def check_response(response: "Response", expected: Expected) -> Optional[str]:
+    """The problem with a response that should be XML, if any."""
+
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    content_type = response.headers.get("Content-Type", "")
+    if "html" in content_type.lower():
+        # e.g. an error page from a proxy
+        return f"content type is {content_type}, not XML"
+    return check_xml(response.content, expected)
+
+
+def get_valid(
+    url: str,
+    expected: Expected,
+    retries: int = 1,
+    **kwargs,
+) -> Tuple["Response", Optional[str]]:
+    """GET url with http_client and check it. A bad response is removed
+    from the cache and asked for again, up to retries times. Returns the
+    last response and its problem (None if it is fine)."""
+
+    response = http_client.get(url, **kwargs)
+    problem = check_response(response, expected)
+    for _ in range(retries):
+        if problem is None or response.status_code == 404:
+            break
+        http_client.forget(response.url or url)
+        response = http_client.get(url, **kwargs)
+        problem = check_response(response, expected)
+    return response, problem
+
+
+def quarantine(folder: Path, file_name: str, content: bytes, problem: str) -> Path:
+    """Keep a bad payload as folder/quarantine/file_name, with the problem
+    in file_name.problem.txt beside it. Returns the path."""
+
+    quarantine_folder = folder / QUARANTINE_FOLDER
+    quarantine_folder.mkdir(parents=True, exist_ok=True)
+    file_path = quarantine_folder / file_name
+    file_path.write_bytes(content)
+    file_path.with_name(f"{file_name}.problem.txt").write_text(problem + "\n", encoding="utf-8")
+    return file_path
+
+
+def check_file(file_path: Path, expected: Expected) -> Optional[str]:
+    try:
+        return check_xml(file_path.read_bytes(), expected)
+    except OSError as e:
+        return f"could not be read: {e}"
@@ -0,0 +1,72 @@
+import io
+import os
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_journal
+from package import build_server, http_client, utilities
+
+VNP_FOLDER = Path(__file__).parent / 'fixtures' / 'api' / 'vnp'
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # the server's caches are global, put them back afterwards
+    monkeypatch.setattr(create_journal, '_DAY_CACHE', None)
+    monkeypatch.setattr(http_client, '_CLIENT', None)
+    # no sessions list is needed to build from a folder
+    monkeypatch.setattr(utilities, 'get_session_registry', lambda: None)
+
+    server = build_server.BuildServer(str(tmp_path / 'build.sock'), tmp_path / 'build.key')
+    ready = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, args=(ready.set,), daemon=True)
+    thread.start()
+    assert ready.wait(10)
+    yield server
+    build_server.stop(server.address, tmp_path / 'build.key')
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_builds_on_the_server(server, tmp_path):
+
+    key_file = tmp_path / 'build.key'
+    create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path / 'direct')
+    expected = (tmp_path / 'direct' / 'session_None_for_id.xml').read_bytes()
+
+    args = ['from-folder', str(VNP_FOLDER), '-o', 'out']
+    for _ in range(2):
+        out = io.StringIO()
+        exit_code = build_server.submit(
+            'create_journal', args, cwd=tmp_path, address=server.address, key_file=key_file, out=out
+        )
+        assert exit_code == 0, out.getvalue()
+        assert 'Transformed XML' in out.getvalue()
+        assert (tmp_path / 'out' / 'session_None_for_id.xml').read_bytes() == expected
+
+    status = build_server.status(server.address, key_file)
+    assert status['jobs'] == 2
+    assert status['days_cached'] == 3
+
+    out = io.StringIO()
+    exit_code = build_server.submit(
+        'create_journal', ['from-folder', str(tmp_path / 'missing')],
+        cwd=tmp_path, address=server.address, key_file=key_file, out=out,
+    )
+    assert exit_code == 2
+    assert 'does not exist' in out.getvalue()
+
+
+def test_rejects_the_wrong_key(server, tmp_path):
+
+    wrong_key = tmp_path / 'wrong.key'
+    wrong_key.write_bytes(b'not the key')
+    with pytest.raises(Exception):
+        build_server.status(server.address, wrong_key)
+    # and still serves clients with the key
+    assert build_server.status(server.address, tmp_path / 'build.key')['jobs'] == 0
@@ -0,0 +1,163 @@
+from datetime import datetime
+import os
+from pathlib import Path
+import sys
+
+from lxml import etree
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Python_Resources import day_transform, day_transform_xslt, vote_items
+
+VNP_FOLDER = Path(__file__).parent / 'fixtures' / 'api' / 'vnp'
+VNP_FIXTURE = VNP_FOLDER / '2017-06-21.xml'
+
+AID5_TABLESTYLE = f'{{{day_transform.AID5}}}tablestyle'
+
+
+def transform(profile, **kwargs):
+    input_root = etree.parse(str(VNP_FIXTURE)).getroot()
+    return day_transform.transform_day(input_root, profile, **kwargs)
+
+
+def test_journal_profile():
+
+    day = transform(day_transform.JOURNAL, date=datetime(2017, 6, 21), first_day=False)
+
+    assert day.get('date') == '2017-06-21'
+    assert day.get('VnPNumber') == 'No. 1'
+    assert [child.tag for child in day[:3]] == ['DayLine', 'DaySep', 'VotesDate']
+    assert day.findtext('VotesDate/DateForHeader') == '21 June 2017'
+    # the numbering restarts at the start of the day
+    assert day.find('BusinessItemHeadingNumberedRestart') is not None
+    # the Speaker's signature is left out
+    assert day.find('SpeakerName') is None
+
+    tables = day.findall('TableContainerPara/Table')
+    assert tables and all(t.get(AID5_TABLESTYLE) == 'Table Style 2' for t in tables)
+
+    # no line before the first day
+    first_day = transform(day_transform.JOURNAL, date=datetime(2017, 6, 21), first_day=True)
+    assert first_day[0].tag == 'DaySep'
+
+    with pytest.raises(ValueError):
+        transform(day_transform.JOURNAL)
+
+
+def test_vnp_profile():
+
+    day = transform(day_transform.VNP)
+
+    assert day.attrib == {'VnPNumber': 'No. 1'}
+    assert day.find('DaySep') is None and day.find('VotesDate') is None
+    assert day.find('BusinessItemHeadingNumberedRestart') is None
+    assert day.find('SpeakerName') is not None
+
+    tables = day.findall('Table')
+    assert tables and all(t.get(AID5_TABLESTYLE) == 'StandardTable' for t in tables)
+    assert day.find('TableContainerPara') is None
+
+
+def vnp_day(*items):
+    """VnP XML for a day of (section, vote entry HTML, vote entry type)."""
+    root = etree.Element('ArrayOfVoteItemViewModel')
+    for section, html, entry_type in (('Chamber', 'No. 9', 'Heading'),) + items:
+        item = etree.SubElement(root, 'VoteItemViewModel')
+        etree.SubElement(item, 'Number')
+        etree.SubElement(item, 'Section').text = section
+        etree.SubElement(item, 'VoteEntry').text = html
+        etree.SubElement(item, 'VoteEntryType').text = entry_type
+    return etree.tostring(root)
+
+
+# text that only strip() and casefold() (not normalize-space) treat as the same
+EDGE_CASES = {
+    'nbsp in a chair title': vnp_day(
+        ('Chamber', '<p style="text-align: right">John Bercow</p><p>SPEAKER\u00a0ELECT</p>', 'Normal'),
+        ('Chamber', '<p style="text-align: right">Lindsay Hoyle</p><p>\u00a0SPEAKER </p>', 'Normal'),
+    ),
+    'double space in a section': vnp_day(
+        ('Westminster Hall', '<p>One.</p>', 'Normal'),
+        ('Westminster  Hall', '<p>Two.</p>', 'Normal'),
+        ('  Westminster Hall\u00a0', '<p>Three.</p>', 'Normal'),
+    ),
+    'headings': vnp_day(
+        ('Chamber', '<p>Prayers\u00a0</p><p>The  House met at 9.30 am.</p><p>Speaker\u2019s  certificate</p>', 'Heading'),
+        ('Chamber', '<p>\u00a0The House met at 2.30 pm.</p><p>Stra\u00dfe</p>', 'Heading'),
+    ),
+}
+
+
+def xslt_cases():
+    for i, vnp_file in enumerate(sorted(VNP_FOLDER.glob('*.xml'))):
+        yield pytest.param(vnp_file.read_bytes(), datetime.strptime(vnp_file.stem, '%Y-%m-%d'), i == 0, id=vnp_file.stem)
+    for name, content in EDGE_CASES.items():
+        yield pytest.param(content, datetime(2017, 6, 21), False, id=name)
+
+
+@pytest.mark.parametrize('profile', list(day_transform.PROFILES.values()), ids=list(day_transform.PROFILES))
+@pytest.mark.parametrize('content, date, first_day', list(xslt_cases()))
+def test_xslt_engine_matches_python_engine(profile, content, date, first_day):
+
+    outputs = [
+        etree.tostring(engine(etree.fromstring(content), profile, date, first_day))
+        for engine in (day_transform.transform_day, day_transform_xslt.transform_day)
+    ]
+    assert outputs[0] == outputs[1]
+
+
+def test_text_is_compared_as_python_does():
+
+    day = day_transform.transform_day(etree.fromstring(EDGE_CASES['nbsp in a chair title']), day_transform.VNP)
+    # only the second is followed by a chair title once stripped
+    assert [p.tag for p in day if p.text in ('John Bercow', 'Lindsay Hoyle')] == ['RightAlign', 'SpeakerName']
+
+    day = day_transform.transform_day(etree.fromstring(EDGE_CASES['double space in a section']), day_transform.VNP)
+    assert [h.text for h in day.findall('OPHeading1')] == ['Westminster Hall\n', 'Westminster  Hall\n', 'Westminster Hall\n']
+
+def test_vote_item_records():
+
+    content = VNP_FIXTURE.read_bytes()
+    records = vote_items.parse(content)
+    root = etree.fromstring(content)
+    elements = day_transform.VOTE_ITEMS(root)
+
+    assert records == vote_items.from_tree(root)
+    assert len(records) == len(elements)
+    for record, element in zip(records, elements):
+        assert record.number == element.findtext('Number')
+        assert record.section == element.findtext('Section')
+        assert record.vote_entry == element.findtext('VoteEntry')
+        assert record.entry_type == element.findtext('VoteEntryType')
+
+    # the same values are one str
+    assert len({id(r.section) for r in records}) == len({r.section for r in records})
+    again = vote_items.parse(content)
+    assert all(a.entry_type is b.entry_type for a, b in zip(records, again))
+    assert again[1].vote_entry is records[1].vote_entry
+
+    with pytest.raises(AttributeError):
+        records[0].other = 1
+
+
+def test_missing_fields_and_no_items():
+
+    record = vote_items.parse(
+        b'<ArrayOfVoteItemViewModel><VoteItemViewModel><Number/>'
+        b'</VoteItemViewModel></ArrayOfVoteItemViewModel>'
+    )[0]
+    assert record.number == '' and record.section is None and record.vote_entry is None
+    assert day_transform.transform_items([], day_transform.VNP) is None
+
+
+@pytest.mark.parametrize('profile', list(day_transform.PROFILES.values()), ids=list(day_transform.PROFILES))
+def test_transform_items_matches_transform_day(profile):
+
+    for i, vnp_file in enumerate(sorted(VNP_FOLDER.glob('*.xml'))):
+        date = datetime.strptime(vnp_file.stem, '%Y-%m-%d')
+        from_tree = day_transform.transform_day(etree.parse(str(vnp_file)).getroot(), profile, date, i == 0)
+        from_records = day_transform.transform_items(
+            vote_items.parse(vnp_file.read_bytes()), profile, date, i == 0
+        )
+        assert etree.tostring(from_tree) == etree.tostring(from_records), vnp_file.name
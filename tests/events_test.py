@@ -0,0 +1,57 @@
+from contextlib import nullcontext
+import json
+import os
+from pathlib import Path
+import sys
+
+from click.testing import CliRunner
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_journal
+from package import events, profiling
+
+VNP_FOLDER = Path(__file__).parent / 'fixtures' / 'api' / 'vnp'
+
+
+def read_events(file_path: Path):
+    return [json.loads(line) for line in file_path.read_text().splitlines()]
+
+
+def test_event_log(tmp_path):
+
+    log_path = tmp_path / 'events.jsonl'
+    args = ['--event-log', str(log_path), 'from-folder', str(VNP_FOLDER), '-o', str(tmp_path)]
+
+    result = CliRunner().invoke(create_journal.cli, args)
+    assert result.exit_code == 0, result.output
+    assert not events.enabled()
+
+    records = read_events(log_path)
+    assert records[0]['event'] == 'start'
+    assert len({record['run'] for record in records}) == 1
+    assert {'parse', 'classify', 'write'} <= {r['name'] for r in records if r['event'] == 'span'}
+
+    summary = records[-1]
+    assert summary['event'] == 'summary'
+    assert summary['status'] == 'ok' and summary['exit_code'] == 0
+    assert summary['counters'] == {'days': 3, 'days_written': 3}
+    assert summary['stages']['classify']['calls'] == 3
+
+    # a failed run is appended with its own summary
+    result = CliRunner().invoke(
+        create_journal.cli, ['--event-log', str(log_path), 'from-folder', str(tmp_path / 'missing')]
+    )
+    assert result.exit_code != 0
+    summary = read_events(log_path)[-1]
+    assert summary['status'] == 'error' and summary['exit_code'] == result.exit_code
+    assert summary['run'] != records[0]['run']
+
+
+def test_disabled_does_nothing():
+
+    assert not events.enabled()
+    assert isinstance(events.span('stage'), nullcontext)
+    assert isinstance(profiling.stage('stage'), nullcontext)
+    events.count('days')
+    events.finish()
@@ -0,0 +1,68 @@
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+
+from lxml import etree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from package.stand_in_server import StandInServer
+
+REPO_ROOT = Path(__file__).parent.parent
+FIXTURES = REPO_ROOT / 'tests' / 'fixtures' / 'api'
+
+
+def from_api(server, tmp_path, *args):
+    env = dict(os.environ, **server.environ(), COMMONS_JOURNAL_CACHE_DIR=str(tmp_path / 'cache'))
+    env.pop('COMMONS_JOURNAL_EVENT_LOG', None)
+    return subprocess.run(
+        [sys.executable, 'create_journal.py', 'from-api', '2017-19',
+         '--raw-xml-folder', str(tmp_path / 'raw'), '--output', str(tmp_path / 'out'), *args],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+
+
+def test_resumes_after_a_failed_run(tmp_path):
+
+    fixtures = tmp_path / 'fixtures'
+    shutil.copytree(FIXTURES, fixtures)
+    bad_day = fixtures / 'vnp' / '2017-06-22.xml'
+    good_content = bad_day.read_bytes()
+    bad_day.write_bytes(good_content[: len(good_content) // 2])
+
+    with StandInServer(fixtures) as server:
+        result = from_api(server, tmp_path)
+        assert result.returncode == 1, result.stdout + result.stderr
+        assert '2017-06-22: not well formed XML' in result.stdout
+
+        checkpoint = json.loads((tmp_path / 'raw' / 'session_2017-19_checkpoint.json').read_text())
+        assert checkpoint['sitting_dates'] == ['2017-06-21', '2017-06-22', '2017-06-23']
+        assert sorted(checkpoint['days']) == ['2017-06-21', '2017-06-23']
+        assert not checkpoint['complete']
+
+        # the next run only asks for the missing day
+        bad_day.write_bytes(good_content)
+        requests_before = server.stats['requests']
+        result = from_api(server, tmp_path)
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert 'Skipping 2 of 3 days already downloaded, 1 to go.' in result.stdout
+        assert server.stats['requests'] - requests_before == 1
+
+    output_root = etree.parse(str(tmp_path / 'out' / 'session_2017-19_for_id.xml')).getroot()
+    assert [day.get('date') for day in output_root] == ['2017-06-21', '2017-06-22', '2017-06-23']
+    assert (tmp_path / 'raw' / '2017-06-22.xml').read_bytes() == good_content
+
+    checkpoint = json.loads((tmp_path / 'raw' / 'session_2017-19_checkpoint.json').read_text())
+    assert checkpoint['complete']
+
+
+def test_discard_raw_xml(tmp_path):
+
+    with StandInServer(FIXTURES) as server:
+        result = from_api(server, tmp_path, '--discard-raw-xml')
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert (tmp_path / 'out' / 'session_2017-19_for_id.xml').exists()
+    assert not (tmp_path / 'raw').exists()
@@ -0,0 +1,53 @@
+from datetime import datetime
+import os
+from pathlib import Path
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_journal
+from package.fragment_store import FragmentStore
+
+VNP_FOLDER = Path(__file__).parent / 'fixtures' / 'api' / 'vnp'
+
+
+def day_files():
+    return sorted(VNP_FOLDER.glob('*.xml'))
+
+
+def test_assembled_output_matches_a_whole_build(tmp_path):
+
+    assert create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path / 'out') == 0
+    expected = (tmp_path / 'out' / 'session_None_for_id.xml').read_bytes()
+
+    store = FragmentStore(tmp_path / 'store')
+    # the days can arrive in any order
+    for file in reversed(day_files()):
+        date = datetime.strptime(file.stem, '%Y-%m-%d')
+        assert create_journal.update_day(store, date, file.read_bytes())
+    store.save()
+
+    assert create_journal.assemble(store) == expected
+    # and from a store loaded from disk
+    assert create_journal.assemble(FragmentStore(tmp_path / 'store')) == expected
+
+
+def test_only_changed_days_are_updated(tmp_path):
+
+    store = FragmentStore(tmp_path / 'store')
+    first = day_files()[0]
+    date = datetime.strptime(first.stem, '%Y-%m-%d')
+    content = first.read_bytes()
+
+    assert create_journal.update_day(store, date, content)
+    assert not create_journal.update_day(store, date, content)
+
+    # a correction
+    corrected = content.replace(b'PRAYERS', b'Prayers', 1)
+    assert corrected != content
+    assert create_journal.update_day(store, date, corrected)
+    assert store.is_current(first.stem, corrected)
+
+    store.remove(first.stem)
+    assert store.dates() == []
+    assert not (tmp_path / 'store' / f'{first.stem}.xml').exists()
@@ -0,0 +1,132 @@
+from datetime import timedelta
+import os
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from package import http_client
+from package.http_client import AdaptiveLimiter, HttpClient, MemoryCache
+from package.stand_in_server import StandInServer
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'api'
+
+
+@pytest.fixture
+def server():
+    with StandInServer(FIXTURES) as stand_in:
+        yield stand_in
+
+
+def test_repeat_requests_hit_the_cache(server, tmp_path):
+
+    url = f'{server.url}/voteitems/2017-06-21.xml'
+
+    client = HttpClient(cache_dir=tmp_path)
+    first = client.get(url, endpoint='vnp')
+    assert client.stats['misses'] == 1
+
+    # a new client (i.e. a new run) uses the disk cache
+    client = HttpClient(cache_dir=tmp_path)
+    second = client.get(url, endpoint='vnp')
+    assert second.content == first.content
+    assert client.stats['hits'] == 1
+    assert server.stats['requests'] == 1
+
+    # once stale the cached ETag is sent and the server says not modified
+    third = client.get(url, ttl=timedelta(0))
+    assert third.content == first.content
+    assert client.stats['revalidated'] == 1
+    assert server.stats['not_modified'] == 1
+
+
+def test_uncached_endpoints(server, tmp_path):
+
+    url = f'{server.url}/calendar/sessions/list.json'
+    client = HttpClient(cache_dir=tmp_path)
+    client.get(url)
+    client.get(url, endpoint='sessions', use_cache=False)
+    assert client.stats['uncached'] == 2
+    assert server.stats['requests'] == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_retries(tmp_path):
+
+    with StandInServer(FIXTURES, error_rate=1.0) as server:
+        client = HttpClient(cache_dir=tmp_path, retries=2)
+        # make the test quick
+        client.session.get_adapter(server.url).max_retries.backoff_factor = 0
+        response = client.get(f'{server.url}/voteitems/2017-06-21.xml', endpoint='vnp')
+        assert response.status_code == 503
+        assert server.stats['requests'] == 3
+        assert client.stats['retries'] == 2
+        # and fewer requests are made at once
+        assert client.limiter(server.url).limit < http_client.INITIAL_CONCURRENCY
+        # errors are not cached
+        assert not list(tmp_path.glob('*.body'))
+
+
+def test_lru_eviction(server, tmp_path):
+
+    client = HttpClient(cache_dir=tmp_path, max_cache_bytes=50_000)
+    urls = [f'{server.url}/voteitems/2017-06-2{day}.xml' for day in (1, 2, 3)]
+    for url in urls:
+        client.get(url, endpoint='vnp')
+
+    sizes = sum(p.stat().st_size for p in tmp_path.glob('*.body'))
+    assert sizes <= 50_000
+    # the most recently used response is kept
+    assert client.get(urls[-1], endpoint='vnp').from_cache
+
+
+def test_memory_cache(server, tmp_path):
+
+    url = f'{server.url}/voteitems/2017-06-21.xml'
+    client = HttpClient(cache_dir=tmp_path)
+    client.cache = MemoryCache(client.cache)
+    first = client.get(url, endpoint='vnp')
+
+    # served from memory, even once gone from the disk
+    for p in tmp_path.iterdir():
+        p.unlink()
+    assert client.get(url, endpoint='vnp').content == first.content
+    assert client.stats['hits'] == 1
+
+    # revalidating keeps the body in memory
+    assert client.get(url, ttl=timedelta(0)).content == first.content
+    assert client.stats['revalidated'] == 1
+    assert server.stats['requests'] == 2
+
+
+def test_limiter_grows_while_latency_is_steady():
+
+    limiter = AdaptiveLimiter('host', ceiling=4, initial=1)
+    for _ in range(20):
+        limiter.release(limiter.acquire(), 0.1, overloaded=False)
+    assert limiter.limit == 4
+    assert [d['limit'] for d in limiter.decisions] == [2, 3, 4]
+
+    # but not while it is getting slower
+    limiter = AdaptiveLimiter('host', ceiling=4, initial=1)
+    limiter.release(limiter.acquire(), 0.1, overloaded=False)
+    for _ in range(20):
+        limiter.release(limiter.acquire(), 1.0, overloaded=False)
+    assert limiter.limit < 4
+
+
+def test_limiter_backs_off_once_per_overload():
+
+    limiter = AdaptiveLimiter('host', ceiling=16, initial=8)
+    tokens = [limiter.acquire() for _ in range(8)]
+    # all the requests in flight are rate limited, the limit is halved once
+    for token in tokens:
+        limiter.release(token, 0.1, overloaded=True)
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+    limiter.release(limiter.acquire(), 0.1, overloaded=True)
+    assert limiter.limit == 2
+    assert [d['reason'] for d in limiter.decisions] == ['overloaded', 'overloaded']
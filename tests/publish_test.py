@@ -0,0 +1,71 @@
+import gzip
+import os
+import sys
+
+from lxml import html
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from package.publish import minify_html, publish
+
+PAGE = b'''<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <title>Journal</title>
+    <!-- a comment -->
+    <style>
+      p  {  color: red; }
+    </style>
+  </head>
+  <body>
+    <p class="dayNumber">No.   1</p>
+    <p>Some    <strong>bold</strong>
+       text\xc2\xa0\xc2\xa0with non-breaking spaces</p>
+    <pre>  keep
+    this  </pre>
+  </body>
+</html>
+'''
+
+FRAGMENT = b'<hr class="longRule">\n\n<p>Day   one</p>\n  <p>More</p>\n'
+
+
+def _text(data: bytes) -> str:
+    # text as a browser would render it (roughly)
+    return ' '.join(html.fromstring(data).text_content().replace('\n', ' ').split(' '))
+
+
+def test_minify_keeps_rendered_text():
+
+    minified = minify_html(PAGE)
+    assert len(minified) < len(PAGE)
+    assert b'<!-- a comment -->' not in minified
+    assert b'<!DOCTYPE html>' in minified
+    assert b'<pre>  keep\n    this  </pre>' in minified
+    assert b'p  {  color: red; }' in minified
+    assert 'text\xa0\xa0with' in minified.decode('utf-8')
+    assert ' '.join(_text(minified).split()) == ' '.join(_text(PAGE).split())
+
+    minified = minify_html(FRAGMENT)
+    assert minified == b'<hr class="longRule">\n<p>Day one</p>\n<p>More</p>\n'
+
+
+def test_publish_skips_unchanged_files(tmp_path):
+
+    source = tmp_path / 'output'
+    (source / 'days').mkdir(parents=True)
+    (source / 'out.html').write_bytes(PAGE)
+    (source / 'days' / '2017-06-21.html').write_bytes(FRAGMENT)
+    (source / 'days' / 'manifest.json').write_text('{"days": [ ]}')
+
+    public = tmp_path / 'public'
+    first = publish(source, public).stats
+    assert first['files'] == 3
+    assert first['skipped'] == 0
+    assert gzip.decompress((public / 'out.html.gz').read_bytes()) == (public / 'out.html').read_bytes()
+    assert (public / 'days' / 'manifest.json').read_text() == '{"days":[]}'
+
+    (source / 'days' / '2017-06-21.html').write_bytes(FRAGMENT + b'<p>Changed</p>')
+    second = publish(source, public).stats
+    assert second['skipped'] == 2
+    assert (public / 'days' / '2017-06-21.html').read_bytes().endswith(b'<p>Changed</p>')
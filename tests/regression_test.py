@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import regression
+
+
+@pytest.mark.parametrize('name', list(regression.CASES))
+def test_output_matches_golden(name):
+
+    case = regression.CASES[name]
+    output = regression.run_case(case, repeat=1).output
+    golden = regression.golden_path(case).read_bytes()
+    assert output == golden, regression.diff(golden, output)
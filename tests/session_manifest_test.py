@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+import sys
+
+from click.testing import CliRunner
+from lxml import etree
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_journal
+from package.session_manifest import SessionManifest
+
+VNP_FOLDER = Path(__file__).parent / 'fixtures' / 'api' / 'vnp'
+
+
+@pytest.mark.parametrize('shard_by', [None, 2])
+def test_manifest(tmp_path, shard_by):
+
+    assert create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path, shard_by=shard_by) == 0
+    manifest = SessionManifest(tmp_path / 'session_None_for_id_manifest.json')
+
+    assert [record['date'] for record in manifest.days] == ['2017-06-21', '2017-06-22', '2017-06-23']
+    assert [record['ordinal'] for record in manifest.days] == [1, 2, 3]
+
+    record = manifest.find('No. 2')
+    assert record is manifest.find('2') is manifest.find('no.2') is manifest.find('2017-06-22')
+    assert record['vnp_number'] == 'No. 2'
+    assert record['items'] == etree.parse(str(VNP_FOLDER / '2017-06-22.xml')).getroot().xpath(
+        'count(//VoteItemViewModel)'
+    )
+
+    # the offsets are those of the <day> in the output
+    day_xml = manifest.day_xml(record)
+    assert day_xml.startswith(b'<day date="2017-06-22" VnPNumber="No. 2">')
+    assert day_xml.endswith(b'</day>')
+
+    assert manifest.find('No. 99') is None
+    assert manifest.find('2017-06-24') is None
+    with pytest.raises(ValueError):
+        manifest.find('junk')
+
+
+def test_lookup_command(tmp_path):
+
+    create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path)
+    manifest_path = str(tmp_path / 'session_None_for_id_manifest.json')
+
+    result = CliRunner().invoke(create_journal.cli, ['lookup', manifest_path, 'No. 3', '--xml'])
+    assert result.exit_code == 0
+    assert 'date:       2017-06-23' in result.output
+    assert '<day date="2017-06-23" VnPNumber="No. 3">' in result.output
+
+    result = CliRunner().invoke(create_journal.cli, ['lookup', manifest_path, '2017-06-24'])
+    assert result.exit_code == 1
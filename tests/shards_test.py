@@ -0,0 +1,55 @@
+import json
+import os
+from pathlib import Path
+import sys
+
+from lxml import etree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import create_journal
+
+VNP_FOLDER = Path(__file__).parent / 'fixtures' / 'api' / 'vnp'
+
+
+def days_without_daylines(xml_bytes: bytes):
+    root = etree.fromstring(xml_bytes)
+    for day_line in root.findall('day/DayLine'):
+        day_line.getparent().remove(day_line)
+    return [etree.tostring(day, method='c14n') for day in root]
+
+
+def test_shards(tmp_path):
+
+    assert create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path / 'whole') == 0
+    whole = (tmp_path / 'whole' / 'session_None_for_id.xml').read_bytes()
+
+    assert create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path, shard_by=2) == 0
+    shards_folder = tmp_path / 'session_None_for_id_shards'
+    manifest = json.loads((shards_folder / 'manifest.json').read_text())
+
+    assert [shard['file'] for shard in manifest['shards']] == ['part-001.xml', 'part-002.xml']
+    assert manifest['shards'][0]['first_vnp_number'] == 'No. 1'
+    assert manifest['shards'][0]['last_vnp_number'] == 'No. 2'
+    assert manifest['shards'][1]['first_date'] == '2017-06-23'
+    assert all(shard['changed'] for shard in manifest['shards'])
+
+    shard_days = []
+    for shard in manifest['shards']:
+        root = etree.parse(str(shards_folder / shard['file'])).getroot()
+        # only days after the first in a shard have a line before them
+        assert [day.find('DayLine') is not None for day in root] == [False] + [True] * (len(root) - 1)
+        # and the numbering restarts on each day
+        assert root[0].find('BusinessItemHeadingNumberedRestart') is not None
+        shard_days += days_without_daylines(etree.tostring(root))
+
+    assert shard_days == days_without_daylines(whole)
+
+    # nothing has changed so nothing is written
+    create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path, shard_by=2)
+    manifest = json.loads((shards_folder / 'manifest.json').read_text())
+    assert not any(shard['changed'] for shard in manifest['shards'])
+
+    # shards that are no longer needed are removed
+    create_journal.main(raw_xml_dir=VNP_FOLDER, output_file=tmp_path, shard_by='month')
+    assert sorted(p.name for p in shards_folder.iterdir()) == ['2017-06.xml', 'manifest.json']
@@ -0,0 +1,102 @@
+from datetime import datetime
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from lxml import etree
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from package.stand_in_server import StandInServer
+
+REPO_ROOT = Path(__file__).parent.parent
+FIXTURES = REPO_ROOT / 'tests' / 'fixtures' / 'api'
+
+
+@pytest.fixture
+def server():
+    with StandInServer(FIXTURES) as stand_in:
+        yield stand_in
+
+
+def test_sessions_and_sitting_dates(server):
+
+    sessions = requests.get(f'{server.url}/calendar/sessions/list.json').json()
+    assert '2017-19' in [s['CommonsDescription'] for s in sessions]
+
+    url = f'{server.url}/calendar/proceduraldates/Commons/nextsittingdate.json'
+    # sitting dates come from the vnp file names
+    assert requests.get(url, params={'dateToCheck': '2017-06-20'}).json() == '2017-06-21T00:00:00'
+    assert requests.get(url, params={'dateToCheck': '2017-06-21'}).json() == '2017-06-22T00:00:00'
+    assert requests.get(url, params={'dateToCheck': '2017-06-23'}).json() is None
+
+
+def test_vnp_and_papers_laid(server):
+
+    response = requests.get(f'{server.url}/voteitems/2017-06-21.xml')
+    assert response.status_code == 200
+    assert etree.fromstring(response.content).tag == 'ArrayOfVoteItemViewModel'
+
+    assert requests.get(f'{server.url}/voteitems/2017-06-24.xml').status_code == 404
+
+    url = f'{server.url}/papers/list/daily.xml'
+    all_papers = etree.fromstring(requests.get(url).content)
+    assert len(all_papers.findall('DailyPapers')) == 2
+    none = etree.fromstring(
+        requests.get(url, params={'fromDate': '2030-01-01', 'toDate': '2030-12-31'}).content
+    )
+    assert len(none) == 0
+
+
+def test_fault_injection():
+
+    with StandInServer(FIXTURES, error_rate=1.0) as server:
+        assert requests.get(f'{server.url}/voteitems/2017-06-21.xml').status_code == 503
+        assert server.stats['injected_errors'] == 1
+
+    with StandInServer(FIXTURES, rate_limit=2) as server:
+        statuses = [requests.get(f'{server.url}/calendar/sessions/list.json').status_code
+                    for _ in range(5)]
+        assert 429 in statuses
+        assert server.stats['rate_limited'] == statuses.count(429)
+
+
+def test_create_journal_from_api(server, tmp_path):
+
+    """A whole from-api build can run against the stand-in server"""
+
+    env = dict(os.environ, **server.environ(), COMMONS_JOURNAL_CACHE_DIR=str(tmp_path / 'cache'))
+    result = subprocess.run(
+        [sys.executable, 'create_journal.py', 'from-api', '2017-19',
+         '--discard-raw-xml', '--output', str(tmp_path)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    output_root = etree.parse(str(tmp_path / 'session_2017-19_for_id.xml')).getroot()
+    assert [day.get('date') for day in output_root] == ['2017-06-21', '2017-06-22', '2017-06-23']
+
+
+def test_papers_are_requested_in_chunks(server, tmp_path, monkeypatch):
+
+    import make_papers_index
+    from package import endpoints, http_client
+
+    monkeypatch.setattr(endpoints, 'PAPERS_LAID_DAILY_URL', f'{server.url}/papers/list/daily.xml')
+    monkeypatch.setattr(http_client, '_CLIENT', http_client.HttpClient(cache_dir=tmp_path))
+
+    def dates(content):
+        return [daily.findtext('Date') for daily in etree.fromstring(content).iterchildren('DailyPapers')]
+
+    date_from, date_to = datetime(2016, 5, 9), datetime(2017, 12, 31)
+    whole = make_papers_index.request_papers_xml(date_from, date_to, chunk_days=1000)
+    assert server.stats['requests'] == 1
+
+    # 2016-05-19 is at the end of one chunk and the start of the next
+    chunked = make_papers_index.request_papers_xml(date_from, date_to, chunk_days=10)
+    assert server.stats['requests'] == 1 + 61  # 601 days
+    assert dates(chunked) == dates(whole) == ['2016-05-19T00:00:00', '2017-03-14T00:00:00']
+    assert etree.tostring(etree.fromstring(chunked)) == etree.tostring(etree.fromstring(whole))
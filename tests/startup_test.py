@@ -0,0 +1,66 @@
+"""The command line tools are run many times a day from batch scripts, so
+they should start quickly. Modules only needed to do the work (rather than
+parse the arguments) should be imported when they are first used."""
+
+from pathlib import Path
+import subprocess
+import sys
+from typing import List, Tuple
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# time for all the imports of `TOOL --help`, not counting site
+IMPORT_BUDGET_MS = 100
+
+NOT_NEEDED_FOR_HELP = (
+    'requests',
+    'urllib3',
+    'lxml.html',
+    'lxml.html.clean',
+    'cache_to_disk',
+    'concurrent.futures',
+    'ssl',
+)
+
+
+def importtime(script: str) -> List[Tuple[int, str]]:
+    """(cumulative import time in microseconds, indented module name) of
+    each import made by `python -X importtime script --help`."""
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(ROOT / script), '--help'],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    assert result.returncode == 0, result.stderr
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'self [us]' not in line:
+            _, cumulative, name = line.split('|')
+            imports.append((int(cumulative), name[1:]))
+    return imports
+
+
+@pytest.mark.parametrize('script', ['create_journal.py', 'make_papers_index.py'])
+def test_help_does_not_import_heavy_modules(script):
+
+    imported = {name.strip() for _, name in importtime(script)}
+    assert imported.isdisjoint(NOT_NEEDED_FOR_HELP), imported & set(NOT_NEEDED_FOR_HELP)
+
+
+@pytest.mark.parametrize('script', ['create_journal.py', 'make_papers_index.py'])
+def test_startup_budget(script):
+
+    # best of a few runs so that a busy machine doesn't fail the test
+    totals = []
+    for _ in range(3):
+        # the top level imports (indented names are imported by one of these)
+        totals.append(
+            sum(us for us, name in importtime(script) if name[0] != ' ' and name != 'site') / 1000
+        )
+
+    assert min(totals) < IMPORT_BUDGET_MS, f'{script} imports took {min(totals):.0f} ms'
@@ -0,0 +1,124 @@
+import json
+import os
+from pathlib import Path
+import sys
+
+from lxml import html
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from transform_journal_html import transform_parts
+
+
+def _day(number: int) -> str:
+    return (
+        f'<p class="Journal_DaySep">No. {number}</p>'
+        f'<p class="Journal_VotesDate"><span class="DateForHeader">Day {number}</span></p>'
+        f'<p class="Journal_Line-Above">Heading {number}</p>'
+        f'<p class="BodyIndented">Body {number} <span class="Bold">bold</span></p>'
+    )
+
+
+def _write_part(folder: Path, name: str, body: str) -> Path:
+    path = folder / name
+    path.write_text(f'<html><body><div>{body}</div></body></html>', encoding='utf-8')
+    return path
+
+
+def test_parts_are_merged_like_one_file(tmp_path):
+
+    days = ''.join(_day(n) for n in range(1, 5))
+    whole = _write_part(tmp_path, 'whole.html', days)
+
+    # split part way through day 2 and between day 3's number and heading
+    first, rest = days.split('<p class="BodyIndented">Body 2')
+    second, third = rest.split('<p class="Journal_VotesDate"><span class="DateForHeader">Day 4')
+    parts = [
+        _write_part(tmp_path, 'part1.html', first),
+        _write_part(tmp_path, 'part2.html', '<p class="BodyIndented">Body 2' + second),
+        _write_part(
+            tmp_path,
+            'part3.html',
+            '<p class="Journal_VotesDate"><span class="DateForHeader">Day 4' + third,
+        ),
+    ]
+
+    transform_parts([whole], output_path=tmp_path / 'whole_out.html', jobs=1)
+    transform_parts(parts, output_path=tmp_path / 'parts_out.html', jobs=2)
+
+    expected = (tmp_path / 'whole_out.html').read_bytes()
+    assert (tmp_path / 'parts_out.html').read_bytes() == expected
+
+    root = html.fromstring(expected)
+    sections = root.xpath('//section')
+    assert len(sections) == 4
+    assert [s.findtext('.//p[@class="dayNumber"]') for s in sections] == [
+        'No. 1', 'No. 2', 'No. 3', 'No. 4'
+    ]
+    # a long rule between days and at the end of each day
+    assert len(root.xpath('//hr[@class="longRule"]')) == 3 + 4
+
+
+def test_paginate_writes_a_fragment_per_day(tmp_path):
+
+    days = ''.join(
+        _day(n).replace(f'Day {n}', f'Monday {n} June 2017') for n in range(1, 4)
+    )
+    part = _write_part(tmp_path, 'part1.html', days)
+
+    transform_parts([part], output_path=tmp_path / 'whole.html', jobs=1)
+    transform_parts([part], output_path=tmp_path / 'paged.html', jobs=1, paginate=True)
+
+    page = html.parse(str(tmp_path / 'paged.html')).getroot()
+    assert page.xpath('//section') == []
+    container = page.get_element_by_id('content-goes-here')
+    assert container.get('data-manifest') == 'days/manifest.json'
+
+    manifest = json.loads((tmp_path / 'days' / 'manifest.json').read_text())
+    assert [d['date'] for d in manifest['days']] == ['2017-06-01', '2017-06-02', '2017-06-03']
+    assert [d['day_number'] for d in manifest['days']] == ['No. 1', 'No. 2', 'No. 3']
+
+    # each fragment is the content of the day in the whole page
+    whole = html.parse(str(tmp_path / 'whole.html')).getroot()
+    for day, content in zip(manifest['days'], whole.find_class('collapsible-content')):
+        fragment = (tmp_path / 'days' / day['fragment']).read_bytes()
+        assert len(fragment) == day['bytes']
+        assert fragment == b''.join(html.tostring(child) for child in content)
+
+
+def test_search_index_points_at_the_paragraphs(tmp_path):
+
+    days = ''.join(_day(n) for n in range(1, 5))
+    first, second = days.split('<p class="BodyIndented">Body 2')
+    parts = [
+        _write_part(tmp_path, 'part1.html', first),
+        _write_part(tmp_path, 'part2.html', '<p class="BodyIndented">Body 2' + second),
+    ]
+    transform_parts(parts, output_path=tmp_path / 'out.html', jobs=1, search=True)
+
+    page = html.parse(str(tmp_path / 'out.html')).getroot()
+    assert page.get_element_by_id('content-goes-here').get('data-search-index') == 'search/meta.json'
+
+    meta = json.loads((tmp_path / 'search' / 'meta.json').read_text())
+    assert [d['heading'] for d in meta['days']] == ['Day 1', 'Day 2', 'Day 3', 'Day 4']
+
+    # find the paragraphs the same way as the page's script
+    paragraphs = [
+        [e for e in content if e.tag != 'hr' and 'dayNumber' not in e.classes]
+        for content in page.find_class('collapsible-content')
+    ]
+
+    for key, shard_file in meta['shards'].items():
+        shard = json.loads((tmp_path / 'search' / shard_file).read_text())
+        for term, postings in shard.items():
+            assert term.startswith(key)
+            for day, gaps in postings:
+                paragraph = 0
+                for i, gap in enumerate(gaps):
+                    paragraph = gap if i == 0 else paragraph + gap
+                    assert term in paragraphs[day][paragraph].text_content().lower()
+
+    # body 2 is in the second part but in the second day
+    assert json.loads((tmp_path / 'search' / 'b.json').read_text())['bold'] == [
+        [0, [1]], [1, [1]], [2, [1]], [3, [1]]
+    ]
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import json
+import os
+from pathlib import Path
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from package import http_client
+from package.stand_in_server import StandInServer
+from package.utilities import SessionRegistry, get_sitting_dates_in, get_sitting_dates_in_range
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'api'
+
+# nothing listens on the discard port so this is effectively offline
+OFFLINE_URL = 'http://127.0.0.1:9/calendar/sessions/list.json'
+
+
+def write_cache(cache_file: Path, fetched_at: float):
+    sessions = json.loads((FIXTURES / 'whatson' / 'sessions.json').read_text())
+    cache_file.write_text(
+        json.dumps({'url': OFFLINE_URL, 'fetched_at': fetched_at, 'sessions': sessions})
+    )
+
+
+def test_registry_works_offline_from_cache(tmp_path):
+
+    cache_file = tmp_path / 'sessions.json'
+    # a stale cache should still be used when offline
+    write_cache(cache_file, time.time() - 30 * 24 * 60 * 60)
+
+    registry = SessionRegistry(cache_file=cache_file, url=OFFLINE_URL)
+    assert registry.is_stale
+
+    assert registry.by_id[30]['CommonsDescription'] == '2017-19'
+    # the start is the day after the end of the previous session
+    assert registry.session_dates('2017-19') == (datetime(2017, 4, 28), datetime(2019, 10, 8))
+    # no previous session so use the start date
+    assert registry.session_dates('2015-16') == (datetime(2015, 5, 18), datetime(2016, 5, 12))
+
+    with pytest.raises(ValueError):
+        registry.session_dates('Junk')
+
+
+def test_registry_downloads_and_caches(tmp_path):
+
+    cache_file = tmp_path / 'cache' / 'sessions.json'
+
+    with StandInServer(FIXTURES) as server:
+        url = f'{server.url}/calendar/sessions/list.json'
+        registry = SessionRegistry(cache_file=cache_file, url=url)
+        assert server.stats['requests'] == 1
+        assert cache_file.exists()
+
+        # a fresh cache means no request at all
+        SessionRegistry(cache_file=cache_file, url=url)
+        assert server.stats['requests'] == 1
+
+        # a stale cache is used straight away and refreshed in the background
+        stale = SessionRegistry(cache_file=cache_file, url=url, ttl=timedelta(0))
+        assert stale.session_dates('2019') == registry.session_dates('2019')
+        stale.refresh_in_background().join()
+        assert server.stats['requests'] >= 2
+
+
+def test_sitting_dates(tmp_path, monkeypatch):
+
+    # keep the responses out of the real cache
+    monkeypatch.setattr(http_client, '_CLIENT', http_client.HttpClient(cache_dir=tmp_path))
+
+    with StandInServer(FIXTURES) as server:
+        url_template = (
+            f'{server.url}/calendar/proceduraldates/commons/nextsittingdate.json?dateToCheck={{}}'
+        )
+        # the fixtures have vnp files for 2017-06-21 to 2017-06-23
+        assert get_sitting_dates_in_range(
+            datetime(2017, 6, 19), datetime(2017, 6, 25), url_template
+        ) == [datetime(2017, 6, 21), datetime(2017, 6, 22), datetime(2017, 6, 23)]
+        # not the next sitting day after the end of the range
+        assert get_sitting_dates_in_range(
+            datetime(2017, 6, 19), datetime(2017, 6, 21), url_template
+        ) == [datetime(2017, 6, 21)]
+
+        dates = [datetime(2017, 6, 24), datetime(2017, 6, 20), datetime(2017, 6, 22)]
+        assert get_sitting_dates_in(dates, url_template) == [datetime(2017, 6, 22)]
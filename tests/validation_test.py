@@ -0,0 +1,108 @@
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+
+from lxml import etree
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from package import validation
+from package.stand_in_server import StandInServer
+
+REPO_ROOT = Path(__file__).parent.parent
+FIXTURES = REPO_ROOT / 'tests' / 'fixtures' / 'api'
+GOOD_DAY = FIXTURES / 'vnp' / '2017-06-22.xml'
+
+
+def run(tool, *args, env=None):
+    return subprocess.run(
+        [sys.executable, tool, *args],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+
+
+def test_good_fixtures_are_valid():
+    for day in (FIXTURES / 'vnp').glob('*.xml'):
+        assert validation.check_xml(day.read_bytes(), validation.VNP) is None
+    daily = (FIXTURES / 'paperslaid' / 'daily.xml').read_bytes()
+    assert validation.check_xml(daily, validation.PAPERS_LAID) is None
+
+
+@pytest.mark.parametrize('content, problem', [
+    (b'', 'empty'),
+    (GOOD_DAY.read_bytes()[:-200], 'not well formed XML'),
+    (b'<html><body>Service unavailable</body></html>', 'the root element is <html>'),
+    (b'<ArrayOfVoteItemViewModel><DailyPapers/></ArrayOfVoteItemViewModel>', '<DailyPapers> in'),
+])
+def test_problems(content, problem):
+    assert validation.check_xml(content, validation.VNP).startswith(problem)
+
+
+def test_wrong_api():
+    assert validation.check_xml(GOOD_DAY.read_bytes(), validation.PAPERS_LAID) is not None
+
+
+def test_from_api_quarantines_and_skips_an_invalid_day(tmp_path):
+
+    fixtures = tmp_path / 'fixtures'
+    shutil.copytree(FIXTURES, fixtures)
+    (fixtures / 'vnp' / '2017-06-22.xml').write_bytes(b'<html><body>Oops</body></html>')
+
+    with StandInServer(fixtures) as server:
+        env = dict(os.environ, **server.environ(), COMMONS_JOURNAL_CACHE_DIR=str(tmp_path / 'cache'))
+        env.pop('COMMONS_JOURNAL_EVENT_LOG', None)
+        args = ['from-api', '2017-19', '--raw-xml-folder', str(tmp_path / 'raw'),
+                '--output', str(tmp_path / 'out')]
+
+        result = run('create_journal.py', *args, env=env)
+        assert result.returncode == 1, result.stdout + result.stderr
+        assert '2017-06-22: the root element is <html>' in result.stdout
+        assert '--skip-invalid' in result.stdout
+        assert not (tmp_path / 'out' / 'session_2017-19_for_id.xml').exists()
+
+        result = run('create_journal.py', *args, '--skip-invalid', env=env)
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert 'leaving out 1 days' in result.stdout
+
+    quarantined = tmp_path / 'raw' / 'quarantine' / '2017-06-22.xml'
+    assert quarantined.read_bytes() == b'<html><body>Oops</body></html>'
+    assert 'root element' in quarantined.with_name('2017-06-22.xml.problem.txt').read_text()
+
+    output_root = etree.parse(str(tmp_path / 'out' / 'session_2017-19_for_id.xml')).getroot()
+    assert [day.get('date') for day in output_root] == ['2017-06-21', '2017-06-23']
+
+
+def test_from_folder_checks_every_file_first(tmp_path):
+
+    folder = tmp_path / 'days'
+    shutil.copytree(FIXTURES / 'vnp', folder)
+    (folder / '2017-06-23.xml').write_bytes(GOOD_DAY.read_bytes()[:1000])
+    output = tmp_path / 'out'
+
+    result = run('create_journal.py', 'from-folder', str(folder), '--output', str(output))
+    assert result.returncode == 1, result.stdout + result.stderr
+    assert '2017-06-23.xml: not well formed XML' in result.stdout
+    assert not output.exists()
+
+    result = run('create_journal.py', 'from-folder', str(folder), '--output', str(output),
+                 '--skip-invalid')
+    assert result.returncode == 0, result.stdout + result.stderr
+    output_root = etree.parse(str(output / 'session_None_for_id.xml')).getroot()
+    assert [day.get('date') for day in output_root] == [
+        '2017-06-21', '2017-06-22']
+    # the user's files are left alone
+    assert (folder / '2017-06-23.xml').exists()
+
+
+def test_papers_from_file_rejects_invalid_xml(tmp_path):
+
+    input_file = tmp_path / 'papers.xml'
+    input_file.write_bytes(GOOD_DAY.read_bytes())
+
+    result = run('make_papers_index.py', 'from-file', str(input_file),
+                 '--output', str(tmp_path / 'index.xml'))
+    assert result.returncode == 1, result.stdout + result.stderr
+    assert 'the root element is <ArrayOfVoteItemViewModel>' in result.stdout
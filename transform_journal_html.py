@@ -1,16 +1,62 @@
 #!/usr/bin/env python3
 
+# std library imports
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+from datetime import datetime
+from functools import partial
+import json
+import os
+from pathlib import Path
 import re
-from typing import List, Optional
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
 
+# 3rd party imports
+import click
 from lxml import etree
 from lxml import html
 from lxml.etree import SubElement
 from lxml.html import HtmlElement
 
+# 1st party imports
+from package import publish, search_index
+from package.search_index import SearchIndex
+
+
+DEFAULT_TEMPLATE = Path(__file__).parent / "Journal_HTML_template.html"
+DEFAULT_OUTPUT_FILENAME = "output.html"
+
+# with --paginate each day is written to this folder (next to the output)
+DAYS_FOLDER = "days"
+MANIFEST_FILENAME = "manifest.json"
+
+# paragraph styles (classes) from the InDesign export
+NUMBERED_ITEM_CLASSES = frozenset(
+    ("Journal_Vote-Item-Numbered", "Journal_Vote-Item-Numbered-Restart")
+)
+# these are promoted to <h4>
+H4_CLASSES = frozenset(("Journal_Line-Above", "Journal_Heading-Line-Before"))
+BUDGET_RESOLUTION_CLASSES = frozenset(
+    (
+        "Budget-Resolutions_outdent2",
+        "Budget-Resolutions_outdent3",
+        "Budget-Resolutions_outdent4",
+        "Budget-Resolutions_outdent5",
+    )
+)
+# these need a line before
+SHORT_LINE_CLASSES = frozenset(
+    (
+        "Journal_Line-Above",
+        "Journal_Line-Below",
+        "Journal_SpeakersCertificates",
+        "Journal_Heading-Line-Before",
+    )
+)
+# bootstrap classes for tables
+TABLE_CLASSES = ("table", "table-hover")
 
-HTML_SECTIONS: List[HtmlElement] = []
+BUDGET_PARA_NUM_PATTERN = re.compile(r"\t+.?\([A-Za-z0-9]+\)\t")
 
 
 class Section:
@@ -24,9 +70,7 @@ class Section:
         '<div class="collapsible-content"></div>'
     )
 
-    def __init__(self, heading_element: HtmlElement, junk_section: bool = False):
-        self.junk_section = junk_section
-
+    def __init__(self, heading_element: HtmlElement):
         self.element = deepcopy(self.section_template)
         self.header = deepcopy(self.collapsible_header_template)
         self.content = deepcopy(self.collapsible_content_template)
@@ -41,17 +85,11 @@ class Section:
 
         self.element.extend((self.header, self.content))
 
-        if not junk_section:
-            HTML_SECTIONS.append(self.element)
-
     def append(self, element: HtmlElement):
         self.content.append(element)
 
     def add_short_line(self):
-        line_e = html.Element("hr")
-        line_e.tail = "\n"
-        line_e.classes.add("shortRule")
-        self.content.append(line_e)
+        self.content.append(_short_line())
 
     def add_long_line(self):
         line_e = html.Element("hr")
@@ -60,59 +98,157 @@ class Section:
         self.content.append(line_e)
 
 
-def main():
+# -------------------- Begin comand line interface ------------------- #
+
+
+@click.command()
+@click.argument(
+    "parts",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--template",
+    "-t",
+    default=DEFAULT_TEMPLATE,
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="The HTML template the journal sections are put into.",
+)
+@click.option(
+    "--output",
+    "-o",
+    default=DEFAULT_OUTPUT_FILENAME,
+    show_default=True,
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    help="File path for the output HTML.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=None,
+    help="Number of worker processes. Defaults to one per part (up to the number of CPUs).",
+)
+@click.option(
+    "--paginate",
+    is_flag=True,
+    default=False,
+    help=f"Write each day to its own HTML fragment in a '{DAYS_FOLDER}' folder next to "
+    "the output. The page loads a day when it is opened.",
+)
+@click.option(
+    "--search",
+    is_flag=True,
+    default=False,
+    help=f"Also write a search index (in a '{search_index.SEARCH_FOLDER}' folder next to "
+    "the output) and add a search box to the page.",
+)
+@click.option(
+    "--publish",
+    "publish_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Also write minified, precompressed (.gz and .br) copies of the output to "
+    "this folder, ready for a static host.",
+)
+def cli(
+    parts: Sequence[Path],
+    template: Path,
+    output: Path,
+    jobs: Optional[int],
+    paginate: bool,
+    search: bool,
+    publish_dir: Optional[Path],
+):
+    """Convert the HTML exported from InDesign for the journal into a single
+    web page.
+
+    PARTS are the HTML files exported from InDesign, in order
+    (e.g. Journal-Body_Part1.html Journal-Body_Part2.html). Parts are
+    converted in parallel and put into the template in the order given.
+    """
+    transform_parts(
+        parts,
+        template_path=template,
+        output_path=output,
+        jobs=jobs,
+        paginate=paginate,
+        search=search,
+        publish_dir=publish_dir,
+    )
 
-    template_tree = html.parse("Journal_HTML_template.html")
-    template_root = template_tree.getroot()
-    content_container = template_root.find(".//*[@id='content-goes-here']")
 
-    input_tree = html.parse("test-2016-17-Journal-Body_Part1.html")
+# --------------------- End comand line interface -------------------- #
+
+
+def transform_part(part_path: Union[Path, str], index_terms: bool = False) -> Dict:
+    """Convert one InDesign HTML export into journal sections.
+
+    Runs in a worker process so returns serialised HTML:
+        sections:          one <section> per day, in order
+        leading:           <div> of the elements before the first day heading
+                           (these belong to the last day of the previous part)
+        needs_day_number:  True if the first section's day number is in the
+                           previous part
+        day_number:        a day number found after the last day heading
+        paragraphs:        number of paragraphs in leading then each section
+        postings:          search terms in leading then each section (empty
+                           unless index_terms is True), see search_index.py
+    """
+
+    input_tree = html.parse(str(part_path))
     root = input_tree.getroot()
 
-    # content_sections = []
-    section = Section(
-        html.fromstring(
-            '<h3 style="color: red;">This heading should not be here!</h3>'
-        ),
-        junk_section=True,  # we do not want this adding to the output
-    )
+    # elements before the first day heading go here
+    leading = html.Element("div")
+    sections: List[Section] = []
+    section: Optional[Section] = None
+    needs_day_number = False
 
     day_number: Optional[str] = None
 
-    first_section_found = False
+    # for the search index, leading first then one per section
+    paragraphs: List[int] = [0]
+    postings: List[search_index.Postings] = [{}]
 
     for element in root.xpath(".//div/*"):
         # remove lang attribute (inc. en_gb) from elements
         element.attrib.pop("lang", None)
 
+        classes = frozenset(element.get("class", "").split())
+
         # BodyIndented is pretty much just the body copy
         # so the class can be removed and left as a <p>
-        element.classes.discard("BodyIndented")
+        if "BodyIndented" in classes:
+            element.classes.discard("BodyIndented")
+            classes = classes - {"BodyIndented"}
 
-        if "Journal_DaySep" in element.classes:
+        if "Journal_DaySep" in classes:
             # make a note of the number as this will need to be added after
             # the date heading
             day_number = element.text_content().strip()
             continue
 
-        if "Journal_VotesDate" in element.classes:
+        if "Journal_VotesDate" in classes:
             # Journal_VotesDate represents a new section
             section = Section(element)
-            if first_section_found:
-                section.add_long_line()
-            else:
-                first_section_found = True
+            sections.append(section)
+            paragraphs.append(0)
+            postings.append({})
 
             element.tag = "h3"
+            fix_inline(element)
 
-            # first add the rule, then the heading and immediately after
-            # add the day number
+            # first add the rule (when merging), then the heading and
+            # immediately after add the day number
             if day_number:
-                day_number_e = html.Element("p")
-                day_number_e.classes.add("dayNumber")
-                day_number_e.text = day_number
-                section.append(day_number_e)
+                section.append(_day_number_element(day_number))
                 day_number = None
+            elif len(sections) == 1:
+                # the day number may be at the end of the previous part
+                needs_day_number = True
             else:
                 print(
                     f"Warning: no day number found for heading '{element.text_content()}'"
@@ -121,33 +257,25 @@ def main():
             # must continue here as we don't want to add the element again
             continue
 
-        if set(
-            ("Journal_Vote-Item-Numbered", "Journal_Vote-Item-Numbered-Restart")
-        ).intersection(element.classes):
+        if not classes.isdisjoint(NUMBERED_ITEM_CLASSES):
             # element.classes.add('mt-5')  # no longer needed
             # numbered spans
-            for span in element.xpath("span[contains(@class, '_idGenBNMarker')]"):
-                span.classes.add("charBallotNumber")
-                span.tag = "strong"
+            for span in element.iterchildren("span"):
+                if "_idGenBNMarker" in span.get("class", ""):
+                    span.classes.add("charBallotNumber")
+                    span.tag = "strong"
 
-        elements_promoted_to_h4 = {"Journal_Line-Above", "Journal_Heading-Line-Before"}
-        if elements_promoted_to_h4.intersection(element.classes):
+        if not classes.isdisjoint(H4_CLASSES):
             element.tag = "h4"
 
         # budget_resolutions
-        budget_resolution_classes = {
-            "Budget-Resolutions_outdent2",
-            "Budget-Resolutions_outdent3",
-            "Budget-Resolutions_outdent4",
-            "Budget-Resolutions_outdent5",
-        }
-        if budget_resolution_classes.intersection(element.classes):
+        if not classes.isdisjoint(BUDGET_RESOLUTION_CLASSES):
             if not element.text:
                 print(
                     f"Warning: budget resolution has no text.\n{etree.tostring(element)}"
                 )
 
-            match = re.match(r"\t+.?\([A-Za-z0-9]+\)\t", element.text)
+            match = BUDGET_PARA_NUM_PATTERN.match(element.text)
             if match:
                 para_num_span = SubElement(element, "span")
                 para_num_span.classes.add("para_num")
@@ -155,63 +283,341 @@ def main():
                 para_num_span.tail = element.text[len(match.group(0)) :].strip()
                 element.text = ""
 
-        short_line_classes = {
-            "Journal_Line-Above",
-            "Journal_Line-Below",
-            "Journal_SpeakersCertificates",
-            "Journal_Heading-Line-Before",
-        }
-        if short_line_classes.intersection(element.classes):
+        if not classes.isdisjoint(SHORT_LINE_CLASSES):
             # these headings need a line before
-            section.add_short_line()
+            if section is None:
+                leading.append(_short_line())
+            else:
+                section.add_short_line()
 
-        # fix any spans
-        section.append(element)
+        # fix any spans and tables
+        fix_inline(element)
 
-    for section in HTML_SECTIONS:
-        section.append(html.fromstring(("<hr class='longRule'/>")))
+        if section is None:
+            leading.append(element)
+        else:
+            section.append(element)
 
-    content_container.extend(HTML_SECTIONS)
+        if element.tag != "hr":
+            if index_terms:
+                search_index.add_paragraph(
+                    postings[-1], paragraphs[-1], element.text_content()
+                )
+            paragraphs[-1] += 1
 
-    process_spans(content_container)
-    fix_tables(content_container)
+    return {
+        "sections": [html.tostring(section.element) for section in sections],
+        "leading": html.tostring(leading),
+        "needs_day_number": needs_day_number,
+        "day_number": day_number,
+        "paragraphs": paragraphs,
+        "postings": postings,
+    }
 
-    template_tree.write("output.html", encoding="utf-8")
-    print("done")
+
+def _day_number_element(day_number: str) -> HtmlElement:
+    day_number_e = html.Element("p")
+    day_number_e.classes.add("dayNumber")
+    day_number_e.text = day_number
+    return day_number_e
 
 
-def process_spans(element: HtmlElement):
-    # numbered spans
-    for span in element.xpath(".//span|.//strong"):
-        # if span.classes == set(("DateForHeader",)):
-        if "DateForHeader" in span.classes:
-            # if DateForHeader is the only class, remove tag,
-            # keep text children and tail text
-            span.drop_tag()
+def _short_line() -> HtmlElement:
+    line_e = html.Element("hr")
+    line_e.tail = "\n"
+    line_e.classes.add("shortRule")
+    return line_e
+
+
+def merge_parts(part_results: List[Dict]) -> List[HtmlElement]:
+    """Join the transformed parts (in order) into a list of <section>s."""
+
+    sections: List[HtmlElement] = []
+    carried_day_number: Optional[str] = None
+
+    for part in part_results:
+        if sections:
+            # elements before the part's first heading continue the last day
+            sections[-1][1].extend(html.fragment_fromstring(part["leading"]))
+        # in the first part they are junk and are dropped
+
+        for section_index, section_html in enumerate(part["sections"]):
+            section_e = html.fragment_fromstring(section_html)
+            content = section_e[1]
+
+            if section_index == 0 and part["needs_day_number"]:
+                if carried_day_number:
+                    content.insert(0, _day_number_element(carried_day_number))
+                else:
+                    print(
+                        "Warning: no day number found for heading "
+                        f"'{section_e[0].text_content().strip()}'"
+                    )
+
+            if sections:
+                # a long rule between days
+                line_e = html.Element("hr")
+                line_e.tail = "\n"
+                line_e.classes.add("longRule")
+                content.insert(0, line_e)
+
+            sections.append(section_e)
+
+        if part["sections"] or part["day_number"]:
+            carried_day_number = part["day_number"]
+
+    for section_e in sections:
+        section_e.append(html.fromstring("<hr class='longRule'/>"))
+
+    return sections
+
+
+def merge_search_index(part_results: List[Dict]) -> SearchIndex:
+    """Join the search terms of the transformed parts (in order), in the
+    same way as merge_parts joins the sections."""
+
+    index = SearchIndex()
+    day = -1
+    day_paragraphs = 0
+
+    for part in part_results:
+        leading_paragraphs, *section_paragraphs = part["paragraphs"]
+        leading_postings, *section_postings = part["postings"]
+
+        if day >= 0:
+            # the leading elements continue the last day
+            index.add_postings(day, leading_postings, offset=day_paragraphs)
+            day_paragraphs += leading_paragraphs
+
+        for count, postings in zip(section_paragraphs, section_postings):
+            day += 1
+            index.add_postings(day, postings)
+            day_paragraphs = count
+
+    return index
+
+
+def transform_parts(
+    part_paths: Sequence[Union[Path, str]],
+    template_path: Union[Path, str] = DEFAULT_TEMPLATE,
+    output_path: Union[Path, str] = DEFAULT_OUTPUT_FILENAME,
+    jobs: Optional[int] = None,
+    paginate: bool = False,
+    search: bool = False,
+    publish_dir: Optional[Union[Path, str]] = None,
+) -> Path:
+    """Transform the InDesign HTML export parts (in order) into one web page
+    based on the template. Parts are transformed in parallel worker
+    processes. Returns the output path.
 
-        # convert <span class="Bold"> to <strong>
-        if "Bold" in span.classes:
-            span.tag = "strong"
-        if span.tag == "strong":
-            span.classes.discard("Bold")
+    If paginate is True the days are not put in the page. Instead each day
+    is written to its own fragment and listed in a manifest (see
+    write_day_fragments) which the page's script uses to load the days.
 
-        # convert <span class="Italic"> to <em>
-        if "Italic" in span.classes:
-            span.tag = "em"
-        if span.tag == "em":
-            span.classes.discard("Italic")
+    If search is True a search index (see package/search_index.py) is built
+    while the parts are transformed and written next to the output.
+
+    If publish_dir is given, the files written are also minified and
+    precompressed into it (see package/publish.py).
+    """
 
+    if jobs is None:
+        jobs = min(len(part_paths), os.cpu_count() or 1)
+
+    transform = partial(transform_part, index_terms=search)
+    if jobs <= 1 or len(part_paths) == 1:
+        part_results = [transform(part) for part in part_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            part_results = list(pool.map(transform, part_paths))
+
+    template_tree = html.parse(str(template_path))
+    template_root = template_tree.getroot()
+    content_container = template_root.find(".//*[@id='content-goes-here']")
 
-def fix_tables(element: HtmlElement):
-    # tables
-    for table in element.xpath(".//table"):
-        table.classes.add("table")
-        table.classes.add("table-hover")
-        for decentant in table.iterdescendants():
-            # remove redundant classes
-            decentant.classes -= table.classes
-            # set(decentant.classes).difference(set(table.classes))
+    sections = merge_parts(part_results)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    written = [output_path]
+
+    if paginate:
+        days_folder = output_path.parent / DAYS_FOLDER
+        manifest = write_day_fragments(sections, days_folder)
+        written.append(days_folder / MANIFEST_FILENAME)
+        written.extend(days_folder / day["fragment"] for day in manifest["days"])
+        content_container.set("data-manifest", f"{DAYS_FOLDER}/{MANIFEST_FILENAME}")
+        print(f"{len(manifest['days'])} days written to:\n{days_folder.resolve()}")
+    else:
+        content_container.extend(sections)
+
+    if search:
+        search_folder = output_path.parent / search_index.SEARCH_FOLDER
+        days = []
+        for section_e in sections:
+            date, heading, _ = day_info(section_e)
+            days.append({"heading": heading, "date": date})
+        meta = merge_search_index(part_results).write(search_folder, days)
+        written.append(search_folder / search_index.META_FILENAME)
+        written.extend(search_folder / shard for shard in meta["shards"].values())
+        content_container.set(
+            "data-search-index",
+            f"{search_index.SEARCH_FOLDER}/{search_index.META_FILENAME}",
+        )
+        print(f"Search index of {meta['terms']} terms written to:\n{search_folder.resolve()}")
+
+    template_tree.write(str(output_path), encoding="utf-8")
+    print(f"Journal HTML is at:\n{output_path.resolve()}")
+
+    if publish_dir is not None:
+        publish.publish(output_path.parent, Path(publish_dir), written)
+
+    return output_path
+
+
+def day_info(section_e: HtmlElement) -> Tuple[Optional[str], str, Optional[str]]:
+    """Return the date (YYYY-MM-DD), heading and day number of a day
+    (section)."""
+
+    heading = section_e[0].text_content().strip()
+    try:
+        date: Optional[str] = datetime.strptime(heading, "%A %d %B %Y").strftime(
+            "%Y-%m-%d"
+        )
+    except ValueError:
+        print(f"Warning: could not get a date from heading '{heading}'")
+        date = None
+
+    day_number = section_e[1].findtext("p[@class='dayNumber']")
+    return date, heading, day_number
+
+
+def write_day_fragments(sections: List[HtmlElement], folder: Path) -> Dict:
+    """Write the content of each day (section) to its own HTML fragment in
+    folder, named by the day's date, and write a manifest listing the days.
+
+    The manifest looks like
+        {"days": [{"date": "2017-06-21", "heading": "Wednesday 21 June 2017",
+                   "day_number": "No. 1", "fragment": "2017-06-21.html",
+                   "bytes": 12345}, ...],
+         "total_bytes": 12345}
+    Returns the manifest.
+    """
+
+    folder.mkdir(parents=True, exist_ok=True)
+
+    days: List[Dict] = []
+    used_names = set()
+    for index, section_e in enumerate(sections, start=1):
+        content = section_e[1]
+        date, heading, day_number = day_info(section_e)
+
+        fragment = (content.text or "").encode("utf-8") + b"".join(
+            html.tostring(child, encoding="utf-8") for child in content
+        )
+        fragment_name = f"{date or f'day-{index:04d}'}.html"
+        if fragment_name in used_names:
+            fragment_name = f"{date}-{index:04d}.html"
+        used_names.add(fragment_name)
+        (folder / fragment_name).write_bytes(fragment)
+
+        days.append(
+            {
+                "date": date,
+                "heading": heading,
+                "day_number": day_number,
+                "fragment": fragment_name,
+                "bytes": len(fragment),
+            }
+        )
+
+    manifest = {"days": days, "total_bytes": sum(day["bytes"] for day in days)}
+    (folder / MANIFEST_FILENAME).write_text(
+        json.dumps(manifest, separators=(",", ":")), encoding="utf-8"
+    )
+    return manifest
+
+
+def fix_inline(element: HtmlElement):
+    """Fix the spans and tables in element and its descendants in one walk.
+
+    The children of a <div> are not visited as they are moved out of the div
+    and fixed separately.
+    """
+    to_unwrap: List[HtmlElement] = []
+    _fix_inline(element, frozenset(), to_unwrap)
+    # if DateForHeader is the only class, remove tag,
+    # keep text children and tail text
+    for span in to_unwrap:
+        span.drop_tag()
+
+
+def _fix_inline(
+    element: HtmlElement, table_classes: FrozenSet[str], to_unwrap: List[HtmlElement]
+):
+    # table_classes are the classes of the tables element is inside
+    handler = INLINE_HANDLERS.get(element.tag)
+    if handler is not None:
+        table_classes = handler(element, table_classes, to_unwrap)
+    elif table_classes:
+        _remove_table_classes(element, table_classes)
+
+    if element.tag == "div":
+        return
+    for child in element:
+        _fix_inline(child, table_classes, to_unwrap)
+
+
+def _remove_table_classes(element: HtmlElement, table_classes: FrozenSet[str]):
+    # remove classes that are redundant as the table has them
+    class_attr = element.get("class")
+    if class_attr:
+        redundant = table_classes.intersection(class_attr.split())
+        if redundant:
+            element.classes -= redundant
+
+
+def _fix_span(
+    span: HtmlElement, table_classes: FrozenSet[str], to_unwrap: List[HtmlElement]
+) -> FrozenSet[str]:
+    classes = span.get("class", "").split()
+
+    if "DateForHeader" in classes:
+        to_unwrap.append(span)
+
+    # convert <span class="Bold"> to <strong>
+    if "Bold" in classes:
+        span.tag = "strong"
+        span.classes.discard("Bold")
+
+    # convert <span class="Italic"> to <em>
+    if "Italic" in classes:
+        span.tag = "em"
+        span.classes.discard("Italic")
+
+    if table_classes:
+        _remove_table_classes(span, table_classes)
+    return table_classes
+
+
+def _fix_table(
+    table: HtmlElement, table_classes: FrozenSet[str], to_unwrap: List[HtmlElement]
+) -> FrozenSet[str]:
+    if table_classes:
+        # a table in a table
+        _remove_table_classes(table, table_classes)
+    for class_name in TABLE_CLASSES:
+        table.classes.add(class_name)
+    return table_classes | frozenset(table.classes)
+
+
+# what to do with each inline element, by tag
+INLINE_HANDLERS: Dict[str, Callable] = {
+    "span": _fix_span,
+    "strong": _fix_span,
+    "table": _fix_table,
+}
 
 
 if __name__ == "__main__":
-    main()
+    cli()